@@ -16,21 +16,69 @@ def create_app(config_class=Config):
         app.config.update(config_class)
     else:
         app.config.from_object(config_class)
+    # Tax rates of every invoice, however it is created
+    app.config.setdefault('TVA_RATE', 0.19)
+    app.config.setdefault('TAP_RATE', 0.02)
 
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, directory=app.config.get('MIGRATIONS_DIRECTORY'))
 
     login_manager.login_view = 'auth.login'
     login_manager.login_message_category = 'info'
 
+    # Per-request SQL instrumentation
+    from app.instrumentation import init_app as init_instrumentation
+    init_instrumentation(app)
+
+    # Prometheus metrics endpoint
+    from app.metrics import init_app as init_metrics
+    init_metrics(app)
+
+    # Relationship loading profiles
+    from app.loaders import init_app as init_loaders
+    init_loaders(app)
+
+    # Template formatting filters
+    from app.formatting import init_app as init_formatting
+    init_formatting(app)
+
+    # Template fragment cache
+    from app.cache import init_app as init_cache
+    init_cache(app)
+
+    # Conditional GET and response caching
+    from app.http_cache import init_app as init_http_cache
+    init_http_cache(app)
+
+    # Fingerprinted static assets
+    from app.assets import init_app as init_assets
+    init_assets(app)
+
+    # Background job queue
+    from app.jobs import init_app as init_jobs
+    init_jobs(app)
+
+    # Idempotency keys for retried POST requests
+    from app.idempotency import init_app as init_idempotency
+    init_idempotency(app)
+
+    # Yearly invoice archiving
+    from app.archive import init_app as init_archive
+    init_archive(app)
+
     # Register blueprints
     from app.routes import init_app as init_routes
     init_routes(app)
 
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Register CLI commands
+    from app.cli import init_app as init_cli
+    init_cli(app)
+
+    # Check the database schema
+    app.config.setdefault('DB_STARTUP_CHECK', 'create_all')
+    from app.startup import check_schema
+    check_schema(app)
 
     return app
\ No newline at end of file
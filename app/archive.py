@@ -0,0 +1,180 @@
+"""
+Yearly archiving of closed invoices.
+
+Invoice numbers restart every year and paid or cancelled invoices of past
+fiscal years are practically never touched again, yet they make up most of
+``invoices``, ``invoice_items`` and ``transactions``. ``archive_invoices``
+moves them, in batches and keeping their ids, to ``archived_invoices``,
+``archived_invoice_items`` and ``archived_transactions``::
+
+    flask archive run                  # keep ARCHIVE_KEEP_YEARS fiscal years hot
+    flask archive run --before 2022    # archive closed invoices dated before 2022
+
+Reads stay transparent:
+
+* ``find_invoice`` looks an invoice number up in the hot table, then in the
+  archive. Archived invoices render from their legal snapshot, which is
+  frozen before they move if they never had one.
+* Reports over a date range (exports, tax rollup rebuilds) union the
+  archive tables only when ``archive_overlaps`` finds archived rows in the
+  range, so current-year reports never touch them.
+
+The current year is never archived: ``set_invoice_number`` numbers new
+invoices from the hot table alone, so an archived number of this year
+could be handed out again.
+
+The move goes through Core statements, so the incrementally maintained tax
+rollups and credit exposures are left as they are: archived invoices still
+count in their month's declaration, and closed invoices carry no exposure.
+"""
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import db
+from app.cache import invalidate
+from app.models.archive import ArchivedInvoice, ArchivedInvoiceItem, ArchivedTransaction
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.transaction import Transaction
+
+# Invoice statuses that can be archived
+CLOSED_STATUSES = ('paid', 'cancelled')
+
+# Hot model -> archive model, parents first
+ARCHIVES = (
+    (Invoice, ArchivedInvoice),
+    (InvoiceItem, ArchivedInvoiceItem),
+    (Transaction, ArchivedTransaction),
+)
+
+
+def archive_cutoff(before_year=None):
+    """
+    Get the date before which closed invoices are archived.
+
+    Args:
+        before_year (int): First fiscal year to keep; defaults to keeping
+            the current year and the ``ARCHIVE_KEEP_YEARS - 1`` before it
+
+    Returns:
+        datetime: January 1st of the first year kept hot
+
+    Raises:
+        ValueError: If the year is after the current year
+    """
+    if before_year is None:
+        before_year = datetime.utcnow().year - current_app.config['ARCHIVE_KEEP_YEARS'] + 1
+    return _check_cutoff(datetime(before_year, 1, 1))
+
+
+def _check_cutoff(before):
+    current_year = datetime.utcnow().year
+    if before > datetime(current_year, 1, 1):
+        raise ValueError(f'Cannot archive invoices of the current year; '
+                         f'the cutoff must be January 1st {current_year} or earlier')
+    return before
+
+
+def _freeze_snapshots(invoice_ids):
+    """Snapshot invoices that never had one (cancelled drafts) before they move."""
+    invoices = db.session.execute(
+        select(Invoice).where(Invoice.id.in_(invoice_ids), Invoice.snapshot.is_(None))
+        .options(joinedload(Invoice.user), joinedload(Invoice.client),
+                 selectinload(Invoice.items).joinedload(InvoiceItem.product))
+    ).unique().scalars().all()
+    for invoice in invoices:
+        invoice.snapshot = invoice.build_snapshot()
+    db.session.flush()
+
+
+def _move(model, archive, where, now):
+    """Copy the matching rows of a hot table to its archive, then delete them."""
+    columns = [column.name for column in model.__table__.columns]
+    source = select(*model.__table__.columns, literal(now)).where(where)
+    db.session.execute(insert(archive.__table__).from_select([*columns, 'archived_at'], source))
+    return db.session.execute(delete(model.__table__).where(where)).rowcount
+
+
+def archive_invoices(before=None, batch_size=None, user_id=None):
+    """
+    Move closed invoices dated before a cutoff to the archive tables.
+
+    Each batch of invoices moves with its items and transactions in one
+    transaction.
+
+    Args:
+        before (datetime): Cutoff date; defaults to ``archive_cutoff()``
+        batch_size (int): Invoices per transaction; defaults to
+            ``ARCHIVE_BATCH_SIZE``
+        user_id (int): Only archive the invoices of one user
+
+    Returns:
+        dict: Number of rows moved per hot table
+
+    Raises:
+        ValueError: If the cutoff is after January 1st of the current year
+    """
+    before = _check_cutoff(before) if before else archive_cutoff()
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    candidates = select(Invoice.id).where(Invoice.status.in_(CLOSED_STATUSES), Invoice.date < before) \
+        .order_by(Invoice.id).limit(batch_size)
+    if user_id is not None:
+        candidates = candidates.where(Invoice.user_id == user_id)
+
+    counts = {model.__tablename__: 0 for model, archive in ARCHIVES}
+    while True:
+        invoice_ids = db.session.scalars(candidates).all()
+        if not invoice_ids:
+            break
+        _freeze_snapshots(invoice_ids)
+        now = datetime.utcnow()
+        # Children first, so that the foreign keys to invoices hold throughout
+        for model, archive in reversed(ARCHIVES):
+            where = (model.id if model is Invoice else model.invoice_id).in_(invoice_ids)
+            counts[model.__tablename__] += _move(model, archive, where, now)
+        db.session.commit()
+
+    if counts['invoices']:
+        invalidate(*counts)
+    return counts
+
+
+def find_invoice(user_id, invoice_number):
+    """
+    Look up an invoice by number, in the hot table and then in the archive.
+
+    Returns:
+        Invoice or ArchivedInvoice: The invoice, or None if not found
+    """
+    for model in (Invoice, ArchivedInvoice):
+        invoice = db.session.scalars(
+            select(model).where(model.invoice_number == invoice_number, model.user_id == user_id)
+        ).first()
+        if invoice is not None:
+            return invoice
+    return None
+
+
+def archive_overlaps(user_id=None, start=None, end=None):
+    """
+    Check whether any archived invoice falls in a date range.
+
+    A single probe of the (user_id, date) index; reports use it to decide
+    whether they need to union the archive tables.
+    """
+    probe = select(ArchivedInvoice.id).limit(1)
+    if user_id is not None:
+        probe = probe.where(ArchivedInvoice.user_id == user_id)
+    if start is not None:
+        probe = probe.where(ArchivedInvoice.date >= start)
+    if end is not None:
+        probe = probe.where(ArchivedInvoice.date < end)
+    return db.session.scalar(probe) is not None
+
+
+def init_app(app):
+    """Configure invoice archiving."""
+    app.config.setdefault('ARCHIVE_KEEP_YEARS', 2)
+    app.config.setdefault('ARCHIVE_BATCH_SIZE', 1_000)
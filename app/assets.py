@@ -0,0 +1,156 @@
+"""
+Fingerprinted, precompressed static assets.
+
+``flask assets build`` copies every file of the static folder to
+``static/dist`` under a content-hashed name (``css/style.3f2a9c1b04de.css``),
+writes gzip and, when the ``brotli`` package is installed, brotli variants
+of compressible files, and records the mapping in ``dist/manifest.json``.
+
+Once a manifest exists, ``url_for('static', filename='css/style.css')``
+resolves to the hashed file, which is served with a one-year immutable
+``Cache-Control`` and the best precompressed variant the client accepts.
+Files missing from the manifest are served as before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory
+
+DIST_DIRECTORY = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Extensions worth compressing
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot'}
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _compress_brotli(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def _compress_gzip(data):
+    # Fixed mtime keeps builds reproducible
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def build_assets(static_folder):
+    """
+    Fingerprint and precompress every file of a static folder.
+
+    Args:
+        static_folder (str): Path of the application's static folder
+
+    Returns:
+        dict: Manifest with ``files`` (original -> hashed name) and
+        ``encodings`` (hashed name -> available encodings)
+    """
+    output = os.path.join(static_folder, DIST_DIRECTORY)
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+
+    manifest = {'files': {}, 'encodings': {}}
+    for directory, subdirectories, filenames in os.walk(static_folder):
+        subdirectories[:] = sorted(name for name in subdirectories
+                                   if os.path.join(directory, name) != output)
+        for filename in sorted(filenames):
+            source = os.path.join(directory, filename)
+            original = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as fh:
+                data = fh.read()
+
+            stem, extension = os.path.splitext(original)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            hashed = f'{DIST_DIRECTORY}/{stem}.{digest}{extension}'
+            target = os.path.join(static_folder, *hashed.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as fh:
+                fh.write(data)
+
+            encodings = []
+            if extension.lower() in COMPRESSIBLE:
+                for encoding, compress in (('br', _compress_brotli), ('gzip', _compress_gzip)):
+                    compressed = compress(data)
+                    if compressed is not None and len(compressed) < len(data):
+                        suffix = dict(ENCODINGS)[encoding]
+                        with open(target + suffix, 'wb') as fh:
+                            fh.write(compressed)
+                        encodings.append(encoding)
+
+            manifest['files'][original] = hashed
+            manifest['encodings'][hashed] = encodings
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, MANIFEST_NAME), 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(app):
+    """
+    Load the asset manifest of an application, if one has been built.
+
+    Returns:
+        dict: Manifest, or None when assets have not been built
+    """
+    path = os.path.join(app.static_folder, DIST_DIRECTORY, MANIFEST_NAME)
+    manifest = None
+    if os.path.exists(path):
+        with open(path) as fh:
+            manifest = json.load(fh)
+    app.extensions['asset_manifest'] = manifest
+    return manifest
+
+
+def _hashed_url_defaults(endpoint, values):
+    """Point url_for('static') at the fingerprinted file."""
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    manifest = current_app.extensions.get('asset_manifest')
+    if manifest:
+        values['filename'] = manifest['files'].get(values['filename'], values['filename'])
+
+
+def serve_static(filename):
+    """Serve a static file, preferring precompressed variants of hashed assets."""
+    manifest = current_app.extensions.get('asset_manifest')
+    encodings = manifest['encodings'].get(filename) if manifest else None
+    if encodings is None:
+        return current_app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if encoding in encodings and accepted[encoding]:
+            response = send_from_directory(current_app.static_folder, filename + suffix,
+                                           mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(current_app.static_folder, filename,
+                                       max_age=IMMUTABLE_MAX_AGE)
+
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    """Load the asset manifest and install the fingerprinting static view."""
+    load_manifest(app)
+    app.url_defaults(_hashed_url_defaults)
+    if 'static' in app.view_functions:
+        app.view_functions['static'] = serve_static
@@ -0,0 +1,272 @@
+"""
+Fragment caching for Jinja templates.
+
+Wrap any part of a template in a ``{% cache %}`` block to render it once
+per user and reuse it until the data it depends on changes::
+
+    {% cache "navbar" %} ... {% endcache %}
+    {% cache "invoice_table", "invoices", "clients" %} ... {% endcache %}
+
+The first argument names the fragment; the others are table names whose
+generation counters become part of the key. Counters are bumped after
+every commit that inserted, updated or deleted a ``Product``, ``Client``,
+``Invoice`` or ``Transaction``, so stale entries are never read again and
+simply age out of the cache.
+
+Two backends are available through ``FRAGMENT_CACHE_BACKEND``:
+
+    lru    In-process LRU (default). Counters are per process, so with
+           several workers a fragment may stay stale in the other workers
+           until ``FRAGMENT_CACHE_TIMEOUT`` expires.
+    redis  Any Redis-compatible server at ``FRAGMENT_CACHE_REDIS_URL``,
+           shared by all workers. Requires the ``redis`` package.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.metrics import record_cache
+from app.models.product import Product
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+
+# Models whose changes invalidate cached fragments
+TRACKED_MODELS = (Product, Client, Invoice, Transaction)
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with per-entry expiry.
+
+    Generation counters are kept apart from the entries so that evicting
+    entries can never reset a counter.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def counters(self, names):
+        with self._lock:
+            return [self._counters.get(name, 0) for name in names]
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+
+class RedisCache:
+    """Cache backed by a Redis-compatible server, shared between processes."""
+
+    def __init__(self, url, prefix='supp:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self._client.scan_iter(f'{self.prefix}*'))
+        if keys:
+            self._client.delete(*keys)
+
+    def counters(self, names):
+        if not names:
+            return []
+        values = self._client.mget([f'{self.prefix}gen:{name}' for name in names])
+        return [int(value or 0) for value in values]
+
+    def incr(self, name):
+        return self._client.incr(f'{self.prefix}gen:{name}')
+
+
+class FragmentCache:
+    """
+    Rendered-fragment cache keyed by user and table generation counters.
+
+    Attributes:
+        backend: LRUCache or RedisCache instance
+        timeout (int): Entry lifetime in seconds
+        hits (int): Number of cache hits
+        misses (int): Number of cache misses
+    """
+
+    def __init__(self, backend, timeout=300):
+        self.backend = backend
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    def generations(self, tables):
+        """Get the current generation counter of each table."""
+        return self.backend.counters(list(tables))
+
+    def bump(self, *tables):
+        """Invalidate everything cached against the given tables."""
+        for table in tables:
+            self.backend.incr(table)
+
+    def key(self, name, tables=(), scope=None):
+        """
+        Build the cache key of a fragment.
+
+        Args:
+            name (str): Fragment name
+            tables (iterable): Table names the fragment depends on
+            scope: User id, or None for the current user
+
+        Returns:
+            str: Cache key
+        """
+        if scope is None:
+            scope = current_user.get_id() if current_user else None
+        generations = '.'.join(f'{table}{generation}' for table, generation
+                               in zip(tables, self.generations(tables)))
+        return f'fragment:{name}:{scope or "anon"}:{generations}'
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        # 'fragment' or 'response'
+        record_cache(key.partition(':')[0], value is not None)
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.backend.set(key, value, timeout or self.timeout)
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension implementing the ``{% cache name, *tables %}`` tag."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render_fragment', [nodes.List(args)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, args, caller):
+        cache = current_app.extensions.get('fragment_cache')
+        if cache is None:
+            return caller()
+
+        name, *tables = args
+        key = cache.key(name, tables)
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = str(caller())
+            cache.set(key, fragment)
+        return Markup(fragment)
+
+
+def _record_change(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_tables', set()).add(mapper.persist_selectable.name)
+
+
+for model in TRACKED_MODELS:
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, event_name, _record_change)
+
+
+def invalidate(*tables):
+    """
+    Bump generation counters for changes made outside the ORM (bulk inserts).
+
+    Args:
+        *tables (str): Table names; defaults to every tracked table
+    """
+    cache = current_app.extensions.get('fragment_cache') if has_app_context() else None
+    if cache is not None:
+        cache.bump(*(tables or [model.__tablename__ for model in TRACKED_MODELS]))
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_generations(session):
+    tables = session.info.pop('changed_tables', None)
+    if tables:
+        invalidate(*tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('changed_tables', None)
+
+
+def init_app(app):
+    """Configure the fragment cache and register the template tag."""
+    app.config.setdefault('FRAGMENT_CACHE_ENABLED', True)
+    app.config.setdefault('FRAGMENT_CACHE_BACKEND', 'lru')
+    app.config.setdefault('FRAGMENT_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    app.config.setdefault('FRAGMENT_CACHE_SIZE', 1024)
+    app.config.setdefault('FRAGMENT_CACHE_TIMEOUT', 300)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if not app.config['FRAGMENT_CACHE_ENABLED']:
+        return
+
+    if app.config['FRAGMENT_CACHE_BACKEND'] == 'redis':
+        backend = RedisCache(app.config['FRAGMENT_CACHE_REDIS_URL'])
+    elif app.config['FRAGMENT_CACHE_BACKEND'] == 'lru':
+        backend = LRUCache(app.config['FRAGMENT_CACHE_SIZE'])
+    else:
+        raise ValueError(f"Invalid FRAGMENT_CACHE_BACKEND '{app.config['FRAGMENT_CACHE_BACKEND']}'. "
+                         f"Must be one of: lru, redis")
+    app.extensions['fragment_cache'] = FragmentCache(backend, app.config['FRAGMENT_CACHE_TIMEOUT'])
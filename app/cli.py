@@ -0,0 +1,359 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('seed')
+@click.option('--scale', type=click.Choice(['tiny', 'small', 'medium', 'large']),
+              default='small', show_default=True, help='Dataset size preset.')
+@click.option('--seed', 'random_seed', type=int, default=42, show_default=True,
+              help='Random seed; the same seed always generates the same data.')
+@click.option('--users', type=int, help='Override the number of users.')
+@click.option('--clients', type=int, help='Override the number of clients.')
+@click.option('--products', type=int, help='Override the number of products.')
+@click.option('--invoices', type=int, help='Override the number of invoices.')
+@click.option('--batch-size', type=int, default=10_000, show_default=True,
+              help='Rows per INSERT batch.')
+@with_appcontext
+def seed_command(scale, random_seed, batch_size, **counts):
+    """Generate a deterministic synthetic dataset."""
+    from app.seed import seed_database
+
+    counts = {name: value for name, value in counts.items() if value is not None}
+    result = seed_database(scale=scale, seed=random_seed, batch_size=batch_size, **counts)
+    seconds = result.pop('seconds')
+    for table, count in result.items():
+        click.echo(f'{table:>14}: {count:>10,}')
+    total = sum(result.values())
+    click.echo(f'Inserted {total:,} rows in {seconds:.1f}s ({total / max(seconds, 1e-9):,.0f} rows/s)')
+
+
+@click.command('export')
+@click.argument('dataset', type=click.Choice(['invoices', 'invoice_items', 'transactions']))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'xlsx']), default='csv',
+              show_default=True, help='Output format.')
+@click.option('--year', type=int, help='Only export rows dated in this year.')
+@click.option('--user', 'email', help='Only export the data of the user with this email.')
+@click.option('--output', '-o', help="Output file; '-' writes CSV to stdout. "
+                                     "Defaults to DATASET[-YEAR].FORMAT.")
+@click.option('--batch-size', type=int, default=2_000, show_default=True,
+              help='Rows fetched per cursor batch.')
+@with_appcontext
+def export_command(dataset, file_format, year, email, output, batch_size):
+    """Export invoices, invoice items or transactions for accounting."""
+    import sys
+    import time
+    from app.export import build_query, stream_csv, write_xlsx, year_range
+    from app.models.user import User
+
+    user_id = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f'No user with email {email}')
+        user_id = user.id
+    start, end = year_range(year) if year else (None, None)
+    statement = build_query(dataset, user_id, start, end)
+    output = output or (f'{dataset}-{year}.{file_format}' if year else f'{dataset}.{file_format}')
+    if output == '-' and file_format != 'csv':
+        raise click.ClickException('Only CSV can be written to stdout')
+
+    started = time.perf_counter()
+    if file_format == 'xlsx':
+        count = write_xlsx(statement, output, title=dataset, batch_size=batch_size)
+    else:
+        stats = {}
+        fh = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for chunk in stream_csv(statement, batch_size=batch_size, stats=stats):
+                fh.write(chunk)
+        finally:
+            if fh is not sys.stdout.buffer:
+                fh.close()
+        count = stats.get('rows', 0)
+    seconds = time.perf_counter() - started
+    click.echo(f'Exported {count:,} rows to {output} in {seconds:.1f}s '
+               f'({count / max(seconds, 1e-9):,.0f} rows/s)', err=True)
+
+
+@click.group('declarations')
+def declarations_group():
+    """Manage TVA/TAP declaration rollups."""
+
+
+@declarations_group.command('rebuild')
+@click.option('--user', 'email', help='Only rebuild the rollups of the user with this email.')
+@with_appcontext
+def rebuild_declarations_command(email):
+    """Recompute the monthly tax rollups from the invoices."""
+    from app.declarations import rebuild
+    from app.models.user import User
+
+    user_id = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f'No user with email {email}')
+        user_id = user.id
+    click.echo(f'Rebuilt {rebuild(user_id):,} rollup rows')
+
+
+@click.group('invoices')
+def invoices_group():
+    """Manage invoices."""
+
+
+@invoices_group.command('snapshot')
+@click.option('--batch-size', type=int, default=500, show_default=True,
+              help='Invoices snapshotted per transaction.')
+@with_appcontext
+def snapshot_invoices_command(batch_size):
+    """Freeze the legal snapshot of issued invoices that lack one."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import joinedload, selectinload
+    from app import db
+    from app.models.invoice import Invoice, InvoiceItem
+
+    pending = (Invoice.snapshot.is_(None), Invoice.status.notin_(['draft', 'cancelled']))
+    last_id, count = 0, 0
+    while True:
+        invoices = db.session.execute(
+            select(Invoice).where(*pending, Invoice.id > last_id).order_by(Invoice.id)
+            .limit(batch_size)
+            .options(joinedload(Invoice.user), joinedload(Invoice.client),
+                     selectinload(Invoice.items).joinedload(InvoiceItem.product))
+        ).unique().scalars().all()
+        if not invoices:
+            break
+        for invoice in invoices:
+            invoice.snapshot = invoice.build_snapshot()
+        last_id = invoices[-1].id
+        count += len(invoices)
+        db.session.commit()
+    click.echo(f'Snapshotted {count:,} invoices')
+
+
+@click.group('recurring')
+def recurring_group():
+    """Manage recurring invoices."""
+
+
+@recurring_group.command('generate')
+@click.argument('period')
+@click.option('--batch-size', type=int, default=500, show_default=True,
+              help='Templates generated per transaction.')
+@with_appcontext
+def generate_recurring_command(period, batch_size):
+    """Create the draft invoices of a billing PERIOD (YYYY-MM)."""
+    import time
+    from app.recurring import generate
+
+    started = time.perf_counter()
+    try:
+        counts = generate(period, batch_size=batch_size)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='PERIOD')
+    seconds = time.perf_counter() - started
+    click.echo(f"Generated {counts['invoices']:,} invoices with {counts['invoice_items']:,} items "
+               f'for {period} in {seconds:.1f}s')
+
+
+@click.group('statements')
+def statements_group():
+    """Generate client account statements."""
+
+
+@statements_group.command('generate')
+@click.argument('period')
+@click.option('--user', 'email', required=True, help='Supplier whose clients get a statement.')
+@click.option('--format', 'file_format', type=click.Choice(['pdf', 'html']), default='pdf',
+              show_default=True, help='Statement format.')
+@click.option('--output', '-o', help='Zip archive to write. Defaults to statements-PERIOD.zip.')
+@with_appcontext
+def generate_statements_command(period, email, file_format, output):
+    """Write the month-end statements of PERIOD (YYYY-MM) for every client."""
+    from app.models.user import User
+    from app.statements import write_statements
+
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f'No user with email {email}')
+    output = output or f'statements-{period}.zip'
+    try:
+        count = write_statements(user.id, period, output, format=file_format)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='PERIOD')
+    click.echo(f'Wrote {count:,} statements to {output}')
+
+
+@click.command('worker')
+@click.option('--processes', '-n', type=int, default=1, show_default=True,
+              help='Number of worker processes.')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+@click.option('--poll-interval', type=float, help='Seconds between polls of an empty queue.')
+@with_appcontext
+def worker_command(processes, burst, poll_interval):
+    """Run background jobs from the queue."""
+    import multiprocessing
+    import signal
+    import threading
+    from flask import current_app
+    from app import db
+    from app.jobs import run_worker_process, work
+
+    app = current_app._get_current_object()
+    if processes <= 1:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        count = work(app, burst=burst, poll_interval=poll_interval, stop=stop)
+        click.echo(f'Ran {count:,} jobs')
+        return
+
+    # Forked workers must not share the parent's connections
+    for engine in db.engines.values():
+        engine.dispose()
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=run_worker_process, args=(app, burst, poll_interval))
+               for _ in range(processes)]
+    for process in workers:
+        process.start()
+    click.echo(f'Started {processes} workers')
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        # Workers received the signal too and stop after their current job
+        for process in workers:
+            process.join()
+
+
+@click.group('archive')
+def archive_group():
+    """Archive closed invoices of past fiscal years."""
+
+
+@archive_group.command('run')
+@click.option('--before', 'before_year', type=int,
+              help='First fiscal year to keep. Defaults to ARCHIVE_KEEP_YEARS back from this year.')
+@click.option('--user', 'email', help='Only archive the invoices of the user with this email.')
+@click.option('--batch-size', type=int, help='Invoices moved per transaction.')
+@with_appcontext
+def archive_run_command(before_year, email, batch_size):
+    """Move paid and cancelled invoices to the archive tables."""
+    from app.archive import archive_cutoff, archive_invoices
+    from app.models.user import User
+
+    user_id = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f'No user with email {email}')
+        user_id = user.id
+    try:
+        before = archive_cutoff(before_year)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--before')
+    counts = archive_invoices(before=before, batch_size=batch_size, user_id=user_id)
+    for table, count in counts.items():
+        click.echo(f'{table:>14}: {count:>10,}')
+    click.echo(f'Archived closed invoices dated before {before:%Y-%m-%d}')
+
+
+@click.group('idempotency')
+def idempotency_group():
+    """Manage idempotency keys."""
+
+
+@idempotency_group.command('purge')
+@with_appcontext
+def purge_idempotency_command():
+    """Delete expired idempotency keys."""
+    from app.idempotency import purge_expired
+
+    click.echo(f'Purged {purge_expired():,} expired idempotency keys')
+
+
+@click.group('sync')
+def sync_group():
+    """Manage the offline sync change log."""
+
+
+@sync_group.command('compact')
+@with_appcontext
+def compact_sync_command():
+    """Delete change log entries superseded by a newer change of the same row."""
+    from app.sync import compact
+
+    click.echo(f'Compacted {compact():,} superseded sync changes')
+
+
+@click.group('clients')
+def clients_group():
+    """Manage clients."""
+
+
+@clients_group.command('rebuild-exposure')
+@with_appcontext
+def rebuild_exposure_command():
+    """Re-derive every client's credit exposure from invoices and payments."""
+    from app.credit import rebuild_exposure
+
+    click.echo(f'Rebuilt the exposure of {rebuild_exposure():,} clients')
+
+
+@click.group('products')
+def products_group():
+    """Manage products."""
+
+
+@products_group.command('record-prices')
+@with_appcontext
+def record_prices_command():
+    """Start the price history of products that have none."""
+    from app.pricing import record_missing_prices
+
+    click.echo(f'Recorded the prices of {record_missing_prices():,} products')
+
+
+@click.group('assets')
+def assets_group():
+    """Manage static assets."""
+
+
+@assets_group.command('build')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint and precompress the static folder."""
+    import os
+    from flask import current_app
+    from app.assets import build_assets, load_manifest
+
+    if not current_app.static_folder or not os.path.isdir(current_app.static_folder):
+        raise click.ClickException(f'Static folder {current_app.static_folder} does not exist')
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        click.echo('brotli is not installed; only gzip variants will be written')
+
+    manifest = build_assets(current_app.static_folder)
+    load_manifest(current_app)
+    for original, hashed in sorted(manifest['files'].items()):
+        encodings = ', '.join(manifest['encodings'][hashed]) or 'uncompressed'
+        click.echo(f'{original} -> {hashed} ({encodings})')
+    click.echo(f"Built {len(manifest['files'])} assets")
+
+
+def init_app(app):
+    """Register CLI commands with the Flask application."""
+    app.cli.add_command(seed_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(declarations_group)
+    app.cli.add_command(invoices_group)
+    app.cli.add_command(archive_group)
+    app.cli.add_command(clients_group)
+    app.cli.add_command(products_group)
+    app.cli.add_command(idempotency_group)
+    app.cli.add_command(sync_group)
+    app.cli.add_command(recurring_group)
+    app.cli.add_command(statements_group)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(assets_group)
@@ -0,0 +1,46 @@
+"""
+Client credit exposure.
+
+``Client.exposure`` is the unpaid amount of a client's issued invoices
+(validated, pending or partial, less their completed payments). It is kept
+up to date inside the transaction of every invoice or payment change by the
+listeners in ``app.models.client``, and the credit limit is enforced there
+with a conditional ``UPDATE``: checking a new invoice costs one row update
+instead of summing the client's invoices, and two concurrent validations
+cannot both slip under the limit.
+
+Core bulk inserts (``flask seed``) bypass the listeners; ``rebuild_exposure``
+re-derives every balance from invoices and transactions in one statement.
+"""
+from sqlalchemy import func, select, update
+
+from app import db
+from app.models.client import EXPOSED_STATUSES, Client
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+
+
+def rebuild_exposure(client_id=None):
+    """
+    Recompute client exposures from invoices and transactions.
+
+    Args:
+        client_id (int): Only rebuild one client
+
+    Returns:
+        int: Number of clients updated
+    """
+    exposed = (Invoice.client_id == Client.id, Invoice.status.in_(EXPOSED_STATUSES))
+    invoiced = select(func.coalesce(func.sum(Invoice.total_ttc), 0.0)) \
+        .where(*exposed).scalar_subquery()
+    paid = select(func.coalesce(func.sum(Transaction.amount), 0.0)) \
+        .join(Invoice, Transaction.invoice_id == Invoice.id) \
+        .where(*exposed, Transaction.status == 'completed').scalar_subquery()
+
+    statement = update(Client).values(exposure=invoiced - paid) \
+        .execution_options(synchronize_session=False)
+    if client_id is not None:
+        statement = statement.where(Client.id == client_id)
+    result = db.session.execute(statement)
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,93 @@
+"""
+Monthly TVA/TAP declaration (G50).
+
+The G50 declares, each month, the TVA and TAP of every invoice issued that
+month. Summing the invoice table for that is a scan of a whole year of
+invoices; instead the ``tax_rollups`` table keeps one row per user, month
+and invoice status, maintained incrementally by listeners on ``Invoice``
+(see ``app.models.declaration``). A year of declarations is then a single
+grouped read of at most 12 rows per declared status.
+
+Core bulk inserts (``flask seed``) bypass the listeners; ``rebuild``
+recomputes the rollups from the invoices, hot and archived, in one
+``INSERT ... SELECT``.
+"""
+from sqlalchemy import delete, extract, func, insert, select, union_all
+
+from app import db
+from app.models.archive import ArchivedInvoice
+from app.models.declaration import TaxRollup
+from app.models.invoice import Invoice
+
+# Invoice statuses counted in the declaration
+DECLARED_STATUSES = ('validated', 'pending', 'partial', 'paid')
+
+
+def rebuild(user_id=None):
+    """
+    Recompute the rollups from the invoice table.
+
+    Args:
+        user_id (int): Only rebuild the rollups of one user
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    names = ('user_id', 'date', 'status', 'total_ht', 'tva', 'tap', 'total_ttc')
+    parts = [select(*(getattr(model, name) for name in names)) for model in (Invoice, ArchivedInvoice)]
+    clear = delete(TaxRollup)
+    if user_id is not None:
+        parts = [part.where(part.selected_columns.user_id == user_id) for part in parts]
+        clear = clear.where(TaxRollup.user_id == user_id)
+    invoices = union_all(*parts).subquery()
+
+    year = extract('year', invoices.c.date)
+    month = extract('month', invoices.c.date)
+    status = func.coalesce(invoices.c.status, 'draft')
+    source = select(
+        invoices.c.user_id, year, month, status, func.count(),
+        func.coalesce(func.sum(invoices.c.total_ht), 0.0), func.coalesce(func.sum(invoices.c.tva), 0.0),
+        func.coalesce(func.sum(invoices.c.tap), 0.0), func.coalesce(func.sum(invoices.c.total_ttc), 0.0),
+    ).group_by(invoices.c.user_id, year, month, status)
+
+    columns = ['user_id', 'year', 'month', 'status', *TaxRollup.MEASURES]
+    db.session.execute(clear)
+    result = db.session.execute(insert(TaxRollup).from_select(columns, source))
+    db.session.commit()
+    return result.rowcount
+
+
+def monthly_declarations(user_id, year):
+    """
+    Get the twelve monthly declarations of a year.
+
+    Args:
+        user_id (int): Declaring user
+        year (int): Declaration year
+
+    Returns:
+        list: One dict per month with the invoice count and HT, TVA, TAP
+        and TTC totals, rounded to the centime
+    """
+    statement = select(
+        TaxRollup.month, func.sum(TaxRollup.invoice_count), func.sum(TaxRollup.total_ht),
+        func.sum(TaxRollup.tva), func.sum(TaxRollup.tap), func.sum(TaxRollup.total_ttc),
+    ).where(
+        TaxRollup.user_id == user_id, TaxRollup.year == year,
+        TaxRollup.status.in_(DECLARED_STATUSES),
+    ).group_by(TaxRollup.month)
+    totals = {row[0]: row[1:] for row in db.session.execute(statement)}
+
+    declarations = []
+    for month in range(1, 13):
+        count, total_ht, tva, tap, total_ttc = totals.get(month, (0, 0.0, 0.0, 0.0, 0.0))
+        declarations.append({
+            'year': year,
+            'month': month,
+            'invoice_count': count,
+            'total_ht': round(total_ht, 2),
+            'tva': round(tva, 2),
+            'tap': round(tap, 2),
+            'total_ttc': round(total_ttc, 2),
+        })
+    return declarations
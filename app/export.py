@@ -0,0 +1,210 @@
+"""
+Streaming accounting exports.
+
+Rows are read with a server-side cursor (``stream_results`` and
+``yield_per``) as plain Core rows and written out batch by batch, so memory
+stays flat whatever the number of rows exported::
+
+    flask export invoices --year 2023 --format xlsx -o invoices-2023.xlsx
+
+CSV is produced as a generator suitable for a chunked HTTP response. XLSX
+is a zip archive that can only be finalised once every row is known, so it
+is written with openpyxl's write-only mode (rows are flushed to a temporary
+file as they arrive) and the finished file is then streamed.
+
+Archived invoices (see ``app.archive``) are included when the requested
+date range reaches into the archive.
+"""
+import codecs
+import csv
+import io
+from datetime import datetime
+
+from sqlalchemy import Float, select, union_all
+
+from app import db
+from app.archive import archive_overlaps
+from app.models.archive import ArchivedInvoice, ArchivedInvoiceItem, ArchivedTransaction
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.client import Client
+from app.models.transaction import Transaction
+
+FORMATS = ('csv', 'xlsx')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Rows fetched from the cursor and written per chunk
+DEFAULT_BATCH_SIZE = 2_000
+
+
+def _invoices(invoice, item, transaction):
+    return select(
+        invoice.invoice_number, invoice.date, invoice.due_date, invoice.status,
+        Client.name.label('client'), Client.nif.label('client_nif'),
+        invoice.total_ht, invoice.tva, invoice.tap, invoice.total_ttc,
+    ).join(Client, invoice.client_id == Client.id), invoice.date, invoice.user_id
+
+
+def _invoice_items(invoice, item, transaction):
+    return select(
+        invoice.invoice_number, invoice.date, item.product_id, item.description,
+        item.quantity, item.unit_price,
+        (item.quantity * item.unit_price).label('total_ht'),
+    ).join(invoice, item.invoice_id == invoice.id), invoice.date, invoice.user_id
+
+
+def _transactions(invoice, item, transaction):
+    return select(
+        transaction.reference, transaction.date, invoice.invoice_number, transaction.amount,
+        transaction.payment_method, transaction.bank_name, transaction.check_date,
+        transaction.status,
+    ).join(invoice, transaction.invoice_id == invoice.id), transaction.date, transaction.user_id
+
+
+# Statement builders per dataset, called with the invoice, item and
+# transaction models and returning (select, date column, owner column)
+DATASETS = {
+    'invoices': _invoices,
+    'invoice_items': _invoice_items,
+    'transactions': _transactions,
+}
+
+HOT_MODELS = (Invoice, InvoiceItem, Transaction)
+ARCHIVE_MODELS = (ArchivedInvoice, ArchivedInvoiceItem, ArchivedTransaction)
+
+
+def _filtered(dataset, models, user_id, start, end):
+    statement, date_column, owner_column = DATASETS[dataset](*models)
+    if user_id is not None:
+        statement = statement.where(owner_column == user_id)
+    if start is not None:
+        statement = statement.where(date_column >= start)
+    if end is not None:
+        statement = statement.where(date_column < end)
+    return statement, date_column
+
+
+def build_query(dataset, user_id=None, start=None, end=None, archive=None):
+    """
+    Build the export statement of a dataset.
+
+    Args:
+        dataset (str): One of ``DATASETS``
+        user_id (int): Restrict to one supplier, or None for everyone
+        start (datetime): Inclusive lower bound of the row date
+        end (datetime): Exclusive upper bound of the row date
+        archive (bool): Union the archived invoices; by default only when
+            the archive holds invoices in the date range
+
+    Returns:
+        Select: Statement ordered by date
+
+    Raises:
+        ValueError: If the dataset is unknown
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}'. Must be one of: {', '.join(DATASETS)}")
+    statement, date_column = _filtered(dataset, HOT_MODELS, user_id, start, end)
+    if archive is None:
+        archive = archive_overlaps(user_id, start, end)
+    if not archive:
+        return statement.order_by(date_column, statement.selected_columns[0])
+
+    archived, _ = _filtered(dataset, ARCHIVE_MODELS, user_id, start, end)
+    union = union_all(statement, archived).subquery()
+    columns = union.c
+    return select(*columns).order_by(columns[date_column.key], columns[0])
+
+
+def year_range(year):
+    """Get the (start, end) datetimes of a calendar year."""
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def iter_batches(statement, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Execute a statement on a server-side cursor and yield lists of rows.
+
+    Yields:
+        list: Up to ``batch_size`` row tuples
+    """
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def _csv_formatters(statement):
+    """Format amounts with two decimals so they survive spreadsheet import."""
+    return [(lambda value: value if value is None else f'{value:.2f}')
+            if isinstance(column.type, Float) else None
+            for column in statement.selected_columns]
+
+
+def stream_csv(statement, batch_size=DEFAULT_BATCH_SIZE, stats=None):
+    """
+    Generate a CSV export chunk by chunk.
+
+    Args:
+        statement (Select): Statement from ``build_query``
+        batch_size (int): Rows per chunk
+        stats (dict): Optional dict receiving the running ``rows`` count
+
+    Yields:
+        bytes: UTF-8 encoded chunks, starting with a byte order mark so
+        that spreadsheets detect the encoding
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(statement.selected_columns.keys())
+    yield codecs.BOM_UTF8 + buffer.getvalue().encode('utf-8')
+
+    formatters = _csv_formatters(statement)
+    formatted = [index for index, formatter in enumerate(formatters) if formatter]
+    for rows in iter_batches(statement, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            if formatted:
+                row = list(row)
+                for index in formatted:
+                    row[index] = formatters[index](row[index])
+            writer.writerow(row)
+        if stats is not None:
+            stats['rows'] = stats.get('rows', 0) + len(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(statement, fileobj, title='Export', batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Write an XLSX export with openpyxl in write-only mode.
+
+    Args:
+        statement (Select): Statement from ``build_query``
+        fileobj: Binary file object or path
+        title (str): Worksheet title
+        batch_size (int): Rows fetched per batch
+        progress (callable): Called with the rows written so far after each batch
+
+    Returns:
+        int: Number of rows written
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title[:31])
+    sheet.append(list(statement.selected_columns.keys()))
+    count = 0
+    for rows in iter_batches(statement, batch_size):
+        for row in rows:
+            sheet.append(tuple(row))
+        count += len(rows)
+        if progress is not None:
+            progress(count)
+    workbook.save(fileobj)
+    return count
@@ -0,0 +1,197 @@
+"""
+Locale-aware number, currency and date formatting for templates.
+
+Babel's ``format_currency`` resolves the locale and parses the CLDR pattern
+on every call, which dominates rendering of listings with thousands of
+amounts. Here each (locale, currency) pattern is compiled once into a small
+closure that only quantizes the value and applies the locale's separators,
+prefix and suffix; results are identical to Babel's for the supported
+patterns. Babel itself is imported on first use.
+
+Registered Jinja filters::
+
+    {{ invoice.total_ttc|format_currency }}        1.234,50 د.ج.
+    {{ product.margin|format_number }}             12,5
+    {{ invoice.date|format_date }}                 5/3/2024
+    {{ invoice.created_at|format_datetime }}       5/3/2024، 2:30 م
+"""
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_EVEN
+from functools import lru_cache, partial
+
+DEFAULT_CURRENCY = 'DZD'
+DEFAULT_LOCALE = 'ar_DZ'
+DEFAULT_TIMEZONE = 'Africa/Algiers'
+SUPPORTED_LOCALES = ('ar_DZ', 'fr_DZ')
+
+
+@lru_cache(maxsize=None)
+def _locale(name):
+    from babel import Locale
+    return Locale.parse(name)
+
+
+@lru_cache(maxsize=None)
+def _timezone(name):
+    from babel.dates import get_timezone
+    return get_timezone(name)
+
+
+def _compile(pattern, locale, currency=None):
+    """
+    Compile a parsed Babel number pattern into a formatting function.
+
+    Falls back to ``pattern.apply`` for patterns this fast path does not
+    reproduce exactly (scientific notation, irregular grouping, padding).
+    """
+    from babel.numbers import (get_currency_precision, get_currency_symbol,
+                               get_decimal_symbol, get_group_symbol)
+
+    min_frac, max_frac = pattern.frac_prec
+    if currency:
+        min_frac = max_frac = get_currency_precision(currency)
+
+    if pattern.exp_prec or pattern.grouping != (3, 3) or pattern.int_prec[0] > 1 \
+            or pattern.scale != 0:
+        def slow_format(value):
+            return pattern.apply(value, locale, currency=currency)
+        return slow_format
+
+    symbol = get_currency_symbol(currency, locale) if currency else ''
+    pos_prefix, neg_prefix = (part.replace('¤', symbol) for part in pattern.prefix)
+    pos_suffix, neg_suffix = (part.replace('¤', symbol) for part in pattern.suffix)
+    separators = str.maketrans({',': get_group_symbol(locale), '.': get_decimal_symbol(locale)})
+    quantum = Decimal(1).scaleb(-max_frac)
+    spec = f',.{max_frac}f'
+    strip = max_frac - min_frac
+
+    def format_value(value):
+        number = Decimal(str(value)).quantize(quantum, ROUND_HALF_EVEN)
+        text = format(abs(number), spec)
+        if strip:
+            # Drop optional trailing fraction digits, like '#,##0.###'
+            whole, _, fraction = text.partition('.')
+            fraction = fraction.rstrip('0').ljust(min_frac, '0')
+            text = f'{whole}.{fraction}' if fraction else whole
+        text = text.translate(separators)
+        if number < 0:
+            return f'{neg_prefix}{text}{neg_suffix}'
+        return f'{pos_prefix}{text}{pos_suffix}'
+    return format_value
+
+
+@lru_cache(maxsize=None)
+def currency_formatter(locale, currency=DEFAULT_CURRENCY):
+    """
+    Get the cached currency formatter for a locale.
+
+    Args:
+        locale (str): Locale identifier, e.g. 'ar_DZ'
+        currency (str): ISO 4217 currency code
+
+    Returns:
+        callable: Function formatting a number as an amount
+    """
+    babel_locale = _locale(locale)
+    return _compile(babel_locale.currency_formats['standard'], babel_locale, currency)
+
+
+@lru_cache(maxsize=None)
+def number_formatter(locale):
+    """Get the cached decimal number formatter for a locale."""
+    babel_locale = _locale(locale)
+    return _compile(babel_locale.decimal_formats[None], babel_locale)
+
+
+@lru_cache(maxsize=None)
+def date_formatter(locale, format='short', with_time=False):
+    """
+    Get the cached date or date-time formatter for a locale.
+
+    Args:
+        locale (str): Locale identifier
+        format (str): CLDR length ('short', 'medium', 'long') or a pattern
+        with_time (bool): Whether to include the time of day
+
+    Returns:
+        callable: Function formatting a date or datetime
+    """
+    from babel.dates import parse_pattern
+
+    babel_locale = _locale(locale)
+    if format in ('short', 'medium', 'long', 'full'):
+        pattern = babel_locale.date_formats[format].pattern
+        if with_time:
+            pattern = babel_locale.datetime_formats[format] \
+                .replace('{1}', pattern) \
+                .replace('{0}', babel_locale.time_formats['short'].pattern)
+    else:
+        pattern = format
+    compiled = parse_pattern(pattern)
+
+    def format_date(value):
+        return compiled.apply(value, babel_locale)
+    return format_date
+
+
+def _to_local(value, tzinfo):
+    """Convert a naive UTC datetime to the given timezone."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(_timezone(tzinfo))
+
+
+def format_currency(value, currency=DEFAULT_CURRENCY, locale=DEFAULT_LOCALE):
+    """Format an amount, e.g. ``1234.5`` as ``1.234,50 د.ج.``"""
+    if value is None:
+        return ''
+    return currency_formatter(locale, currency)(value)
+
+
+def format_number(value, locale=DEFAULT_LOCALE):
+    """Format a decimal number with the locale's separators."""
+    if value is None:
+        return ''
+    return number_formatter(locale)(value)
+
+
+def format_date(value, format='short', locale=DEFAULT_LOCALE, tzinfo=DEFAULT_TIMEZONE):
+    """Format a date, or the local date of a naive UTC datetime."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = _to_local(value, tzinfo).date()
+    return date_formatter(locale, format)(value)
+
+
+def format_datetime(value, format='short', locale=DEFAULT_LOCALE, tzinfo=DEFAULT_TIMEZONE):
+    """Format a naive UTC datetime in the given timezone."""
+    if value is None:
+        return ''
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return date_formatter(locale, format, True)(_to_local(value, tzinfo))
+
+
+def preload(tzinfo=DEFAULT_TIMEZONE):
+    """Build the formatters of every supported locale (before forking workers)."""
+    for locale in SUPPORTED_LOCALES:
+        currency_formatter(locale)
+        number_formatter(locale)
+        date_formatter(locale)
+        date_formatter(locale, 'short', True)
+    _timezone(tzinfo)
+
+
+def init_app(app):
+    """Register the formatting filters with the Flask application."""
+    app.config.setdefault('BABEL_DEFAULT_LOCALE', DEFAULT_LOCALE)
+    app.config.setdefault('BABEL_DEFAULT_TIMEZONE', DEFAULT_TIMEZONE)
+    locale = app.config['BABEL_DEFAULT_LOCALE']
+    tzinfo = app.config['BABEL_DEFAULT_TIMEZONE']
+
+    app.add_template_filter(partial(format_currency, locale=locale), 'format_currency')
+    app.add_template_filter(partial(format_number, locale=locale), 'format_number')
+    app.add_template_filter(partial(format_date, locale=locale, tzinfo=tzinfo), 'format_date')
+    app.add_template_filter(partial(format_datetime, locale=locale, tzinfo=tzinfo),
+                            'format_datetime')
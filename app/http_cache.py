@@ -0,0 +1,142 @@
+"""
+HTTP caching for blueprint views.
+
+``conditional`` answers ``If-None-Match`` with ``304 Not Modified`` without
+running the view. The ETag is derived from one aggregate query returning
+the row count and latest timestamp of each model in the current user's
+scope, plus the fragment cache generation counters so that updates which
+leave no timestamp (rows without ``updated_at``) still change it::
+
+    @products_bp.route('/')
+    @conditional(Product)
+    def index(): ...
+
+``cached_response`` stores whole rendered responses for anonymous visitors
+of pages that do not depend on the user, such as ``main.index``.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+from sqlalchemy import func, select
+
+from app import db
+from app.metrics import record_cache
+
+
+def _scope_validators(models, user_id):
+    """Get (count, latest timestamp) per model for one user in a single query."""
+    columns = []
+    for model in models:
+        scope = model.user_id == user_id
+        stamp = getattr(model, 'updated_at', None) or model.created_at
+        columns.append(select(func.count()).select_from(model).where(scope).scalar_subquery())
+        columns.append(select(func.max(stamp)).where(scope).scalar_subquery())
+    return db.session.execute(select(*columns)).one()
+
+
+def _etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _has_pending_flashes():
+    return bool(session.get('_flashes'))
+
+
+def _not_modified(etag, last_modified=None):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    return response
+
+
+def conditional(*models):
+    """
+    Make a view answer conditional GETs from per-user validators.
+
+    Args:
+        *models: Models with a ``user_id`` column whose rows the view renders
+
+    Returns:
+        callable: View decorator
+    """
+    tables = [model.__tablename__ for model in models]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pages showing flash messages must be rendered to consume them
+            if request.method != 'GET' or not current_user.is_authenticated \
+                    or _has_pending_flashes():
+                return view(*args, **kwargs)
+
+            validators = _scope_validators(models, current_user.id)
+            cache = current_app.extensions.get('fragment_cache')
+            generations = cache.generations(tables) if cache else ()
+            etag = _etag(current_app.config['HTTP_CACHE_VERSION'], request.full_path,
+                         current_user.id, tuple(validators), tuple(generations))
+            stamps = [value for value in validators[1::2] if value is not None]
+            last_modified = max(stamps) if stamps else None
+
+            not_modified = request.if_none_match.contains_weak(etag)
+            record_cache('conditional', not_modified)
+            if not_modified:
+                return _not_modified(etag, last_modified)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                response.last_modified = last_modified
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+                response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_response(timeout=60):
+    """
+    Cache the full rendered response of a page for anonymous visitors.
+
+    Authenticated users, pending flash messages and responses that are not
+    a plain 200 bypass the cache.
+
+    Args:
+        timeout (int): Seconds to keep the response
+
+    Returns:
+        callable: View decorator
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('fragment_cache')
+            if cache is None or request.method != 'GET' \
+                    or current_user.is_authenticated or _has_pending_flashes():
+                return view(*args, **kwargs)
+
+            key = f'response:{current_app.config["HTTP_CACHE_VERSION"]}:{request.full_path}'
+            cached = cache.get(key)
+            if cached is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or 'Set-Cookie' in response.headers \
+                        or response.is_streamed:
+                    return response
+                response.add_etag()
+                response.cache_control.public = True
+                response.cache_control.max_age = timeout
+                cached = (response.get_data(), list(response.headers.items()))
+                cache.set(key, cached, timeout)
+
+            body, headers = cached
+            response = current_app.response_class(body, headers=headers)
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """Configure HTTP caching defaults."""
+    app.config.setdefault('HTTP_CACHE_VERSION', '1')
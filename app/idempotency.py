@@ -0,0 +1,171 @@
+"""
+Idempotency keys for POST endpoints.
+
+Clients that may retry a request (browsers, integrations behind flaky
+networks) send an ``Idempotency-Key`` header, the same on every retry::
+
+    @api_bp.route('/invoices', methods=['POST'])
+    @api_login_required
+    @idempotent
+    def create_invoice(): ...
+
+The first request claims the key by inserting a row in
+``idempotency_keys``, committed on its own connection so that concurrent
+duplicates see it at once; the unique (user_id, key) constraint decides
+which request wins. Then:
+
+* the winner runs the view and stores its response on the row;
+* a retry after completion gets the stored response back, marked with an
+  ``Idempotent-Replayed: true`` header, without the view running again;
+* a duplicate arriving while the first is still running gets ``409`` with
+  ``Retry-After``;
+* reusing a key for a different method, path or body gets ``422``.
+
+Errors raised by the view (aborts included) and 5xx responses release the
+key so that the request can be retried. The response is stored after the
+view has committed, so a process that dies in between leaves the key
+``in_progress`` although the request took effect. Such a key is never
+taken over: once ``IDEMPOTENCY_LOCK_TIMEOUT`` seconds have passed,
+duplicates get ``409`` without ``Retry-After``, telling the client that
+the outcome is unknown and must be checked before retrying with a new key.
+Keys expire after ``IDEMPOTENCY_TTL`` seconds and are deleted by
+``flask idempotency purge``.
+
+Requests without the header run as usual.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import abort, current_app, make_response, request
+from flask_login import current_user
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.idempotency import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+# Response headers stored and replayed with the body
+REPLAYED_HEADERS = ('Content-Type', 'Location')
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode('utf-8'))
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _claim(user_id, key, fingerprint):
+    """
+    Insert the key as in progress, or take over an expired one.
+
+    Returns:
+        IdempotencyKey: None if claimed, otherwise the existing row
+    """
+    config = current_app.config
+    now = datetime.utcnow()
+    table = IdempotencyKey.__table__
+    values = dict(user_id=user_id, key=key, fingerprint=fingerprint, status='in_progress',
+                  created_at=now, expires_at=now + timedelta(seconds=config['IDEMPOTENCY_TTL']))
+    with db.engine.begin() as connection:
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(**values))
+            return None
+        except IntegrityError:
+            pass
+        # Reuse an expired key; an abandoned one may have taken effect
+        taken = connection.execute(
+            update(table).where(table.c.user_id == user_id, table.c.key == key, table.c.expires_at < now)
+            .values(**values, response_status=None, response_body=None, response_headers=None)
+        ).rowcount
+        if taken:
+            return None
+        return connection.execute(
+            select(table).where(table.c.user_id == user_id, table.c.key == key)
+        ).one()
+
+
+def _store(user_id, key, response):
+    table = IdempotencyKey.__table__
+    headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(table).where(table.c.user_id == user_id, table.c.key == key)
+            .values(status='completed', response_status=response.status_code,
+                    response_body=response.get_data(), response_headers=headers)
+        )
+
+
+def _release(user_id, key):
+    table = IdempotencyKey.__table__
+    with db.engine.begin() as connection:
+        connection.execute(delete(table).where(table.c.user_id == user_id, table.c.key == key))
+
+
+def _replay(row):
+    response = current_app.response_class(row.response_body, status=row.response_status)
+    for name, value in (row.response_headers or {}).items():
+        response.headers[name] = value
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Make a POST view safe to retry with an ``Idempotency-Key`` header."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None or not current_user.is_authenticated:
+            return view(*args, **kwargs)
+        if not key or len(key) > 255:
+            abort(400, description=f'{HEADER} must be 1 to 255 characters')
+
+        user_id, fingerprint = current_user.id, _fingerprint()
+        existing = _claim(user_id, key, fingerprint)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                abort(422, description=f'{HEADER} was already used for a different request')
+            if existing.status == 'completed':
+                return _replay(existing)
+            stale = datetime.utcnow() - timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+            if existing.created_at < stale:
+                return make_response({'error': 'The request with this Idempotency-Key did not finish; '
+                                               'check its outcome before retrying with a new key'}, 409)
+            response = make_response({'error': 'A request with this Idempotency-Key is in progress'}, 409)
+            response.headers['Retry-After'] = '1'
+            return response
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            _release(user_id, key)
+            raise
+        if response.status_code >= 500:
+            _release(user_id, key)
+        else:
+            _store(user_id, key, response)
+        return response
+    return wrapper
+
+
+def purge_expired():
+    """
+    Delete expired keys.
+
+    Returns:
+        int: Number of keys deleted
+    """
+    result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow()))
+    db.session.commit()
+    return result.rowcount
+
+
+def init_app(app):
+    """Configure idempotency keys."""
+    app.config.setdefault('IDEMPOTENCY_TTL', 24 * 3600)
+    app.config.setdefault('IDEMPOTENCY_LOCK_TIMEOUT', 60)
@@ -0,0 +1,214 @@
+"""
+Per-request SQL instrumentation.
+
+Hooks SQLAlchemy engine events and the Flask request lifecycle to record,
+for every request, the number of statements executed, the total time spent
+in the database and how often each statement fingerprint was repeated.
+Fingerprints repeated at least ``N_PLUS_ONE_THRESHOLD`` times within one
+request are reported as likely N+1 patterns, and requests slower than
+``SLOW_REQUEST_THRESHOLD`` seconds are logged.
+
+The same collectors back the ``count_queries`` and ``assert_max_queries``
+helpers used by the test suite::
+
+    with assert_max_queries(3):
+        client.get('/invoices/')
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Normalisation rules turning a statement into a fingerprint
+_WHITESPACE_RE = re.compile(r'\s+')
+_IN_LIST_RE = re.compile(r'IN \((?:\?|%\(\w+\)s|:\w+|__\[POSTCOMPILE_\w+\])(?:, ?(?:\?|%\(\w+\)s|:\w+))*\)',
+                         re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def fingerprint(statement):
+    """
+    Normalise a SQL statement so that repeated executions compare equal.
+
+    Literals and expanded ``IN`` lists are replaced by placeholders and
+    whitespace is collapsed.
+
+    Args:
+        statement (str): SQL statement as sent to the DBAPI
+
+    Returns:
+        str: Normalised statement
+    """
+    statement = _WHITESPACE_RE.sub(' ', statement).strip()
+    statement = _STRING_RE.sub('?', statement)
+    statement = _NUMBER_RE.sub('?', statement)
+    return _IN_LIST_RE.sub('IN (...)', statement)
+
+
+class QueryStats:
+    """
+    Statistics collected for a block of work, usually one request.
+
+    Attributes:
+        count (int): Number of statements executed
+        duration (float): Total database time in seconds
+        fingerprints (Counter): Execution count per statement fingerprint
+        statements (list): Executed statements, in order
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.statements = []
+
+    def record(self, statement, duration):
+        """Record one executed statement"""
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+        self.statements.append(statement)
+
+    def repeated(self, threshold):
+        """
+        Get fingerprints executed at least ``threshold`` times.
+
+        Args:
+            threshold (int): Minimum number of executions
+
+        Returns:
+            list: (fingerprint, count) tuples, most repeated first
+        """
+        return [(statement, count) for statement, count in self.fingerprints.most_common()
+                if count >= threshold]
+
+    def __repr__(self):
+        return f'<QueryStats {self.count} queries in {self.duration * 1000:.1f}ms>'
+
+
+def _collectors():
+    """Get the stack of active collectors for the current thread"""
+    collectors = getattr(_local, 'collectors', None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    return collectors
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _collectors():
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collectors = _collectors()
+    if not collectors:
+        return
+    start_times = conn.info.get('query_start_time')
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+    for stats in collectors:
+        stats.record(statement, duration)
+
+
+@contextmanager
+def count_queries():
+    """
+    Collect statistics for every statement executed inside the block.
+
+    Yields:
+        QueryStats: Statistics, filled in as statements execute
+    """
+    stats = QueryStats()
+    collectors = _collectors()
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """
+    Fail if the block executes more than ``max_queries`` statements.
+
+    Args:
+        max_queries (int): Maximum number of statements allowed
+
+    Raises:
+        AssertionError: If the limit is exceeded
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = '\n'.join(f'  {count}x {statement}'
+                               for statement, count in stats.fingerprints.most_common())
+        raise AssertionError(
+            f'Expected at most {max_queries} queries, got {stats.count}:\n{statements}'
+        )
+
+
+def _start_request():
+    g.request_start_time = time.perf_counter()
+    g.query_stats = QueryStats()
+    _collectors().append(g.query_stats)
+
+
+def _add_timing_headers(response):
+    stats = g.get('query_stats')
+    if stats is not None:
+        response.headers['X-Query-Count'] = str(stats.count)
+        response.headers.add('Server-Timing',
+                             f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"')
+    return response
+
+
+def _finish_request(app):
+    def finish_request(exc=None):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return
+        collectors = _collectors()
+        if stats in collectors:
+            collectors.remove(stats)
+
+        endpoint = request.endpoint or request.path
+        for statement, count in stats.repeated(app.config['N_PLUS_ONE_THRESHOLD']):
+            logger.warning('Possible N+1 in %s: %d executions of %s', endpoint, count, statement)
+
+        elapsed = time.perf_counter() - g.pop('request_start_time', time.perf_counter())
+        if elapsed >= app.config['SLOW_REQUEST_THRESHOLD']:
+            logger.warning('Slow request %s %s: %.1fms total, %d queries in %.1fms',
+                           request.method, request.path, elapsed * 1000,
+                           stats.count, stats.duration * 1000)
+    return finish_request
+
+
+def init_app(app):
+    """Register request lifecycle hooks with the Flask application."""
+    app.config.setdefault('QUERY_INSTRUMENTATION', True)
+    app.config.setdefault('QUERY_INSTRUMENTATION_HEADERS', app.debug)
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', 5)
+    app.config.setdefault('SLOW_REQUEST_THRESHOLD', 0.5)
+
+    if not app.config['QUERY_INSTRUMENTATION']:
+        return
+
+    app.before_request(_start_request)
+    if app.config['QUERY_INSTRUMENTATION_HEADERS']:
+        app.after_request(_add_timing_headers)
+    app.teardown_request(_finish_request(app))
@@ -0,0 +1,278 @@
+"""
+Database-backed background jobs.
+
+Heavy operations are enqueued as rows of the ``jobs`` table and answered
+immediately with the job id; ``flask worker`` processes claim and run them.
+No broker is involved, so the queue works anywhere the database does::
+
+    job = enqueue('export', priority=5, user_id=user.id, dataset='invoices', year=2023)
+
+    flask worker --processes 4
+
+Workers claim the queued job with the highest priority whose ``run_at`` has
+passed with a single conditional ``UPDATE``. On PostgreSQL the candidate row
+is selected ``FOR UPDATE SKIP LOCKED`` so workers never wait on each other;
+SQLite serialises writers, which makes the same statement safe there.
+
+A failing job is retried with exponential backoff (``JOB_RETRY_BACKOFF``
+seconds, doubled per attempt) until ``max_attempts``, then marked failed.
+Every progress report refreshes the job's ``locked_at`` as a heartbeat;
+jobs left running by a worker that died, i.e. without a report for
+``JOB_LOCK_TIMEOUT`` seconds, are requeued. Long tasks must therefore
+report progress more often than that, or they are run a second time.
+
+On SQLite, workers switch the database to WAL journaling (``JOB_SQLITE_WAL``)
+so that progress updates and the web processes are not blocked by a task
+reading a large result.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from app import db
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+class Task:
+    """
+    Registered job function.
+
+    Attributes:
+        name (str): Name used to enqueue the task
+        func (callable): Function called as ``func(context, **args)``
+        max_attempts (int): Default attempts before giving up
+    """
+
+    def __init__(self, name, func, max_attempts):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+
+
+def task(name, max_attempts=3):
+    """
+    Register a function as a job task.
+
+    The function receives a ``JobContext`` followed by the job arguments
+    and returns a JSON-serializable result.
+    """
+    def decorator(func):
+        TASKS[name] = Task(name, func, max_attempts)
+        return func
+    return decorator
+
+
+class JobContext:
+    """Handle passed to a running task to report its progress."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+
+    def progress(self, fraction, message=None):
+        """
+        Record the progress of the job.
+
+        Written on a separate connection so that it is visible immediately
+        and unaffected by the task's own transaction. Also refreshes
+        ``locked_at`` so that ``requeue_stale`` leaves the job alone.
+        """
+        values = {'progress': max(0.0, min(1.0, fraction)), 'locked_at': datetime.utcnow()}
+        if message is not None:
+            values['message'] = message[:200]
+        with db.engine.begin() as connection:
+            connection.execute(update(Job).where(Job.id == self.id, Job.status == 'running').values(**values))
+
+
+def enqueue(task_name, priority=0, delay=0, user_id=None, max_attempts=None, **args):
+    """
+    Add a job to the queue.
+
+    Args:
+        task_name (str): Registered task name
+        priority (int): Higher priorities run first
+        delay (float): Seconds before the job may run
+        user_id (int): User the job belongs to
+        max_attempts (int): Attempts before giving up; defaults to the task's
+        **args: JSON-serializable task arguments
+
+    Returns:
+        Job: The committed job
+
+    Raises:
+        ValueError: If the task is not registered
+    """
+    if task_name not in TASKS:
+        raise ValueError(f"Unknown task '{task_name}'. Must be one of: {', '.join(sorted(TASKS))}")
+    job = Job(
+        task=task_name, args=args, priority=priority, user_id=user_id,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+        max_attempts=max_attempts or TASKS[task_name].max_attempts,
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def worker_name():
+    """Identify the current worker process."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """
+    Atomically claim the next runnable job.
+
+    Returns:
+        Job: The claimed job, or None if the queue is empty
+    """
+    now = datetime.utcnow()
+    candidate = select(Job.id) \
+        .where(Job.status == 'queued', Job.run_at <= now) \
+        .order_by(Job.priority.desc(), Job.run_at, Job.id) \
+        .limit(1).with_for_update(skip_locked=True).scalar_subquery()
+    result = db.session.execute(
+        update(Job).where(Job.id == candidate, Job.status == 'queued')
+        .values(status='running', locked_by=worker, locked_at=now, attempts=Job.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount == 0:
+        return None
+    return db.session.scalars(
+        select(Job).where(Job.status == 'running', Job.locked_by == worker).order_by(Job.locked_at.desc())
+    ).first()
+
+
+def requeue_stale():
+    """
+    Release jobs whose worker stopped reporting progress.
+
+    Returns:
+        int: Number of jobs requeued or failed
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_LOCK_TIMEOUT'])
+    stale = (Job.status == 'running', Job.locked_at < cutoff)
+    failed = db.session.execute(
+        update(Job).where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status='failed', locked_by=None, error='Worker lost', finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.session.execute(
+        update(Job).where(*stale).values(status='queued', locked_by=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return failed + requeued
+
+
+def backoff(attempts):
+    """Delay in seconds before retrying after the given number of attempts."""
+    config = current_app.config
+    return min(config['JOB_RETRY_BACKOFF'] * 2 ** (attempts - 1), config['JOB_RETRY_BACKOFF_MAX'])
+
+
+def perform(job):
+    """
+    Run a claimed job and record its outcome.
+
+    Returns:
+        bool: Whether the job succeeded
+    """
+    job_id, task_name, attempts, max_attempts = job.id, job.task, job.attempts, job.max_attempts
+    registered = TASKS.get(task_name)
+    try:
+        if registered is None:
+            raise LookupError(f"Unknown task '{task_name}'")
+        result = registered.func(JobContext(job_id), **job.args)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Job %s (%s) failed on attempt %d', job_id, task_name, attempts)
+        values = {'locked_by': None, 'error': f'{type(e).__name__}: {e}'}
+        if attempts < max_attempts and registered is not None:
+            values.update(status='queued', run_at=datetime.utcnow() + timedelta(seconds=backoff(attempts)))
+        else:
+            values.update(status='failed', finished_at=datetime.utcnow())
+        db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.session.commit()
+        return False
+
+    db.session.execute(update(Job).where(Job.id == job_id).values(
+        status='succeeded', progress=1.0, result=result, locked_by=None,
+        finished_at=datetime.utcnow(),
+    ))
+    db.session.commit()
+    return True
+
+
+def _prepare_database(app):
+    if db.engine.dialect.name == 'sqlite' and app.config['JOB_SQLITE_WAL']:
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+
+def work(app, burst=False, poll_interval=None, stop=None):
+    """
+    Run jobs until stopped.
+
+    Args:
+        app (Flask): Application to run jobs in
+        burst (bool): Return once the queue is empty instead of polling
+        poll_interval (float): Seconds to wait when the queue is empty
+        stop (threading.Event): Set to stop after the current job
+
+    Returns:
+        int: Number of jobs run
+    """
+    stop = stop or threading.Event()
+    worker = worker_name()
+    count = 0
+    with app.app_context():
+        poll_interval = poll_interval or app.config['JOB_POLL_INTERVAL']
+        _prepare_database(app)
+        requeue_stale()
+        while not stop.is_set():
+            job = claim(worker)
+            if job is None:
+                if burst:
+                    break
+                requeue_stale()
+                stop.wait(poll_interval)
+                continue
+            perform(job)
+            count += 1
+            db.session.remove()
+    return count
+
+
+def run_worker_process(app, burst=False, poll_interval=None):
+    """Entry point of a forked worker process; SIGTERM stops it after the current job."""
+    from app.startup import after_fork
+
+    after_fork(app)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    work(app, burst=burst, poll_interval=poll_interval, stop=stop)
+
+
+def init_app(app):
+    """Configure the job queue and register the built-in tasks."""
+    app.config.setdefault('JOB_POLL_INTERVAL', 1.0)
+    app.config.setdefault('JOB_RETRY_BACKOFF', 10)
+    app.config.setdefault('JOB_RETRY_BACKOFF_MAX', 3600)
+    app.config.setdefault('JOB_LOCK_TIMEOUT', 3600)
+    app.config.setdefault('JOB_SQLITE_WAL', True)
+    app.config.setdefault('JOB_OUTPUT_FOLDER', os.path.join(app.instance_path, 'jobs'))
+
+    from app import tasks  # noqa: F401
@@ -0,0 +1,89 @@
+"""
+Named relationship loading profiles.
+
+Relationships stay lazy by default; each view states what it is going to
+touch by selecting a profile, which expands to the eager-loading options
+for that page::
+
+    invoices = db.session.scalars(
+        profiled('invoice_list').where(Invoice.user_id == current_user.id)
+    ).all()
+
+With ``LOADER_RAISE_ON_LAZY_LOAD`` enabled (as in the test suite), queries
+built from a profile also get ``raiseload('*')``, so touching a
+relationship the profile did not load raises instead of silently issuing
+one query per row.
+
+Collections that can grow without bound (``User.invoices``,
+``User.clients``, ``User.products``, ``User.transactions`` and
+``Product.invoice_items``) are ``dynamic`` relationships: they are queries,
+never loaded in full, and are counted or aggregated in SQL.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
+from app.models.client import Client
+from app.models.invoice import Invoice, InvoiceItem
+
+
+def _invoice_detail():
+    return (
+        joinedload(Invoice.client),
+        joinedload(Invoice.user),
+        selectinload(Invoice.items).joinedload(InvoiceItem.product),
+        selectinload(Invoice.transactions),
+    )
+
+
+def _invoice_list():
+    # Client name and payment status per row
+    return (
+        joinedload(Invoice.client),
+        selectinload(Invoice.transactions),
+    )
+
+
+def _client_list():
+    # credit_status reads the stored exposure; no invoices are needed
+    return ()
+
+
+# Profile name -> (root model, options factory)
+PROFILES = {
+    'invoice_detail': (Invoice, _invoice_detail),
+    'invoice_list': (Invoice, _invoice_list),
+    'client_list': (Client, _client_list),
+}
+
+
+def loader_options(name):
+    """
+    Get the query options of a loading profile.
+
+    Args:
+        name (str): Profile name
+
+    Returns:
+        list: Loader options for ``Select.options``/``Query.options``
+
+    Raises:
+        ValueError: If the profile does not exist
+    """
+    if name not in PROFILES:
+        raise ValueError(f"Unknown loader profile '{name}'. Must be one of: {', '.join(PROFILES)}")
+    options = list(PROFILES[name][1]())
+    if has_app_context() and current_app.config.get('LOADER_RAISE_ON_LAZY_LOAD'):
+        options.append(raiseload('*', sql_only=True))
+    return options
+
+
+def profiled(name):
+    """Build ``select(model)`` with the options of a loading profile."""
+    options = loader_options(name)
+    return select(PROFILES[name][0]).options(*options)
+
+
+def init_app(app):
+    """Configure relationship loading."""
+    app.config.setdefault('LOADER_RAISE_ON_LAZY_LOAD', False)
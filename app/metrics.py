@@ -0,0 +1,235 @@
+"""
+Prometheus metrics.
+
+``GET /metrics`` serves the text exposition format for a Prometheus server
+to scrape; nothing is pushed anywhere. Collected:
+
+* ``http_request_duration_seconds``: latency histogram per endpoint and
+  method, and ``http_requests_total`` per endpoint, method and status;
+* ``db_queries_total`` and ``db_queries_per_request``: statements executed
+  by requests, read from the per-request ``QueryStats`` of
+  ``app.instrumentation``;
+* ``db_pool_*``: connection checkouts, new connections, connections
+  currently checked out and how long they are held;
+* ``cache_requests_total``: hits and misses of the fragment, response and
+  conditional GET caches;
+* ``password_hash_seconds``: time workers spend hashing passwords;
+* ``jobs``: background jobs per status and age of the oldest queued job,
+  queried when scraped.
+
+Updating a metric is an in-memory increment, and requests record once per
+request rather than once per statement. Under gunicorn, set
+``PROMETHEUS_MULTIPROC_DIR`` (``gunicorn.conf.py`` does): every worker then
+writes its values to memory-mapped files in that directory and the scraped
+worker aggregates all of them, so any worker can answer the scrape.
+
+Scrapes must send ``Authorization: Bearer <METRICS_TOKEN>``. Without a
+configured token the endpoint only answers in debug and testing, and
+returns ``403`` everywhere else.
+
+``prometheus_client`` is optional; without it the endpoint is not
+registered and the recording helpers do nothing.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Response, abort, current_app, g, request
+from sqlalchemy import event, func, select
+from sqlalchemy.pool import Pool
+
+logger = logging.getLogger(__name__)
+
+# Metric objects, created once per process by the first init_app
+_metrics = None
+
+DB_QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+PASSWORD_HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Metrics:
+    """
+    Metric objects of the application.
+
+    Attributes:
+        registry: Registry the metrics are recorded in
+    """
+
+    def __init__(self, prometheus_client):
+        self.registry = prometheus_client.CollectorRegistry(auto_describe=True)
+        Counter, Gauge, Histogram = (prometheus_client.Counter, prometheus_client.Gauge,
+                                     prometheus_client.Histogram)
+        options = {'registry': self.registry}
+
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'Request latency', ['endpoint', 'method'], **options)
+        self.requests = Counter(
+            'http_requests', 'Requests handled', ['endpoint', 'method', 'status'], **options)
+
+        self.db_queries = Counter(
+            'db_queries', 'SQL statements executed by requests', ['endpoint'], **options)
+        self.db_queries_per_request = Histogram(
+            'db_queries_per_request', 'SQL statements per request', buckets=DB_QUERY_BUCKETS,
+            **options)
+        self.db_duration = Counter(
+            'db_query_duration_seconds', 'Time spent in SQL statements by requests', **options)
+
+        self.pool_checkouts = Counter(
+            'db_pool_checkouts', 'Connections checked out of the pool', **options)
+        self.pool_connects = Counter(
+            'db_pool_connects', 'New database connections opened', **options)
+        self.pool_checked_out = Gauge(
+            'db_pool_checked_out', 'Connections currently checked out',
+            multiprocess_mode='livesum', **options)
+        self.pool_hold = Histogram(
+            'db_pool_hold_seconds', 'Time a connection stays checked out', **options)
+
+        self.cache = Counter(
+            'cache_requests', 'Cache lookups', ['cache', 'result'], **options)
+
+        self.password_hash = Histogram(
+            'password_hash_seconds', 'Time spent hashing or verifying a password', ['operation'],
+            buckets=PASSWORD_HASH_BUCKETS, **options)
+
+
+class JobCollector:
+    """Report the background job queue, queried when scraped."""
+
+    def __init__(self, prometheus_client):
+        from prometheus_client.core import GaugeMetricFamily
+        self.GaugeMetricFamily = GaugeMetricFamily
+
+    def collect(self):
+        from app import db
+        from app.models.job import Job
+
+        jobs = self.GaugeMetricFamily('jobs', 'Background jobs by status', labels=['status'])
+        counts = dict(db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+        for status in Job.STATUS_TYPES:
+            jobs.add_metric([status], counts.get(status, 0))
+        yield jobs
+
+        oldest = db.session.scalar(select(func.min(Job.run_at)).where(Job.status == 'queued'))
+        age = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+        yield self.GaugeMetricFamily('jobs_oldest_queued_seconds',
+                                     'Age of the oldest queued job', value=max(age, 0.0))
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup."""
+    if _metrics is not None:
+        _metrics.cache.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+@contextmanager
+def time_password_hash(operation):
+    """Time a password hash ('set') or verification ('check')."""
+    if _metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _metrics.password_hash.labels(operation).observe(time.perf_counter() - started)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    _metrics.pool_connects.inc()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    _metrics.pool_checkouts.inc()
+    _metrics.pool_checked_out.inc()
+    connection_record.info['metrics_checkout_time'] = time.perf_counter()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    started = connection_record.info.pop('metrics_checkout_time', None)
+    if started is not None:
+        _metrics.pool_checked_out.dec()
+        _metrics.pool_hold.observe(time.perf_counter() - started)
+
+
+def _start_request():
+    g.metrics_start_time = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('metrics_start_time', None)
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    _metrics.request_duration.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    _metrics.requests.labels(endpoint, request.method, str(response.status_code)).inc()
+
+    stats = g.get('query_stats')
+    if stats is not None:
+        _metrics.db_queries.labels(endpoint).inc(stats.count)
+        _metrics.db_queries_per_request.observe(stats.count)
+        _metrics.db_duration.inc(stats.duration)
+    return response
+
+
+def exposition():
+    """
+    Render every metric in the text exposition format.
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    import prometheus_client
+    from prometheus_client import multiprocess
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = _metrics.registry
+    queue = prometheus_client.CollectorRegistry()
+    queue.register(JobCollector(prometheus_client))
+    body = prometheus_client.generate_latest(registry) + prometheus_client.generate_latest(queue)
+    return body, prometheus_client.CONTENT_TYPE_LATEST
+
+
+def metrics_view():
+    """Serve the metrics behind the bearer token, open only in debug and testing without one."""
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        if not (current_app.debug or current_app.testing):
+            abort(403)
+    elif request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    body, content_type = exposition()
+    response = Response(body, content_type=content_type)
+    response.cache_control.no_store = True
+    return response
+
+
+def init_app(app):
+    """Register the metrics endpoint and the request and pool hooks."""
+    global _metrics
+
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_PATH', '/metrics')
+    app.config.setdefault('METRICS_TOKEN', None)
+
+    if not app.config['METRICS_ENABLED']:
+        return
+    try:
+        import prometheus_client
+    except ImportError:
+        logger.info('prometheus_client is not installed; %s is disabled', app.config['METRICS_PATH'])
+        return
+
+    if _metrics is None:
+        _metrics = Metrics(prometheus_client)
+        event.listen(Pool, 'connect', _on_connect)
+        event.listen(Pool, 'checkout', _on_checkout)
+        event.listen(Pool, 'checkin', _on_checkin)
+
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.add_url_rule(app.config['METRICS_PATH'], 'metrics', metrics_view)
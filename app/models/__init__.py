@@ -3,4 +3,12 @@ from app.models.user import User
 from app.models.product import Product
 from app.models.client import Client
 from app.models.invoice import Invoice
-from app.models.transaction import Transaction
\ No newline at end of file
+from app.models.transaction import Transaction
+from app.models.declaration import TaxRollup
+from app.models.job import Job
+from app.models.archive import ArchivedInvoice, ArchivedInvoiceItem, ArchivedTransaction
+from app.models.recurring import RecurringInvoice, RecurringInvoiceLine
+from app.models.audit import AuditEvent
+from app.models.idempotency import IdempotencyKey
+from app.models.sync import SyncChange
+from app.models.price import ProductPrice
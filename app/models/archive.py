@@ -0,0 +1,84 @@
+from app import db
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.transaction import Transaction
+
+def _archive_table(source, name, *indexes):
+    """
+    Build an archive table with the same columns as a hot table.
+
+    Foreign keys are dropped: archived rows outlive the hot rows they were
+    copied from, and the archive is only ever written by ``app.archive``.
+    """
+    columns = [
+        db.Column(column.name, column.type, primary_key=column.primary_key,
+                  nullable=column.nullable)
+        for column in source.columns
+    ]
+    return db.Table(name, db.metadata, *columns,
+                    db.Column('archived_at', db.DateTime), *indexes)
+
+class ArchivedInvoice(db.Model):
+    """
+    ArchivedInvoice Model for closed invoices moved out of ``invoices``.
+
+    Paid and cancelled invoices of past fiscal years are moved here by
+    ``flask archive run`` with their items and transactions, keeping their
+    ids. Columns mirror ``Invoice``, plus ``archived_at``; every archived
+    invoice carries its legal snapshot so it renders from this row alone.
+
+    Relationships:
+        items: One-to-Many relationship with ArchivedInvoiceItem model
+        transactions: One-to-Many relationship with ArchivedTransaction model
+    """
+
+    __table__ = _archive_table(
+        Invoice.__table__, 'archived_invoices',
+        db.Index('ix_archived_invoices_invoice_number', 'invoice_number', unique=True),
+        db.Index('ix_archived_invoices_user_id_date', 'user_id', 'date'),
+    )
+
+    items = db.relationship('ArchivedInvoiceItem', lazy=True, viewonly=True,
+                            primaryjoin='ArchivedInvoice.id == foreign(ArchivedInvoiceItem.invoice_id)')
+    transactions = db.relationship('ArchivedTransaction', lazy=True, viewonly=True,
+                                   primaryjoin='ArchivedInvoice.id == foreign(ArchivedTransaction.invoice_id)')
+
+    @property
+    def document(self):
+        """Get the legal snapshot frozen before archiving"""
+        return self.snapshot
+
+    @property
+    def amount_paid(self):
+        """Calculate total amount paid through transactions"""
+        return sum(transaction.amount for transaction in self.transactions)
+
+    def __repr__(self):
+        return f'<ArchivedInvoice {self.invoice_number}>'
+
+class ArchivedInvoiceItem(db.Model):
+    """ArchivedInvoiceItem Model for the items of archived invoices; columns mirror ``InvoiceItem``."""
+
+    __table__ = _archive_table(
+        InvoiceItem.__table__, 'archived_invoice_items',
+        db.Index('ix_archived_invoice_items_invoice_id', 'invoice_id'),
+    )
+
+    @property
+    def subtotal(self):
+        """Calculate subtotal for this item"""
+        return self.quantity * self.unit_price
+
+    def __repr__(self):
+        return f'<ArchivedInvoiceItem {self.product_id} x{self.quantity}>'
+
+class ArchivedTransaction(db.Model):
+    """ArchivedTransaction Model for the payments of archived invoices; columns mirror ``Transaction``."""
+
+    __table__ = _archive_table(
+        Transaction.__table__, 'archived_transactions',
+        db.Index('ix_archived_transactions_invoice_id', 'invoice_id'),
+        db.Index('ix_archived_transactions_user_id_date', 'user_id', 'date'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedTransaction {self.payment_method}: {self.amount}>'
@@ -0,0 +1,138 @@
+from app import db
+from datetime import date, datetime
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.event import listens_for
+from app.models.buffer import buffer_row
+from app.models.history import previous_value, track_previous
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+
+class AuditEvent(db.Model):
+    """
+    AuditEvent Model for the append-only log of financial state changes.
+
+    Every insert, update and delete of an ``Invoice`` or ``Transaction``
+    that touches one of its ``AUDITED_ATTRIBUTES`` adds one row with the
+    before and after values of the changed attributes, written by
+    ``buffer_row`` in the transaction of the change, so the log holds
+    exactly the committed changes and can be replayed to rebuild derived
+    balances (see ``app.audit``).
+
+    Attributes:
+        id (int): Primary key, also the order of events
+        entity (str): Changed model (invoice, transaction)
+        entity_id (int): Primary key of the changed row
+        action (str): created, updated or deleted
+        changes (dict): Attribute name -> [before, after]
+        user_id (int): Supplier owning the changed row
+        actor_id (int): Logged-in user who made the change, if any
+        occurred_at (datetime): Flush timestamp
+    """
+
+    __tablename__ = 'audit_events'
+    __table_args__ = (
+        db.Index('ix_audit_events_entity', 'entity', 'entity_id', 'id'),
+    )
+
+    ACTIONS = ['created', 'updated', 'deleted']
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Changed Row
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)
+    changes = db.Column(db.JSON, nullable=False)
+
+    # Who and When
+    user_id = db.Column(db.Integer, index=True)
+    actor_id = db.Column(db.Integer)
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Serialize the event for the history endpoints"""
+        return {
+            'id': self.id,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'action': self.action,
+            'changes': self.changes,
+            'actor_id': self.actor_id,
+            'occurred_at': self.occurred_at.isoformat(),
+        }
+
+    def __repr__(self):
+        return f'<AuditEvent {self.entity} {self.entity_id} {self.action}>'
+
+@listens_for(AuditEvent, 'before_update')
+@listens_for(AuditEvent, 'before_delete')
+def refuse_changes(mapper, connection, target):
+    """Keep the log append-only"""
+    raise ValueError('Audit events are append-only')
+
+# Financial attributes recorded per audited model
+AUDITED_ATTRIBUTES = {
+    Invoice: ('status', 'client_id', 'date', 'due_date', 'total_ht', 'tva', 'tap', 'total_ttc'),
+    Transaction: ('status', 'invoice_id', 'amount', 'payment_method', 'date', 'notes'),
+}
+
+ENTITY_NAMES = {Invoice: 'invoice', Transaction: 'transaction'}
+
+# Keep old values, for the before side of each change
+for _model, _names in AUDITED_ATTRIBUTES.items():
+    track_previous(_model, *_names)
+
+def _json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _actor_id():
+    if has_request_context() and current_user and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+def _record(target, action, changes):
+    session = inspect(target).session
+    if session is None or not changes:
+        return
+    buffer_row(session, AuditEvent.__table__, {
+        'entity': ENTITY_NAMES[type(target)],
+        'entity_id': target.id,
+        'action': action,
+        'changes': changes,
+        'user_id': target.user_id,
+        'actor_id': _actor_id(),
+        'occurred_at': datetime.utcnow(),
+    })
+
+def created_changes(model, row):
+    """Changes of a created event: every audited attribute of a row, from None"""
+    return {name: [None, _json(getattr(row, name))] for name in AUDITED_ATTRIBUTES[model]}
+
+def record_insert(mapper, connection, target):
+    """Record every audited attribute of a new row"""
+    _record(target, 'created', created_changes(type(target), target))
+
+def record_update(mapper, connection, target):
+    """Record the audited attributes that changed"""
+    changes = {}
+    for name in AUDITED_ATTRIBUTES[type(target)]:
+        before = previous_value(target, name)
+        if before != getattr(target, name):
+            changes[name] = [_json(before), _json(getattr(target, name))]
+    _record(target, 'updated', changes)
+
+def record_delete(mapper, connection, target):
+    """Record the last values of a deleted row"""
+    changes = {name: [_json(previous_value(target, name)), None]
+               for name in AUDITED_ATTRIBUTES[type(target)]}
+    _record(target, 'deleted', changes)
+
+for _model in AUDITED_ATTRIBUTES:
+    event.listen(_model, 'after_insert', record_insert)
+    event.listen(_model, 'after_update', record_update)
+    event.listen(_model, 'after_delete', record_delete)
@@ -0,0 +1,50 @@
+from sqlalchemy import insert
+from sqlalchemy.event import listens_for
+from sqlalchemy.orm import Session
+
+# Table -> function called with the connection and rows before they are written
+_before_write = {}
+
+def before_write(table):
+    """Register a function to call with (connection, rows) before a table's buffered rows are written."""
+    def decorator(func):
+        _before_write[table] = func
+        return func
+    return decorator
+
+def buffer_row(session, table, row, key=None):
+    """
+    Queue a row to insert into a table once the current flush is done.
+
+    Mapper listeners run once per changed object; rows queued here are
+    written with a single multi-row INSERT per table after the flush, in
+    the same transaction, and dropped if the flush fails.
+
+    Args:
+        session (Session): Session being flushed
+        table (Table): Table to insert into
+        row (dict): Column values
+        key: Replaces the row queued earlier in the flush under the same key
+    """
+    rows = session.info.setdefault('buffered_rows', {}).setdefault(table, {})
+    # Unkeyed rows never replace one another
+    rows[object() if key is None else key] = row
+
+def buffered_row(session, table, key):
+    """Get the row queued under a key in the current flush, or None."""
+    return session.info.get('buffered_rows', {}).get(table, {}).get(key)
+
+@listens_for(Session, 'after_flush')
+def write_buffered_rows(session, flush_context):
+    """Write the rows queued during the flush, one multi-row INSERT per table"""
+    buffers = session.info.pop('buffered_rows', None)
+    for table, rows in (buffers or {}).items():
+        connection, rows = session.connection(), list(rows.values())
+        if table in _before_write:
+            _before_write[table](connection, rows)
+        connection.execute(insert(table), rows)
+
+@listens_for(Session, 'after_soft_rollback')
+def discard_buffered_rows(session, previous_transaction):
+    """Drop the rows of a flush that failed"""
+    session.info.pop('buffered_rows', None)
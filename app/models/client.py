@@ -1,5 +1,16 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.event import listens_for
+from app.models.history import previous_value, track_previous
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+
+# Invoice statuses whose unpaid amount counts against the credit limit
+EXPOSED_STATUSES = ('validated', 'pending', 'partial')
+
+class CreditLimitExceeded(ValueError):
+    """Raised when issuing an invoice would take a client over its credit limit"""
 
 class Client(db.Model):
     """
@@ -20,8 +31,11 @@ class Client(db.Model):
         rc (str): Registre de Commerce (Commercial Registry)
         art (str): Article d'Imposition (Tax Article Number)
         payment_terms (int): Payment terms in days
-        credit_limit (float): Maximum credit allowed
+        credit_limit (float): Maximum credit allowed (0 for unlimited)
+        exposure (float): Unpaid amount of issued invoices, maintained
+            atomically by the Invoice and Transaction listeners below
         created_at (datetime): Client creation timestamp
+        updated_at (datetime): Last update timestamp
         is_active (bool): Client status
         user_id (int): Foreign key to User model
     
@@ -32,10 +46,13 @@ class Client(db.Model):
     Properties:
         total_purchases: Total amount of paid invoices
         outstanding_balance: Total amount of unpaid invoices
-        credit_status: Current credit status based on limit
+        credit_status: Current credit status based on limit and exposure
     """
     
     __tablename__ = 'clients'
+    __table_args__ = (
+        db.Index('ix_clients_user_id_updated_at', 'user_id', 'updated_at'),
+    )
     
     # Primary Key
     id = db.Column(db.Integer, primary_key=True)
@@ -56,17 +73,19 @@ class Client(db.Model):
     # Financial Information
     payment_terms = db.Column(db.Integer, default=30)  # Payment terms in days
     credit_limit = db.Column(db.Float, default=0.0)    # Maximum credit allowed
+    exposure = db.Column(db.Float, default=0.0, nullable=False)  # Unpaid issued invoices
     
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     notes = db.Column(db.Text)
     
     # Foreign Keys
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('clients', lazy=True))
+    user = db.relationship('User', backref=db.backref('clients', lazy='dynamic'))
     invoices = db.relationship('Invoice', backref='client', lazy=True)
     
     @property
@@ -100,7 +119,7 @@ class Client(db.Model):
         if self.credit_limit == 0:
             return 'good'
         
-        usage_percent = (self.outstanding_balance / self.credit_limit) * 100
+        usage_percent = (self.exposure / self.credit_limit) * 100
         if usage_percent < 75:
             return 'good'
         elif usage_percent < 90:
@@ -112,6 +131,9 @@ class Client(db.Model):
         """
         Check if a new invoice can be created based on credit limit.
         
+        This is advisory: the limit is enforced when the invoice is
+        validated, by a conditional update of ``exposure``.
+        
         Args:
             amount (float): Amount of new invoice
             
@@ -120,7 +142,7 @@ class Client(db.Model):
         """
         if self.credit_limit == 0:
             return True
-        return (self.outstanding_balance + amount) <= self.credit_limit
+        return (self.exposure + amount) <= self.credit_limit
     
     def get_overdue_invoices(self):
         """
@@ -134,3 +156,109 @@ class Client(db.Model):
     
     def __repr__(self):
         return f'<Client {self.name}>'
+
+# Epsilon for float comparisons against the credit limit
+CREDIT_TOLERANCE = 0.005
+
+# Keep old values, so the listeners below know what an invoice or payment
+# contributed before
+track_previous(Invoice, 'status', 'total_ttc', 'client_id')
+track_previous(Transaction, 'status', 'amount', 'invoice_id')
+
+def adjust_exposure(connection, client_id, delta, check=False):
+    """
+    Atomically add delta to a client's exposure.
+    
+    With check, the update only applies if the client stays within its
+    credit limit; the row stays locked until the transaction ends, so
+    concurrent validations cannot both pass.
+    
+    Raises:
+        CreditLimitExceeded: If the check fails
+    """
+    if not delta or client_id is None:
+        return
+    table = Client.__table__
+    statement = update(table).where(table.c.id == client_id) \
+        .values(exposure=table.c.exposure + delta)
+    if check and delta > 0:
+        statement = statement.where(or_(
+            table.c.credit_limit == 0, table.c.credit_limit.is_(None),
+            table.c.exposure + delta <= table.c.credit_limit + CREDIT_TOLERANCE,
+        ))
+    if connection.execute(statement).rowcount == 0 and check and delta > 0:
+        raise CreditLimitExceeded(f'Invoice of {delta:.2f} exceeds the credit limit of client {client_id}')
+
+def _completed_payments(connection, invoice_id):
+    return connection.execute(
+        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        .where(Transaction.invoice_id == invoice_id, Transaction.status == 'completed')
+    ).scalar()
+
+def _invoice_exposure(connection, invoice_id, status, total_ttc):
+    if status not in EXPOSED_STATUSES:
+        return 0.0
+    return (total_ttc or 0.0) - _completed_payments(connection, invoice_id)
+
+@listens_for(Invoice, 'after_insert')
+def expose_new_invoice(mapper, connection, target):
+    """Count an invoice created directly in an issued status"""
+    if target.status in EXPOSED_STATUSES:
+        adjust_exposure(connection, target.client_id, target.total_ttc or 0.0, check=True)
+
+@listens_for(Invoice, 'after_update')
+def update_invoice_exposure(mapper, connection, target):
+    """Apply validation, cancellation, payment in full or total changes"""
+    previous = {name: previous_value(target, name) for name in ('status', 'total_ttc', 'client_id')}
+    if previous == {'status': target.status, 'total_ttc': target.total_ttc, 'client_id': target.client_id}:
+        return
+    old = _invoice_exposure(connection, target.id, previous['status'], previous['total_ttc'])
+    new = _invoice_exposure(connection, target.id, target.status, target.total_ttc)
+    if previous['client_id'] == target.client_id:
+        adjust_exposure(connection, target.client_id, new - old, check=True)
+    else:
+        adjust_exposure(connection, previous['client_id'], -old)
+        adjust_exposure(connection, target.client_id, new, check=True)
+
+@listens_for(Invoice, 'after_delete')
+def remove_invoice_exposure(mapper, connection, target):
+    """Release the unpaid amount of a deleted invoice"""
+    old = _invoice_exposure(connection, target.id, previous_value(target, 'status'),
+                            previous_value(target, 'total_ttc'))
+    adjust_exposure(connection, previous_value(target, 'client_id'), -old)
+
+def _payment_delta(connection, invoice_id, old_amount, new_amount):
+    """Reduce the exposure of the invoice's client by a change in completed payments"""
+    if old_amount == new_amount or invoice_id is None:
+        return
+    invoice = connection.execute(
+        select(Invoice.status, Invoice.client_id).where(Invoice.id == invoice_id)
+    ).first()
+    if invoice is not None and invoice.status in EXPOSED_STATUSES:
+        adjust_exposure(connection, invoice.client_id, old_amount - new_amount)
+
+def _completed_amount(status, amount):
+    return (amount or 0.0) if status == 'completed' else 0.0
+
+@listens_for(Transaction, 'after_insert')
+def apply_payment(mapper, connection, target):
+    """Lower the exposure when a completed payment is recorded"""
+    _payment_delta(connection, target.invoice_id, 0.0, _completed_amount(target.status, target.amount))
+
+@listens_for(Transaction, 'after_update')
+def update_payment(mapper, connection, target):
+    """Apply payment completion, rejection or amount changes"""
+    old = _completed_amount(previous_value(target, 'status'), previous_value(target, 'amount'))
+    new = _completed_amount(target.status, target.amount)
+    old_invoice = previous_value(target, 'invoice_id')
+    if old_invoice == target.invoice_id:
+        _payment_delta(connection, target.invoice_id, old, new)
+    else:
+        _payment_delta(connection, old_invoice, old, 0.0)
+        _payment_delta(connection, target.invoice_id, 0.0, new)
+
+@listens_for(Transaction, 'after_delete')
+def remove_payment(mapper, connection, target):
+    """Restore the exposure of a deleted completed payment"""
+    old = _completed_amount(previous_value(target, 'status'), previous_value(target, 'amount'))
+    _payment_delta(connection, previous_value(target, 'invoice_id'), old, 0.0)
\ No newline at end of file
@@ -0,0 +1,119 @@
+from app import db
+from sqlalchemy.event import listens_for
+from app.models.history import previous_value, track_previous
+from app.models.invoice import Invoice
+
+class TaxRollup(db.Model):
+    """
+    TaxRollup Model storing monthly invoice totals for the G50 declaration.
+
+    One row holds the sum of all invoices of a user dated in a given month
+    and currently in a given status. Rows are kept up to date incrementally
+    by the Invoice listeners below, within the same transaction as the
+    invoice change, and can be rebuilt from scratch with
+    ``flask declarations rebuild``.
+
+    Attributes:
+        id (int): Primary key
+        user_id (int): Foreign key to User model
+        year (int): Invoice year
+        month (int): Invoice month (1-12)
+        status (str): Invoice status
+        invoice_count (int): Number of invoices
+        total_ht (float): Sum of totals without taxes
+        tva (float): Sum of TVA amounts
+        tap (float): Sum of TAP amounts
+        total_ttc (float): Sum of totals with taxes
+    """
+
+    __tablename__ = 'tax_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', 'month', 'status', name='uq_tax_rollups_period'),
+    )
+
+    # Measures adjusted by every invoice change
+    MEASURES = ('invoice_count', 'total_ht', 'tva', 'tap', 'total_ttc')
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Period
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+
+    # Totals
+    invoice_count = db.Column(db.Integer, default=0, nullable=False)
+    total_ht = db.Column(db.Float, default=0.0, nullable=False)
+    tva = db.Column(db.Float, default=0.0, nullable=False)
+    tap = db.Column(db.Float, default=0.0, nullable=False)
+    total_ttc = db.Column(db.Float, default=0.0, nullable=False)
+
+    def __repr__(self):
+        return f'<TaxRollup {self.user_id} {self.year}-{self.month:02d} {self.status}>'
+
+# Invoice attributes a rollup row depends on
+ROLLUP_ATTRIBUTES = ('user_id', 'date', 'status', 'total_ht', 'tva', 'tap', 'total_ttc')
+
+# Keep old values, so that after_update can tell which rollup row the
+# invoice is leaving
+track_previous(Invoice, *ROLLUP_ATTRIBUTES)
+
+def adjust_rollup(connection, key, deltas):
+    """Add deltas to one rollup row, creating it if needed."""
+    table = TaxRollup.__table__
+    if connection.dialect.name in ('sqlite', 'postgresql'):
+        if connection.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(**key, **deltas)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={name: table.c[name] + statement.excluded[name] for name in deltas},
+        )
+        connection.execute(statement)
+        return
+
+    update = table.update().values({name: table.c[name] + value for name, value in deltas.items()})
+    for name, value in key.items():
+        update = update.where(table.c[name] == value)
+    if connection.execute(update).rowcount == 0:
+        connection.execute(table.insert().values(**key, **deltas))
+
+def _apply(connection, values, sign):
+    """Add (sign=1) or remove (sign=-1) an invoice's contribution."""
+    if values['user_id'] is None or values['date'] is None:
+        return
+    key = dict(user_id=values['user_id'], year=values['date'].year,
+               month=values['date'].month, status=values['status'] or 'draft')
+    deltas = dict(invoice_count=sign)
+    for name in ('total_ht', 'tva', 'tap', 'total_ttc'):
+        deltas[name] = sign * (values[name] or 0.0)
+    adjust_rollup(connection, key, deltas)
+
+def _current_values(target):
+    return {name: getattr(target, name) for name in ROLLUP_ATTRIBUTES}
+
+def _previous_values(target):
+    return {name: previous_value(target, name) for name in ROLLUP_ATTRIBUTES}
+
+@listens_for(Invoice, 'after_insert')
+def add_to_rollup(mapper, connection, target):
+    """Count a new invoice in its month's rollup"""
+    _apply(connection, _current_values(target), 1)
+
+@listens_for(Invoice, 'after_update')
+def move_in_rollup(mapper, connection, target):
+    """Move an invoice's contribution when its status, date or totals change"""
+    previous, current = _previous_values(target), _current_values(target)
+    if previous == current:
+        return
+    _apply(connection, previous, -1)
+    _apply(connection, current, 1)
+
+@listens_for(Invoice, 'after_delete')
+def remove_from_rollup(mapper, connection, target):
+    """Remove a deleted invoice from its month's rollup"""
+    _apply(connection, _previous_values(target), -1)
@@ -0,0 +1,26 @@
+from sqlalchemy import inspect
+from sqlalchemy.event import listen
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    pass
+
+def track_previous(model, *names):
+    """
+    Keep the previous values of model attributes until the next flush.
+
+    An expired attribute is not loaded before it is overwritten, so its
+    history would not know the old value. A no-op set listener with
+    ``active_history`` makes SQLAlchemy load it first, for
+    ``previous_value`` to read in ``after_update`` and ``after_delete``.
+
+    Args:
+        model: Mapped class
+        *names (str): Attribute names
+    """
+    for name in names:
+        listen(getattr(model, name), 'set', _load_previous_value, active_history=True)
+
+def previous_value(target, name):
+    """Get an attribute's value before the pending change, or its value if unchanged."""
+    history = inspect(target).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(target, name)
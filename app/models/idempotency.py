@@ -0,0 +1,51 @@
+from app import db
+from datetime import datetime
+
+class IdempotencyKey(db.Model):
+    """
+    IdempotencyKey Model for replaying the response of retried POST requests.
+
+    A client sends the same ``Idempotency-Key`` header on every retry of a
+    request. The first request inserts the row while it runs
+    (``in_progress``) and stores its response once done (``completed``);
+    retries get the stored response back instead of running the view again
+    (see ``app.idempotency``).
+
+    Attributes:
+        id (int): Primary key
+        user_id (int): Foreign key to User model; keys are scoped per user
+        key (str): Client-chosen key
+        fingerprint (str): SHA-256 of the method, path and body of the request
+        status (str): in_progress or completed
+        response_status (int): HTTP status of the stored response
+        response_body (bytes): Body of the stored response
+        response_headers (dict): Content-Type and Location of the stored response
+        created_at (datetime): When the first request started
+        expires_at (datetime): When the key may be reused and the row purged
+    """
+
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+    )
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Key
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_progress')
+
+    # Stored Response
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.LargeBinary)
+    response_headers = db.Column(db.JSON)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key} {self.status}>'
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime, timedelta
+from flask import current_app
 from sqlalchemy.event import listens_for
 
 class InvoiceItem(db.Model):
@@ -40,7 +41,7 @@ class InvoiceItem(db.Model):
     description = db.Column(db.String(200))
     
     # Relationships
-    product = db.relationship('Product')
+    product = db.relationship('Product', back_populates='invoice_items')
     
     @property
     def subtotal(self):
@@ -48,7 +49,7 @@ class InvoiceItem(db.Model):
         return self.quantity * self.unit_price
     
     def __repr__(self):
-        return f'<InvoiceItem {self.product.name} x{self.quantity}>'
+        return f'<InvoiceItem {self.product_id} x{self.quantity}>'
 
 class Invoice(db.Model):
     """
@@ -72,6 +73,15 @@ class Invoice(db.Model):
         tap (float): TAP amount (2%)
         total_ttc (float): Total amount including taxes
         
+        # Legal Snapshot
+        snapshot (dict): Supplier, client and item details frozen when the
+            invoice is validated, so that validated invoices render from a
+            single row and do not change when products or clients are edited
+        
+        # Recurring Billing
+        recurring_id (int): Foreign key to the RecurringInvoice it was generated from
+        billing_period (str): Month billed by a generated invoice (YYYY-MM)
+        
     Relationships:
         user: Many-to-One relationship with User model
         client: Many-to-One relationship with Client model
@@ -83,9 +93,14 @@ class Invoice(db.Model):
         amount_due: Remaining amount to be paid
         is_overdue: Whether payment is overdue
         payment_status: Current payment status
+        document: Snapshot, or the same structure built from live records
     """
     
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_user_id_updated_at', 'user_id', 'updated_at'),
+        db.UniqueConstraint('recurring_id', 'billing_period', name='uq_invoices_recurring_period'),
+    )
     
     # Primary Key
     id = db.Column(db.Integer, primary_key=True)
@@ -106,6 +121,13 @@ class Invoice(db.Model):
     tap = db.Column(db.Float, default=0.0)         # TAP amount (2%)
     total_ttc = db.Column(db.Float, default=0.0)   # Total TTC (with taxes)
     
+    # Legal Snapshot (set on validation)
+    snapshot = db.Column(db.JSON)
+    
+    # Recurring Billing (set by app.recurring)
+    recurring_id = db.Column(db.Integer, db.ForeignKey('recurring_invoices.id'))
+    billing_period = db.Column(db.String(7))
+    
     # Additional Information
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -114,7 +136,7 @@ class Invoice(db.Model):
     # Relationships
     items = db.relationship('InvoiceItem', backref='invoice', lazy=True,
                           cascade='all, delete-orphan')
-    user = db.relationship('User', backref=db.backref('invoices', lazy=True))
+    user = db.relationship('User', backref=db.backref('invoices', lazy='dynamic'))
     transactions = db.relationship('Transaction', backref='invoice', lazy=True,
                                  cascade='all, delete-orphan')
     
@@ -124,14 +146,17 @@ class Invoice(db.Model):
         Updates total_ht, tva, tap, and total_ttc fields.
         """
         self.total_ht = sum(item.subtotal for item in self.items)
-        self.tva = self.total_ht * 0.19  # 19% TVA
-        self.tap = self.total_ht * 0.02  # 2% TAP
+        self.tva = self.total_ht * current_app.config['TVA_RATE']
+        self.tap = self.total_ht * current_app.config['TAP_RATE']
         self.total_ttc = self.total_ht + self.tva + self.tap
     
     def add_item(self, product, quantity):
         """
         Add a product to the invoice.
         
+        A back-dated invoice is billed at the selling price in effect on
+        its date, looked up in the price history.
+        
         Args:
             product (Product): Product to add
             quantity (int): Quantity to add
@@ -139,15 +164,86 @@ class Invoice(db.Model):
         Returns:
             InvoiceItem: Created invoice item
         """
+        unit_price = product.selling_price
+        if self.is_backdated and product.id is not None:
+            from app.pricing import price_at
+            price = price_at(product.id, self.date)
+            if price is not None:
+                unit_price = price.selling_price
         item = InvoiceItem(
             product=product,
             quantity=quantity,
-            unit_price=product.selling_price
+            unit_price=unit_price
         )
         self.items.append(item)
         self.calculate_totals()
         return item
     
+    def build_snapshot(self):
+        """
+        Build the legal snapshot of the invoice from the live records.
+        
+        Returns:
+            dict: Supplier and client legal identifiers, items with their
+            product name and reference, and totals
+        """
+        supplier, client = self.user, self.client
+        return {
+            'invoice_number': self.invoice_number,
+            'date': self.date.isoformat() if self.date else None,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'supplier': {
+                'company_name': supplier.company_name,
+                'address': supplier.address,
+                'phone': supplier.phone,
+                'nif': supplier.nif,
+                'nis': supplier.nis,
+                'rc': supplier.rc,
+                'art': supplier.art,
+            },
+            'client': {
+                'name': client.name,
+                'address': client.address,
+                'phone': client.phone,
+                'nif': client.nif,
+                'nis': client.nis,
+                'rc': client.rc,
+                'art': client.art,
+            },
+            'items': [{
+                'product_id': item.product_id,
+                'reference': item.product.reference,
+                'name': item.product.name,
+                'description': item.description,
+                'quantity': item.quantity,
+                'unit_price': item.unit_price,
+                'subtotal': item.subtotal,
+            } for item in sorted(self.items, key=lambda item: item.id or 0)],
+            'totals': {
+                'total_ht': self.total_ht,
+                'tva': self.tva,
+                'tap': self.tap,
+                'total_ttc': self.total_ttc,
+            },
+        }
+    
+    def validate(self):
+        """
+        Validate a draft invoice and freeze its legal snapshot.
+        
+        Raises:
+            ValueError: If the invoice is not a draft
+        """
+        if self.status not in (None, 'draft'):
+            raise ValueError(f'Invoice {self.invoice_number} is {self.status}, not draft')
+        self.snapshot = self.build_snapshot()
+        self.status = 'validated'
+    
+    @property
+    def document(self):
+        """Get the frozen snapshot, or build it from live records for drafts"""
+        return self.snapshot if self.snapshot is not None else self.build_snapshot()
+    
     @property
     def amount_paid(self):
         """Calculate total amount paid through transactions"""
@@ -165,6 +261,13 @@ class Invoice(db.Model):
             return datetime.utcnow() > self.due_date
         return False
     
+    @property
+    def is_backdated(self):
+        """Check if the invoice is dated before today"""
+        if self.date is None:
+            return False
+        return self.date.date() < datetime.utcnow().date()
+    
     @property
     def payment_status(self):
         """
@@ -209,3 +312,9 @@ def set_due_date(mapper, connection, target):
     """Set due date based on client's payment terms if not provided"""
     if not target.due_date and target.client:
         target.due_date = target.date + timedelta(days=target.client.payment_terms)
+
+@listens_for(Invoice, 'before_update')
+def freeze_snapshot(mapper, connection, target):
+    """Take the snapshot of invoices leaving draft without going through validate()"""
+    if target.snapshot is None and target.status not in (None, 'draft', 'cancelled'):
+        target.snapshot = target.build_snapshot()
\ No newline at end of file
@@ -0,0 +1,92 @@
+from app import db
+from datetime import datetime
+
+class Job(db.Model):
+    """
+    Job Model for the database-backed background job queue.
+
+    Each row is one call of a registered task (see ``app.jobs``). Workers
+    claim queued rows whose ``run_at`` has passed, highest priority first,
+    and record progress, the result or the error on the row.
+
+    Attributes:
+        id (int): Primary key
+        task (str): Registered task name
+        args (dict): Keyword arguments passed to the task
+        status (str): Job status (queued, running, succeeded, failed)
+        priority (int): Higher priorities are claimed first
+        attempts (int): Number of times the job has been started
+        max_attempts (int): Attempts before the job is marked failed
+        run_at (datetime): Earliest time the job may be claimed
+        locked_by (str): Worker currently running the job
+        locked_at (datetime): When the worker claimed the job
+        progress (float): Completion between 0 and 1
+        message (str): Latest progress message
+        result (dict): Value returned by the task
+        error (str): Last error, kept while retrying
+        user_id (int): Foreign key to User model, for jobs started by a user
+        created_at (datetime): Enqueue timestamp
+        finished_at (datetime): Success or final failure timestamp
+    """
+
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_claim', 'status', 'priority', 'run_at'),
+    )
+
+    STATUS_TYPES = ['queued', 'running', 'succeeded', 'failed']
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Task
+    task = db.Column(db.String(100), nullable=False)
+    args = db.Column(db.JSON, nullable=False, default=dict)
+
+    # Scheduling
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+
+    # Outcome
+    progress = db.Column(db.Float, nullable=False, default=0.0)
+    message = db.Column(db.String(200))
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+
+    # Owner
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def is_finished(self):
+        """Whether the job succeeded or failed for good"""
+        return self.status in ('succeeded', 'failed')
+
+    def to_dict(self):
+        """Serialize the job for the status endpoint"""
+        return {
+            'id': self.id,
+            'task': self.task,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.task} {self.status}>'
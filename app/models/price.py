@@ -0,0 +1,71 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import inspect
+from sqlalchemy.event import listens_for
+from app.models.buffer import buffer_row
+from app.models.history import previous_value, track_previous
+from app.models.product import Product
+
+class ProductPrice(db.Model):
+    """
+    ProductPrice Model for the price history of products.
+
+    ``Product.purchase_price`` and ``selling_price`` are overwritten in
+    place; every insert of a product and every change of either price adds
+    a row here, valid from the time of the change until the next row of the
+    same product, in the transaction of the change (see ``buffer_row``).
+    Point-in-time lookups are served by the ``(product_id, valid_from)``
+    index (see ``app.pricing``).
+
+    Attributes:
+        id (int): Primary key
+        product_id (int): Foreign key to Product model
+        purchase_price (float): Purchase price from valid_from
+        selling_price (float): Selling price from valid_from
+        valid_from (datetime): When the prices took effect
+    """
+
+    __tablename__ = 'product_prices'
+    __table_args__ = (
+        db.Index('ix_product_prices_product_id_valid_from', 'product_id', 'valid_from'),
+    )
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Prices
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    purchase_price = db.Column(db.Float, nullable=False)
+    selling_price = db.Column(db.Float, nullable=False)
+    valid_from = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ProductPrice {self.product_id} {self.valid_from:%Y-%m-%d} {self.selling_price}>'
+
+# Product attributes kept in the history
+PRICE_ATTRIBUTES = ('purchase_price', 'selling_price')
+
+# Keep old values, so that after_update can tell whether a price changed
+track_previous(Product, *PRICE_ATTRIBUTES)
+
+def _record(target, valid_from):
+    session = inspect(target).session
+    if session is None:
+        return
+    buffer_row(session, ProductPrice.__table__, {
+        'product_id': target.id,
+        'purchase_price': target.purchase_price,
+        'selling_price': target.selling_price,
+        'valid_from': valid_from or datetime.utcnow(),
+    })
+
+@listens_for(Product, 'after_insert')
+def record_initial_price(mapper, connection, target):
+    """Record the prices of a new product"""
+    _record(target, target.created_at)
+
+@listens_for(Product, 'after_update')
+def record_price_change(mapper, connection, target):
+    """Record the new prices when either of them changed"""
+    if any(previous_value(target, name) != getattr(target, name) for name in PRICE_ATTRIBUTES):
+        _record(target, datetime.utcnow())
@@ -27,7 +27,7 @@ class Product(db.Model):
     
     Relationships:
         user: Many-to-One relationship with User model
-        invoice_items: One-to-Many relationship with InvoiceItem model
+        invoice_items: One-to-Many relationship with InvoiceItem model (dynamic query)
     
     Properties:
         margin: Calculated profit margin percentage
@@ -37,6 +37,9 @@ class Product(db.Model):
     """
     
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_user_id_updated_at', 'user_id', 'updated_at'),
+    )
     
     # Primary Key
     id = db.Column(db.Integer, primary_key=True)
@@ -67,8 +70,8 @@ class Product(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('products', lazy=True))
-    invoice_items = db.relationship('InvoiceItem', backref='product', lazy=True)
+    user = db.relationship('User', backref=db.backref('products', lazy='dynamic'))
+    invoice_items = db.relationship('InvoiceItem', back_populates='product', lazy='dynamic')
     
     @property
     def margin(self):
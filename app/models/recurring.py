@@ -0,0 +1,113 @@
+from app import db
+from datetime import datetime
+
+class RecurringInvoiceLine(db.Model):
+    """
+    RecurringInvoiceLine Model for the lines billed by a recurring template.
+
+    Attributes:
+        id (int): Primary key
+        template_id (int): Foreign key to RecurringInvoice model
+        product_id (int): Foreign key to Product model
+        quantity (int): Quantity billed every period
+        unit_price (float): Fixed unit price, or None to bill the product's
+            selling price at generation time
+        description (str): Optional item description
+
+    Relationships:
+        product: Many-to-One relationship with Product model
+    """
+
+    __tablename__ = 'recurring_invoice_lines'
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Foreign Keys
+    template_id = db.Column(db.Integer, db.ForeignKey('recurring_invoices.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+
+    # Line Details
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float)
+    description = db.Column(db.String(200))
+
+    # Relationships
+    product = db.relationship('Product')
+
+    def __repr__(self):
+        return f'<RecurringInvoiceLine {self.product_id} x{self.quantity}>'
+
+class RecurringInvoice(db.Model):
+    """
+    RecurringInvoice Model for invoices billed to a client every month.
+
+    ``flask recurring generate`` creates one draft invoice per active
+    template and billing period (see ``app.recurring``). Generated invoices
+    reference their template and period, which makes generation idempotent.
+
+    Attributes:
+        id (int): Primary key
+        name (str): Template name
+        user_id (int): Foreign key to User model
+        client_id (int): Foreign key to Client model
+        start_date (datetime): First day billed
+        end_date (datetime): Last day billed, or None while ongoing
+        notes (str): Notes copied to every generated invoice
+        is_active (bool): Whether the template is billed
+        created_at (datetime): Template creation timestamp
+        updated_at (datetime): Last update timestamp
+
+    Relationships:
+        user: Many-to-One relationship with User model
+        client: Many-to-One relationship with Client model
+        lines: One-to-Many relationship with RecurringInvoiceLine model
+    """
+
+    __tablename__ = 'recurring_invoices'
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Template Information
+    name = db.Column(db.String(120), nullable=False)
+    start_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    end_date = db.Column(db.DateTime)
+    notes = db.Column(db.Text)
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+
+    # Foreign Keys
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=False)
+
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    user = db.relationship('User')
+    client = db.relationship('Client')
+    lines = db.relationship('RecurringInvoiceLine', backref='template', lazy=True,
+                            cascade='all, delete-orphan')
+
+    def add_line(self, product, quantity, unit_price=None, description=None):
+        """
+        Add a product to the template.
+
+        Args:
+            product (Product): Product to bill
+            quantity (int): Quantity billed every period
+            unit_price (float): Fixed unit price; defaults to the product's
+                selling price when each invoice is generated
+            description (str): Optional item description
+
+        Returns:
+            RecurringInvoiceLine: Created line
+        """
+        line = RecurringInvoiceLine(product=product, quantity=quantity, unit_price=unit_price,
+                                    description=description)
+        self.lines.append(line)
+        return line
+
+    def __repr__(self):
+        return f'<RecurringInvoice {self.name}>'
@@ -0,0 +1,125 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select
+from app.models.buffer import before_write, buffer_row, buffered_row
+from app.models.product import Product
+from app.models.client import Client
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.transaction import Transaction
+
+class SyncChange(db.Model):
+    """
+    SyncChange Model for the change sequence served to offline clients.
+
+    Every insert, update and delete of a synced row appends one entry; the
+    autoincrement id is the change sequence that sync tokens refer to (see
+    ``app.sync``). Writers of a user's entries are serialised until they
+    commit (see ``lock_sequence``), so the ids of a user follow commit
+    order. Deletes are kept as tombstones so devices
+    learn about them. Older entries of a row superseded by a newer one are
+    removed by ``flask sync compact``.
+
+    Attributes:
+        id (int): Primary key and change sequence number
+        entity (str): Synced resource (products, clients, invoices, transactions)
+        entity_id (int): Primary key of the changed row
+        user_id (int): Supplier owning the row
+        deleted (bool): Whether the row was deleted (tombstone)
+        changed_at (datetime): Flush timestamp
+    """
+
+    __tablename__ = 'sync_changes'
+    __table_args__ = (
+        db.Index('ix_sync_changes_user_id_id', 'user_id', 'id'),
+        db.Index('ix_sync_changes_entity', 'entity', 'entity_id', 'id'),
+    )
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Changed Row
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SyncChange {self.id} {self.entity} {self.entity_id}>'
+
+# First key of the advisory locks ordering a user's change sequence
+SEQUENCE_LOCK = 0x53594e43
+
+def lock_sequence(connection, user_ids):
+    """
+    Make the change sequence of users follow commit order.
+
+    Ids are assigned when entries are inserted, not when they commit. On
+    PostgreSQL, a transaction-scoped advisory lock per user is taken before
+    inserting, so a writer waits for the previous writer of that user to
+    commit and its ids come after every entry a device can already see.
+    Locks are taken in user order; SQLite serialises writers by itself.
+
+    Args:
+        connection (Connection): Connection of the inserting transaction
+        user_ids (iterable): Users whose entries are about to be inserted
+    """
+    if connection.dialect.name != 'postgresql':
+        return
+    for user_id in sorted(set(user_ids)):
+        connection.execute(select(func.pg_advisory_xact_lock(SEQUENCE_LOCK, user_id)))
+
+# Synced model -> resource name
+SYNCED_MODELS = {
+    Product: 'products',
+    Client: 'clients',
+    Invoice: 'invoices',
+    Transaction: 'transactions',
+}
+
+def _queue(target, entity, entity_id, user_id, deleted):
+    session = inspect(target).session
+    if session is None or entity_id is None:
+        return
+    # One entry per row and flush; a tombstone is never replaced
+    queued = buffered_row(session, SyncChange.__table__, (entity, entity_id))
+    if queued is not None and queued['deleted']:
+        return
+    buffer_row(session, SyncChange.__table__, {
+        'entity': entity, 'entity_id': entity_id, 'user_id': user_id,
+        'deleted': deleted, 'changed_at': datetime.utcnow(),
+    }, key=(entity, entity_id))
+
+def record_upsert(mapper, connection, target):
+    """Queue a change of a synced row"""
+    _queue(target, SYNCED_MODELS[type(target)], target.id, target.user_id, False)
+
+def record_delete(mapper, connection, target):
+    """Queue the tombstone of a deleted row"""
+    _queue(target, SYNCED_MODELS[type(target)], target.id, target.user_id, True)
+
+for _model in SYNCED_MODELS:
+    event.listen(_model, 'after_insert', record_upsert)
+    event.listen(_model, 'after_update', record_upsert)
+    event.listen(_model, 'after_delete', record_delete)
+
+def record_item_change(mapper, connection, target):
+    """Items are synced inside their invoice"""
+    # Avoid loading the invoice during the flush when it is not in memory
+    invoice = inspect(target).dict.get('invoice')
+    if invoice is not None:
+        user_id = invoice.user_id
+    else:
+        user_id = connection.execute(
+            select(Invoice.user_id).where(Invoice.id == target.invoice_id)
+        ).scalar()
+    if user_id is not None:
+        _queue(target, 'invoices', target.invoice_id, user_id, False)
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(InvoiceItem, _event_name, record_item_change)
+
+@before_write(SyncChange.__table__)
+def lock_buffered_sequence(connection, rows):
+    """Lock the sequence of the users of a flush's entries"""
+    lock_sequence(connection, [row['user_id'] for row in rows])
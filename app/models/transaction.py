@@ -58,7 +58,7 @@ class Transaction(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('transactions', lazy=True))
+    user = db.relationship('User', backref=db.backref('transactions', lazy='dynamic'))
     
     def __init__(self, **kwargs):
         """Initialize transaction with validation"""
@@ -100,7 +100,8 @@ class Transaction(db.Model):
         """
         self.status = 'rejected'
         if reason:
-            self.notes = f"Rejected: {reason}"
+            # Keep earlier notes; the change is also in the audit log
+            self.notes = f"{self.notes}\nRejected: {reason}" if self.notes else f"Rejected: {reason}"
         db.session.commit()
     
     @property
@@ -2,6 +2,9 @@ from app import db, login_manager
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy import func
+from app.metrics import time_password_hash
+from app.models.invoice import Invoice
 
 class User(UserMixin, db.Model):
     """
@@ -26,7 +29,7 @@ class User(UserMixin, db.Model):
         is_active (bool): Account status
         last_login (datetime): Last login timestamp
     
-    Relationships:
+    Relationships (dynamic queries, never loaded in full):
         products: One-to-Many relationship with Product model
         clients: One-to-Many relationship with Client model
         invoices: One-to-Many relationship with Invoice model
@@ -61,26 +64,34 @@ class User(UserMixin, db.Model):
     
     def set_password(self, password):
         """Hash and set user password"""
-        self.password_hash = generate_password_hash(password)
+        with time_password_hash('set'):
+            self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
         """Verify password against stored hash"""
-        return check_password_hash(self.password_hash, password)
+        with time_password_hash('check'):
+            return check_password_hash(self.password_hash, password)
     
     def update_last_login(self):
         """Update the last login timestamp"""
         self.last_login = datetime.utcnow()
         db.session.commit()
     
+    def _invoice_total(self, status):
+        """Sum the TTC totals of the user's invoices in a status, in SQL"""
+        total = self.invoices.filter_by(status=status) \
+            .with_entities(func.sum(Invoice.total_ttc)).scalar()
+        return total or 0.0
+    
     @property
     def total_sales(self):
         """Calculate total sales amount for all paid invoices"""
-        return sum(invoice.total_ttc for invoice in self.invoices if invoice.status == 'paid')
+        return self._invoice_total('paid')
     
     @property
     def pending_payments(self):
         """Calculate total pending payments from all unpaid invoices"""
-        return sum(invoice.total_ttc for invoice in self.invoices if invoice.status == 'pending')
+        return self._invoice_total('pending')
 
 @login_manager.user_loader
 def load_user(id):
@@ -0,0 +1,129 @@
+"""
+Point-in-time product prices.
+
+``ProductPrice`` keeps every price a product has had (see
+``app.models.price``). The price of a product at a given time is the row
+with the latest ``valid_from`` not after it, found with one seek on the
+``(product_id, valid_from)`` index. A time before the first row falls back
+to the earliest row, and a product without history to its current prices.
+
+``prices_at`` resolves many (product, time) pairs with one query: the pairs
+are sent as a ``UNION ALL`` of one-row selects and each is joined to its
+history row through a correlated subquery::
+
+    prices = prices_at([(item.product_id, invoice.date) for item in items])
+    cost = prices[item.product_id, invoice.date].purchase_price
+
+``price_row_id`` is the same lookup as a SQL expression, for reports that
+join invoice items to the price they were sold at.
+
+Products inserted with Core (``flask seed``) bypass the listeners;
+``record_missing_prices`` gives each of them its first history row.
+"""
+from collections import namedtuple
+from datetime import datetime, date, time
+
+from sqlalchemy import DateTime, Integer, func, insert, literal, select, union_all
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models.price import ProductPrice
+from app.models.product import Product
+
+# Prices of a product at a point in time
+Price = namedtuple('Price', ['purchase_price', 'selling_price'])
+
+# Pairs per query, below SQLite's limit of 500 terms in a compound select
+LOOKUP_BATCH_SIZE = 250
+
+
+def price_row_id(product_id, at):
+    """
+    Build the SQL expression selecting the history row in effect.
+
+    Args:
+        product_id: Column or value of the product id
+        at: Column or value of the point in time
+
+    Returns:
+        The ``ProductPrice.id`` in effect, NULL without history
+    """
+    # Aliased so that it never correlates with a ProductPrice of the outer query
+    history = aliased(ProductPrice)
+    latest = select(history.id) \
+        .where(history.product_id == product_id, history.valid_from <= at) \
+        .order_by(history.valid_from.desc(), history.id.desc()) \
+        .limit(1).scalar_subquery()
+    earliest = select(history.id) \
+        .where(history.product_id == product_id) \
+        .order_by(history.valid_from, history.id) \
+        .limit(1).scalar_subquery()
+    return func.coalesce(latest, earliest)
+
+
+def _moment(value):
+    # A date means the end of that day
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time.max)
+    raise ValueError(f'Expected a date or datetime, got {value!r}')
+
+
+def prices_at(pairs):
+    """
+    Resolve the prices of many products at many points in time.
+
+    Args:
+        pairs (iterable): (product_id, date or datetime) pairs
+
+    Returns:
+        dict: Pair -> Price; products that do not exist are left out
+
+    Raises:
+        ValueError: If a point in time is not a date or datetime
+    """
+    pairs = list(dict.fromkeys(pairs))
+    prices = {}
+    for start in range(0, len(pairs), LOOKUP_BATCH_SIZE):
+        batch = pairs[start:start + LOOKUP_BATCH_SIZE]
+        # SQLite cannot name the columns of a VALUES list in FROM
+        wanted = union_all(*(
+            select(literal(product_id, Integer).label('product_id'),
+                   literal(_moment(at), DateTime).label('at'),
+                   literal(position, Integer).label('position'))
+            for position, (product_id, at) in enumerate(batch)
+        )).subquery('wanted')
+        statement = select(
+            wanted.c.position,
+            func.coalesce(ProductPrice.purchase_price, Product.purchase_price),
+            func.coalesce(ProductPrice.selling_price, Product.selling_price),
+        ).select_from(wanted) \
+            .join(Product, Product.id == wanted.c.product_id) \
+            .outerjoin(ProductPrice, ProductPrice.id == price_row_id(wanted.c.product_id, wanted.c.at))
+        for position, purchase_price, selling_price in db.session.execute(statement):
+            prices[batch[position]] = Price(purchase_price, selling_price)
+    return prices
+
+
+def price_at(product_id, at):
+    """Get the Price of one product at a point in time, or None."""
+    return prices_at([(product_id, at)]).get((product_id, at))
+
+
+def record_missing_prices():
+    """
+    Give every product without history a row with its current prices.
+
+    Returns:
+        int: Number of rows added
+    """
+    missing = select(
+        Product.id, Product.purchase_price, Product.selling_price,
+        func.coalesce(Product.created_at, datetime.utcnow()),
+    ).where(~select(ProductPrice.id).where(ProductPrice.product_id == Product.id).exists())
+    result = db.session.execute(insert(ProductPrice).from_select(
+        ['product_id', 'purchase_price', 'selling_price', 'valid_from'], missing,
+    ))
+    db.session.commit()
+    return result.rowcount
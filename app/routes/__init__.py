@@ -6,18 +6,26 @@ auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 products_bp = Blueprint('products', __name__, url_prefix='/products')
 clients_bp = Blueprint('clients', __name__, url_prefix='/clients')
 invoices_bp = Blueprint('invoices', __name__, url_prefix='/invoices')
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
 def init_app(app):
     """Register blueprints with the Flask application."""
+    app.config.setdefault('API_PAGE_SIZE', 50)
+    app.config.setdefault('API_MAX_PAGE_SIZE', 200)
+    app.config.setdefault('SYNC_PAGE_SIZE', 500)
+    app.config.setdefault('SYNC_MAX_PAGE_SIZE', 2000)
+
     # Import views here to avoid circular imports
     from .auth import auth_bp
     from .main import main_bp
     from .products import products_bp
     from .clients import clients_bp
     from .invoices import invoices_bp
+    from .api import api_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(products_bp)
     app.register_blueprint(clients_bp)
-    app.register_blueprint(invoices_bp)
\ No newline at end of file
+    app.register_blueprint(invoices_bp)
+    app.register_blueprint(api_bp)
\ No newline at end of file
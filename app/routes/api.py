@@ -0,0 +1,432 @@
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import abort, current_app, jsonify, request, send_from_directory, url_for
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+from app.routes import api_bp
+from app import db
+from app.http_cache import conditional
+from app.idempotency import idempotent
+from app.serializers import RESOURCES, get_one, list_page
+from app.sync import compress, negotiate_encoding, sync_page, MIN_COMPRESS_SIZE
+from app.statements import month_range, opening_balances, statement_page
+from app.archive import find_invoice
+from app.audit import history
+from app.declarations import monthly_declarations
+from app.export import DATASETS, FORMATS, year_range
+from app.jobs import enqueue
+from app.models.archive import ArchivedInvoice
+from app.models.job import Job
+from app.models.product import Product
+from app.models.client import Client, CreditLimitExceeded
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+
+
+def api_login_required(view):
+    """Answer 401 instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@api_bp.errorhandler(HTTPException)
+def handle_http_error(error):
+    """Render API errors as JSON."""
+    response = jsonify(error=error.description)
+    response.status_code = error.code
+    return response
+
+
+def _parse_query(resource):
+    """Read include and fields[...] parameters, answering 400 when invalid."""
+    try:
+        includes = resource.parse_includes(request.args.get('include'))
+        fields = {resource.name: resource.parse_fields(request.args.get(f'fields[{resource.name}]'))}
+        for name in includes:
+            child = RESOURCES[resource.includes[name].resource]
+            fields[child.name] = child.parse_fields(request.args.get(f'fields[{child.name}]'))
+    except ValueError as e:
+        abort(400, description=str(e))
+    return fields, includes
+
+
+def _list(name):
+    resource = RESOURCES[name]
+    fields, includes = _parse_query(resource)
+    try:
+        limit = int(request.args.get('limit', current_app.config['API_PAGE_SIZE']))
+    except ValueError:
+        abort(400, description='limit must be an integer')
+    limit = max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+    try:
+        data, cursor = list_page(resource, current_user.id, fields=fields, includes=includes,
+                                 sort=request.args.get('sort'), cursor=request.args.get('cursor'),
+                                 limit=limit)
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    next_url = None
+    if cursor:
+        args = request.args.to_dict()
+        args['cursor'] = cursor
+        next_url = url_for(request.endpoint, **args)
+    return jsonify(data=data, links={'next': next_url}, meta={'count': len(data), 'cursor': cursor})
+
+
+def _detail(name, id):
+    resource = RESOURCES[name]
+    fields, includes = _parse_query(resource)
+    data = get_one(resource, id, current_user.id, fields=fields, includes=includes)
+    if data is None:
+        abort(404, description=f'No {name} with id {id}')
+    return jsonify(data=data)
+
+
+@api_bp.route('/products')
+@api_login_required
+@conditional(Product)
+def products():
+    """List products."""
+    return _list('products')
+
+
+@api_bp.route('/products/<int:id>')
+@api_login_required
+def product(id):
+    """Get one product."""
+    return _detail('products', id)
+
+
+@api_bp.route('/clients')
+@api_login_required
+@conditional(Client)
+def clients():
+    """List clients."""
+    return _list('clients')
+
+
+@api_bp.route('/clients/<int:id>')
+@api_login_required
+def client(id):
+    """Get one client."""
+    return _detail('clients', id)
+
+
+@api_bp.route('/clients/<int:id>/statement')
+@api_login_required
+@conditional(Client, Invoice, Transaction)
+def client_statement(id):
+    """Ledger of a client with running balances, optionally for ?period=YYYY-MM."""
+    if Client.query.filter_by(id=id, user_id=current_user.id).first() is None:
+        abort(404, description=f'No clients with id {id}')
+    try:
+        start, end = month_range(request.args['period']) if request.args.get('period') else (None, None)
+        limit = int(request.args.get('limit', current_app.config['API_PAGE_SIZE']))
+        limit = max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+        entries, cursor = statement_page(current_user.id, id, start, end,
+                                         cursor=request.args.get('cursor'), limit=limit)
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    meta = {'count': len(entries), 'cursor': cursor}
+    if not request.args.get('cursor'):
+        meta['opening_balance'] = opening_balances(current_user.id, start, id).get(id, 0.0)
+    next_url = None
+    if cursor:
+        args = request.args.to_dict()
+        args['cursor'] = cursor
+        next_url = url_for(request.endpoint, id=id, **args)
+    return jsonify(data=entries, links={'next': next_url}, meta=meta)
+
+
+@api_bp.route('/invoices')
+@api_login_required
+@conditional(Invoice, Client, Transaction)
+def invoices():
+    """List invoices, optionally with their items, client and transactions."""
+    return _list('invoices')
+
+
+def _parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        abort(400, description=f'{name} must be an ISO 8601 date')
+
+
+def _created(name, id, endpoint):
+    """Answer 201 with the serialized record and its URL."""
+    response = jsonify(data=get_one(RESOURCES[name], id, current_user.id))
+    response.status_code = 201
+    response.headers['Location'] = url_for(endpoint, id=id)
+    return response
+
+
+@api_bp.route('/invoices', methods=['POST'])
+@api_login_required
+@idempotent
+def create_invoice():
+    """Create an invoice from client_id and items [{product_id, quantity}]; validate it if asked."""
+    params = request.get_json(silent=True) or {}
+    client = Client.query.filter_by(id=params.get('client_id'), user_id=current_user.id).first()
+    if client is None:
+        abort(400, description='client_id must be one of your clients')
+    items = params.get('items')
+    if not items or not isinstance(items, list):
+        abort(400, description='items must be a non-empty list')
+
+    invoice = Invoice(user=current_user._get_current_object(), client=client, notes=params.get('notes'),
+                      date=_parse_date(params.get('date'), 'date') or datetime.utcnow())
+    products = {product.id: product for product in Product.query.filter(
+        Product.user_id == current_user.id,
+        Product.id.in_([item.get('product_id') for item in items if isinstance(item, dict)]))}
+    for item in items:
+        product = products.get(item.get('product_id')) if isinstance(item, dict) else None
+        quantity = item.get('quantity') if isinstance(item, dict) else None
+        if product is None or not isinstance(quantity, int) or quantity <= 0:
+            abort(400, description='each item needs one of your product_id and a positive quantity')
+        invoice.add_item(product, quantity)
+    if params.get('validate'):
+        invoice.validate()
+
+    db.session.add(invoice)
+    try:
+        db.session.commit()
+    except CreditLimitExceeded as e:
+        db.session.rollback()
+        abort(422, description=str(e))
+    return _created('invoices', invoice.id, 'api.invoice')
+
+
+@api_bp.route('/invoices/<int:id>')
+@api_login_required
+def invoice(id):
+    """Get one invoice, optionally with its items, client and transactions."""
+    return _detail('invoices', id)
+
+
+@api_bp.route('/invoices/number/<invoice_number>')
+@api_login_required
+def invoice_by_number(invoice_number):
+    """Get an invoice's legal document by number, including archived invoices."""
+    invoice = find_invoice(current_user.id, invoice_number)
+    if invoice is None:
+        abort(404, description=f'No invoice {invoice_number}')
+    return jsonify(data={
+        'id': invoice.id,
+        'invoice_number': invoice.invoice_number,
+        'status': invoice.status,
+        'archived': isinstance(invoice, ArchivedInvoice),
+        'document': invoice.document,
+    })
+
+
+def _history(entity, id):
+    events = [event for event in history(entity, id) if event.user_id == current_user.id]
+    if not events:
+        abort(404, description=f'No {entity} with id {id}')
+    return jsonify(data=[event.to_dict() for event in events])
+
+
+@api_bp.route('/invoices/<int:id>/history')
+@api_login_required
+def invoice_history(id):
+    """Audit events of an invoice, oldest first."""
+    return _history('invoice', id)
+
+
+@api_bp.route('/transactions/<int:id>/history')
+@api_login_required
+def transaction_history(id):
+    """Audit events of a transaction, oldest first."""
+    return _history('transaction', id)
+
+
+@api_bp.route('/transactions')
+@api_login_required
+@conditional(Transaction, Invoice)
+def transactions():
+    """List transactions, optionally with their invoice."""
+    return _list('transactions')
+
+
+@api_bp.route('/transactions', methods=['POST'])
+@api_login_required
+@idempotent
+def create_transaction():
+    """Record a payment against an invoice; complete it if asked."""
+    params = request.get_json(silent=True) or {}
+    invoice = Invoice.query.filter_by(id=params.get('invoice_id'), user_id=current_user.id).first()
+    if invoice is None:
+        abort(400, description='invoice_id must be one of your invoices')
+    amount = params.get('amount')
+    if not isinstance(amount, (int, float)) or isinstance(amount, bool) or amount <= 0:
+        abort(400, description='amount must be a positive number')
+    try:
+        transaction = Transaction(
+            invoice=invoice, user_id=current_user.id, amount=float(amount),
+            payment_method=params.get('payment_method'), reference=params.get('reference'),
+            bank_name=params.get('bank_name'), check_date=_parse_date(params.get('check_date'), 'check_date'),
+            date=_parse_date(params.get('date'), 'date') or datetime.utcnow(), notes=params.get('notes'),
+        )
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    db.session.add(transaction)
+    try:
+        if params.get('complete'):
+            db.session.flush()
+            if not transaction.complete():
+                db.session.rollback()
+                abort(400, description=f'Missing bank details for a {transaction.payment_method} payment')
+        else:
+            db.session.commit()
+    except CreditLimitExceeded as e:
+        db.session.rollback()
+        abort(422, description=str(e))
+    return _created('transactions', transaction.id, 'api.transaction')
+
+
+@api_bp.route('/transactions/<int:id>')
+@api_login_required
+def transaction(id):
+    """Get one transaction, optionally with its invoice."""
+    return _detail('transactions', id)
+
+
+@api_bp.route('/sync')
+@api_login_required
+def sync():
+    """Changes since a sync token, compressed when the client accepts it."""
+    try:
+        limit = int(request.args.get('limit', current_app.config['SYNC_PAGE_SIZE']))
+    except ValueError:
+        abort(400, description='limit must be an integer')
+    limit = max(1, min(limit, current_app.config['SYNC_MAX_PAGE_SIZE']))
+    try:
+        page = sync_page(current_user.id, request.args.get('token'), limit=limit)
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    response = jsonify(page)
+    response.headers['Cache-Control'] = 'no-store'
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding and response.content_length >= MIN_COMPRESS_SIZE:
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+@api_bp.route('/declarations/<int:year>')
+@api_login_required
+@conditional(Invoice)
+def declarations(year):
+    """Monthly G50 TVA/TAP declarations of a year."""
+    months = monthly_declarations(current_user.id, year)
+    totals = {name: round(sum(month[name] for month in months), 2)
+              for name in ('total_ht', 'tva', 'tap', 'total_ttc')}
+    totals['invoice_count'] = sum(month['invoice_count'] for month in months)
+    return jsonify(data=months, meta={'year': year, 'totals': totals})
+
+
+@api_bp.route('/analytics/<int:year>')
+@api_login_required
+def analytics(year):
+    """Revenue matrix, ABC classes and margins of a year's sales."""
+    from app.analytics import sales_analytics
+
+    return jsonify(data=sales_analytics(current_user.id, *year_range(year)), meta={'year': year})
+
+
+def _accepted(job):
+    """Answer 202 with the status URL of a queued job."""
+    response = jsonify(data=job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = url_for('api.job', id=job.id)
+    return response
+
+
+def _own_job(id):
+    job = Job.query.filter_by(id=id, user_id=current_user.id).first()
+    if job is None:
+        abort(404, description=f'No job with id {id}')
+    return job
+
+
+@api_bp.route('/exports', methods=['POST'])
+@api_login_required
+@idempotent
+def create_export():
+    """Queue an accounting export of the current user's data."""
+    params = request.get_json(silent=True) or {}
+    dataset, file_format = params.get('dataset'), params.get('format', 'csv')
+    if dataset not in DATASETS or file_format not in FORMATS:
+        abort(400, description=f"dataset must be one of {', '.join(DATASETS)} "
+                               f"and format one of {', '.join(FORMATS)}")
+    year, priority = params.get('year'), params.get('priority', 0)
+    if year is not None and not isinstance(year, int) or not isinstance(priority, int):
+        abort(400, description='year and priority must be integers')
+    job = enqueue('export', priority=priority, user_id=current_user.id, dataset=dataset,
+                  format=file_format, year=year, supplier_id=current_user.id)
+    return _accepted(job)
+
+
+@api_bp.route('/statements', methods=['POST'])
+@api_login_required
+@idempotent
+def create_statements():
+    """Queue the month-end statements of every client of the current user."""
+    params = request.get_json(silent=True) or {}
+    period, file_format = params.get('period'), params.get('format', 'pdf')
+    try:
+        month_range(period)
+    except ValueError as e:
+        abort(400, description=str(e))
+    if file_format not in ('pdf', 'html'):
+        abort(400, description='format must be one of pdf, html')
+    job = enqueue('statements', user_id=current_user.id, period=period, format=file_format,
+                  supplier_id=current_user.id)
+    return _accepted(job)
+
+
+@api_bp.route('/declarations/rebuild', methods=['POST'])
+@api_login_required
+@idempotent
+def rebuild_declarations():
+    """Queue a rebuild of the current user's tax rollups."""
+    return _accepted(enqueue('declarations.rebuild', user_id=current_user.id,
+                             supplier_id=current_user.id))
+
+
+@api_bp.route('/jobs/<int:id>')
+@api_login_required
+def job(id):
+    """Status and progress of a background job."""
+    job = _own_job(id)
+    data = job.to_dict()
+    if job.status == 'succeeded' and (job.result or {}).get('file'):
+        data['download'] = url_for('api.job_download', id=job.id)
+    return jsonify(data=data)
+
+
+@api_bp.route('/jobs/<int:id>/download')
+@api_login_required
+def job_download(id):
+    """Download the file produced by a finished job."""
+    job = _own_job(id)
+    filename = (job.result or {}).get('file') if job.status == 'succeeded' else None
+    if not filename:
+        abort(404, description=f'Job {id} has no file')
+    return send_from_directory(current_app.config['JOB_OUTPUT_FOLDER'], os.path.basename(filename),
+                               as_attachment=True)
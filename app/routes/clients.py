@@ -1,7 +1,48 @@
-from flask import render_template
+import io
+
+from flask import abort, render_template, request, send_file
+from flask_login import current_user, login_required
+from app import db
 from app.routes import clients_bp
+from app.http_cache import conditional
+from app.loaders import profiled
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+from app.statements import account_statement, month_range, render_html, render_pdf
 
 @clients_bp.route('/')
+@login_required
+@conditional(Client, Invoice)
 def index():
     """Clients listing page."""
-    return render_template('clients/index.html')
+    clients = db.paginate(
+        profiled('client_list').where(Client.user_id == current_user.id).order_by(Client.name, Client.id),
+        page=request.args.get('page', 1, type=int), per_page=50,
+    )
+    return render_template('clients/index.html', clients=clients)
+
+@clients_bp.route('/<int:id>/statement')
+@login_required
+@conditional(Client, Invoice, Transaction)
+def statement(id):
+    """Account statement of a client for ?period=YYYY-MM, or all time; ?format=pdf to download."""
+    start = end = None
+    if request.args.get('period'):
+        try:
+            start, end = month_range(request.args['period'])
+        except ValueError:
+            abort(400)
+    try:
+        statement = account_statement(current_user.id, id, start, end)
+    except LookupError:
+        abort(404)
+
+    if request.args.get('format') == 'pdf':
+        fileobj = io.BytesIO()
+        render_pdf(statement, fileobj)
+        fileobj.seek(0)
+        period = request.args.get('period', 'all')
+        return send_file(fileobj, mimetype='application/pdf', as_attachment=True,
+                         download_name=f'releve-{period}-client-{id}.pdf')
+    return render_html(statement)
@@ -1,7 +1,62 @@
-from flask import render_template
+import tempfile
+
+from flask import abort, current_app, render_template, request, send_file, stream_with_context
+from flask_login import current_user, login_required
+from sqlalchemy import select
+from app import db
 from app.routes import invoices_bp
+from app.export import DATASETS, FORMATS, MIMETYPES, build_query, stream_csv, write_xlsx, year_range
+from app.http_cache import conditional
+from app.loaders import profiled
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
 
 @invoices_bp.route('/')
+@login_required
+@conditional(Invoice, Client, Transaction)
 def index():
     """Invoices listing page."""
-    return render_template('invoices/index.html')
+    invoices = db.paginate(
+        profiled('invoice_list').where(Invoice.user_id == current_user.id)
+        .order_by(Invoice.date.desc(), Invoice.id.desc()),
+        page=request.args.get('page', 1, type=int), per_page=50,
+    )
+    return render_template('invoices/index.html', invoices=invoices)
+
+@invoices_bp.route('/<int:id>')
+@login_required
+@conditional(Invoice, Client, Transaction)
+def detail(id):
+    """Invoice page; validated invoices render from their snapshot."""
+    invoice = db.first_or_404(select(Invoice).where(Invoice.id == id, Invoice.user_id == current_user.id))
+    if invoice.snapshot is None:
+        # Drafts render from the live supplier, client and products
+        invoice = db.session.scalars(
+            profiled('invoice_detail').where(Invoice.id == id)
+            .execution_options(populate_existing=True)
+        ).unique().one()
+    return render_template('invoices/detail.html', invoice=invoice)
+
+@invoices_bp.route('/export/<dataset>.<format>')
+@login_required
+def export(dataset, format):
+    """Download invoices, invoice items or transactions, optionally for one ?year=."""
+    if dataset not in DATASETS or format not in FORMATS:
+        abort(404)
+    year = request.args.get('year', type=int)
+    start, end = year_range(year) if year else (None, None)
+    statement = build_query(dataset, current_user.id, start, end)
+    filename = f'{dataset}-{year}.{format}' if year else f'{dataset}.{format}'
+
+    if format == 'xlsx':
+        fileobj = tempfile.TemporaryFile()
+        write_xlsx(statement, fileobj, title=dataset)
+        fileobj.seek(0)
+        return send_file(fileobj, mimetype=MIMETYPES['xlsx'], as_attachment=True,
+                         download_name=filename)
+
+    response = current_app.response_class(stream_with_context(stream_csv(statement)),
+                                          mimetype=MIMETYPES['csv'])
+    response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    return response
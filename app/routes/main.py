@@ -1,7 +1,9 @@
 from flask import render_template
 from app.routes import main_bp
+from app.http_cache import cached_response
 
 @main_bp.route('/')
+@cached_response(timeout=300)
 def index():
     """Main page."""
     return render_template('index.html')
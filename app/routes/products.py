@@ -1,7 +1,10 @@
 from flask import render_template
 from app.routes import products_bp
+from app.http_cache import conditional
+from app.models.product import Product
 
 @products_bp.route('/')
+@conditional(Product)
 def index():
     """Products listing page."""
     return render_template('products/index.html')
@@ -0,0 +1,364 @@
+"""
+Deterministic large-scale dataset generator.
+
+Generates realistic volumes of users, clients, products, invoices, invoice
+items and transactions with bulk Core inserts, bypassing the ORM unit of
+work and the ``before_insert`` listeners. Primary keys are assigned up
+front so foreign keys never require a round trip, and rows are produced
+and inserted in batches so memory stays flat regardless of volume.
+
+The same seed and scale always produce the same data, which makes the
+generator usable both from the ``flask seed`` command and as a fixture for
+benchmarks.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.cache import invalidate
+from app.credit import rebuild_exposure
+from app.declarations import rebuild as rebuild_tax_rollups
+from app.pricing import record_missing_prices
+from app.models.user import User
+from app.models.client import Client
+from app.models.product import Product
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.transaction import Transaction
+
+# Row counts per preset
+SCALES = {
+    'tiny': dict(users=2, clients=20, products=40, invoices=200),
+    'small': dict(users=10, clients=500, products=1_000, invoices=5_000),
+    'medium': dict(users=100, clients=10_000, products=20_000, invoices=100_000),
+    'large': dict(users=2_000, clients=200_000, products=200_000, invoices=1_000_000),
+}
+
+# Invoice status distribution (status, weight)
+INVOICE_STATUSES = [
+    ('draft', 5), ('validated', 10), ('pending', 20),
+    ('partial', 10), ('paid', 50), ('cancelled', 5),
+]
+
+# Payment method distribution (method, weight)
+PAYMENT_METHODS = [('cash', 30), ('check', 30), ('bank_transfer', 40)]
+
+CATEGORIES = ['Informatique', 'Réseau', 'Impression', 'Bureautique', 'Mobilier', 'Consommables']
+BRANDS = ['HP', 'Dell', 'Lenovo', 'Cisco', 'Epson', 'Canon', 'Condor', 'Iris']
+WILAYAS = ['Alger', 'Oran', 'Constantine', 'Annaba', 'Blida', 'Sétif', 'Tlemcen', 'Béjaïa']
+BANKS = ['BNA', 'CPA', 'BEA', 'BDL', 'BADR', 'CNEP']
+PAYMENT_TERMS = [0, 15, 30, 30, 30, 45, 60]
+
+DEFAULT_PASSWORD = 'password'
+DEFAULT_START_DATE = datetime(2022, 1, 1)
+DEFAULT_BATCH_SIZE = 10_000
+
+class _IdAllocator:
+    """Hand out consecutive primary keys following the current maximum."""
+
+    def __init__(self, connection, model):
+        current = connection.execute(select(func.max(model.id))).scalar()
+        self.next_id = (current or 0) + 1
+
+    def take(self, count):
+        first = self.next_id
+        self.next_id += count
+        return range(first, first + count)
+
+
+def _weighted(rng, choices):
+    """Build a sampler for a list of (value, weight) pairs."""
+    values = [value for value, _ in choices]
+    weights = [weight for _, weight in choices]
+
+    def sample():
+        return rng.choices(values, weights)[0]
+    return sample
+
+
+def _identifier(prefix, number):
+    """Build a 15-digit Algerian identifier (NIF/NIS/RC) from a number."""
+    return f'{prefix}{number:014d}'
+
+
+def _insert(connection, model, rows, batch_size):
+    """Insert rows in batches using executemany."""
+    table = model.__table__
+    for start in range(0, len(rows), batch_size):
+        connection.execute(table.insert(), rows[start:start + batch_size])
+
+
+def seed_database(scale='small', seed=42, start_date=DEFAULT_START_DATE, days=730,
+                  batch_size=DEFAULT_BATCH_SIZE, password=DEFAULT_PASSWORD, **counts):
+    """
+    Populate the database with a deterministic synthetic dataset.
+
+    Must be called inside an application context. Existing rows are kept;
+    generated primary keys start after the current maximum of each table.
+
+    Args:
+        scale (str): Preset from ``SCALES`` providing default row counts
+        seed (int): Random seed; the same seed yields the same data
+        start_date (datetime): First possible invoice date
+        days (int): Number of days over which invoices are spread
+        batch_size (int): Rows per INSERT batch
+        password (str): Password shared by every generated user
+        **counts: Overrides for ``users``, ``clients``, ``products`` or ``invoices``
+
+    Returns:
+        dict: Number of rows inserted per table and elapsed seconds
+    """
+    if scale not in SCALES:
+        raise ValueError(f"Unknown scale '{scale}'. Must be one of: {', '.join(SCALES)}")
+    sizes = dict(SCALES[scale], **counts)
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    inserted = dict.fromkeys(['users', 'clients', 'products', 'invoices',
+                              'invoice_items', 'transactions'], 0)
+
+    with db.engine.connect() as connection:
+        # Durability is irrelevant for generated data; skip fsyncs on SQLite
+        synchronous = None
+        if connection.dialect.name == 'sqlite':
+            synchronous = connection.exec_driver_sql('PRAGMA synchronous').scalar()
+            connection.exec_driver_sql('PRAGMA synchronous = OFF')
+            connection.commit()
+        try:
+            with connection.begin():
+                _generate(connection, rng, sizes, inserted, start_date, days,
+                          batch_size, password)
+        finally:
+            if synchronous is not None:
+                connection.exec_driver_sql(f'PRAGMA synchronous = {int(synchronous)}')
+                connection.commit()
+
+    # Core inserts bypass the ORM events that maintain the tax rollups,
+    # credit exposures and price history and invalidate cached fragments
+    rebuild_tax_rollups()
+    rebuild_exposure()
+    record_missing_prices()
+    invalidate()
+    return dict(inserted, seconds=time.perf_counter() - started)
+
+
+def _generate(connection, rng, sizes, inserted, start_date, days, batch_size, password):
+    """Generate and insert every table, updating ``inserted`` as batches land."""
+    invoice_status = _weighted(rng, INVOICE_STATUSES)
+    payment_method = _weighted(rng, PAYMENT_METHODS)
+
+    # Users share one password hash: hashing thousands of passwords
+    # would dominate the run time.
+    password_hash = generate_password_hash(password)
+    user_ids = list(_IdAllocator(connection, User).take(sizes['users']))
+    users = []
+    for user_id in user_ids:
+        created = start_date - timedelta(days=rng.randint(30, 365))
+        users.append(dict(
+            id=user_id,
+            username=f'supplier{user_id:05d}',
+            email=f'supplier{user_id:05d}@example.com',
+            password_hash=password_hash,
+            company_name=f'SARL Fournisseur {user_id}',
+            address=f'{rng.randint(1, 200)} Rue {rng.randint(1, 99)}, {rng.choice(WILAYAS)}',
+            phone=f'0{rng.choice([5, 6, 7])}{rng.randint(10_000_000, 99_999_999)}',
+            nif=_identifier('0', user_id),
+            nis=_identifier('1', user_id),
+            rc=_identifier('2', user_id),
+            art=f'{rng.randint(10_000_000, 99_999_999)}',
+            created_at=created,
+            is_active=rng.random() > 0.02,
+        ))
+    _insert(connection, User, users, batch_size)
+    inserted['users'] = len(users)
+
+    # Clients and products are spread over users; keep just what the
+    # invoice generator needs to reference them.
+    clients_by_user = {user_id: [] for user_id in user_ids}
+    rows = []
+    for client_id in _IdAllocator(connection, Client).take(sizes['clients']):
+        user_id = rng.choice(user_ids)
+        terms = rng.choice(PAYMENT_TERMS)
+        clients_by_user[user_id].append((client_id, terms))
+        rows.append(dict(
+            id=client_id,
+            name=f'Entreprise {client_id}',
+            contact_person=f'Contact {client_id}',
+            address=f'Zone industrielle {rng.randint(1, 50)}, {rng.choice(WILAYAS)}',
+            phone=f'0{rng.choice([2, 3])}{rng.randint(1_000_000, 9_999_999)}',
+            email=f'contact{client_id}@client.example.com',
+            nif=_identifier('3', client_id),
+            nis=_identifier('4', client_id),
+            rc=_identifier('5', client_id),
+            art=f'{rng.randint(10_000_000, 99_999_999)}',
+            payment_terms=terms,
+            credit_limit=rng.choice([0.0, 0.0, 500_000.0, 1_000_000.0, 5_000_000.0]),
+            created_at=start_date - timedelta(days=rng.randint(0, 365)),
+            is_active=rng.random() > 0.05,
+            user_id=user_id,
+        ))
+        if len(rows) >= batch_size:
+            _insert(connection, Client, rows, batch_size)
+            inserted['clients'] += len(rows)
+            rows = []
+    _insert(connection, Client, rows, batch_size)
+    inserted['clients'] += len(rows)
+
+    products_by_user = {user_id: [] for user_id in user_ids}
+    rows = []
+    for product_id in _IdAllocator(connection, Product).take(sizes['products']):
+        user_id = rng.choice(user_ids)
+        purchase_price = round(rng.lognormvariate(10, 1.2), 2)
+        selling_price = round(purchase_price * rng.uniform(1.05, 1.6), 2)
+        products_by_user[user_id].append((product_id, selling_price))
+        created = start_date - timedelta(days=rng.randint(0, 365))
+        rows.append(dict(
+            id=product_id,
+            name=f'{rng.choice(BRANDS)} {rng.choice(CATEGORIES)} {product_id}',
+            reference=f'PRD-{created.year}-{product_id:05d}',
+            purchase_price=purchase_price,
+            selling_price=selling_price,
+            stock=rng.randint(0, 500),
+            min_stock=rng.choice([0, 5, 10, 20]),
+            category=rng.choice(CATEGORIES),
+            brand=rng.choice(BRANDS),
+            created_at=created,
+            updated_at=created,
+            is_active=rng.random() > 0.05,
+            user_id=user_id,
+        ))
+        if len(rows) >= batch_size:
+            _insert(connection, Product, rows, batch_size)
+            inserted['products'] += len(rows)
+            rows = []
+    _insert(connection, Product, rows, batch_size)
+    inserted['products'] += len(rows)
+
+    # Only users owning both clients and products can issue invoices
+    billing_users = [user_id for user_id in user_ids
+                     if clients_by_user[user_id] and products_by_user[user_id]]
+    if not billing_users:
+        return
+
+    # Taxed like Invoice.calculate_totals
+    tva_rate, tap_rate = current_app.config['TVA_RATE'], current_app.config['TAP_RATE']
+
+    # Invoice numbers continue the per-year FAC-YYYY-XXXXX sequences
+    invoice_ids = _IdAllocator(connection, Invoice)
+    item_ids = _IdAllocator(connection, InvoiceItem)
+    transaction_ids = _IdAllocator(connection, Transaction)
+    numbers = {}
+
+    def next_number(year):
+        if year not in numbers:
+            last = connection.execute(
+                select(Invoice.invoice_number)
+                .where(Invoice.invoice_number.like(f'FAC-{year}-%'))
+                .order_by(Invoice.id.desc()).limit(1)
+            ).scalar()
+            numbers[year] = int(last.split('-')[-1]) if last else 0
+        numbers[year] += 1
+        return f'FAC-{year}-{numbers[year]:05d}'
+
+    # Invoices are generated in date order so numbering is chronological
+    offsets = sorted(rng.randrange(days * 86_400) for _ in range(sizes['invoices']))
+    for batch_start in range(0, len(offsets), batch_size):
+        invoices, items, transactions = [], [], []
+        for offset in offsets[batch_start:batch_start + batch_size]:
+            invoice_id = invoice_ids.take(1)[0]
+            user_id = rng.choice(billing_users)
+            client_id, terms = rng.choice(clients_by_user[user_id])
+            date = start_date + timedelta(seconds=offset)
+            status = invoice_status()
+
+            total_ht = 0.0
+            products = products_by_user[user_id]
+            for product_id, selling_price in rng.sample(products, min(len(products),
+                                                                      rng.randint(1, 6))):
+                quantity = rng.randint(1, 20)
+                total_ht += quantity * selling_price
+                items.append(dict(
+                    id=item_ids.take(1)[0],
+                    invoice_id=invoice_id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    unit_price=selling_price,
+                ))
+            total_ht = round(total_ht, 2)
+            tva = round(total_ht * tva_rate, 2)
+            tap = round(total_ht * tap_rate, 2)
+            total_ttc = round(total_ht + tva + tap, 2)
+
+            invoices.append(dict(
+                id=invoice_id,
+                invoice_number=next_number(date.year),
+                date=date,
+                due_date=date + timedelta(days=terms),
+                status=status,
+                user_id=user_id,
+                client_id=client_id,
+                total_ht=total_ht,
+                tva=tva,
+                tap=tap,
+                total_ttc=total_ttc,
+                created_at=date,
+                updated_at=date,
+            ))
+
+            # Paid invoices are settled in one or two payments, partial
+            # ones carry a single payment; a few cheques bounce.
+            if status == 'paid':
+                amounts = [total_ttc] if rng.random() < 0.7 else \
+                    [round(total_ttc * 0.4, 2), round(total_ttc - round(total_ttc * 0.4, 2), 2)]
+            elif status == 'partial':
+                amounts = [round(total_ttc * rng.uniform(0.1, 0.9), 2)]
+            else:
+                amounts = []
+            paid_at = date
+            for amount in amounts:
+                paid_at += timedelta(days=rng.randint(0, max(terms, 1)))
+                method = payment_method()
+                transactions.append(_transaction(rng, transaction_ids.take(1)[0], paid_at,
+                                                 amount, method, 'completed',
+                                                 invoice_id, user_id))
+            if status in ('pending', 'partial') and rng.random() < 0.03:
+                transactions.append(_transaction(rng, transaction_ids.take(1)[0], date,
+                                                 total_ttc, 'check', 'rejected',
+                                                 invoice_id, user_id))
+
+        _insert(connection, Invoice, invoices, batch_size)
+        _insert(connection, InvoiceItem, items, batch_size)
+        _insert(connection, Transaction, transactions, batch_size)
+        inserted['invoices'] += len(invoices)
+        inserted['invoice_items'] += len(items)
+        inserted['transactions'] += len(transactions)
+
+
+
+def _transaction(rng, transaction_id, date, amount, method, status, invoice_id, user_id):
+    """Build one transaction row."""
+    row = dict(
+        id=transaction_id,
+        date=date,
+        amount=amount,
+        payment_method=method,
+        reference=None,
+        bank_name=None,
+        check_date=None,
+        notes='Rejected: Chèque sans provision' if status == 'rejected' else None,
+        status=status,
+        invoice_id=invoice_id,
+        user_id=user_id,
+        created_at=date,
+        updated_at=date,
+    )
+    if method != 'cash':
+        row['reference'] = f'PMT-{date.year}-{transaction_id:05d}'
+        row['bank_name'] = rng.choice(BANKS)
+    if method == 'check':
+        row['check_date'] = date
+    return row
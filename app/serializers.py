@@ -0,0 +1,327 @@
+"""
+Read-only serialization of models for the JSON API.
+
+Listings never hydrate ORM objects: each page is one Core ``select`` of the
+requested columns, turned straight into dicts, and every requested include
+costs exactly one more query (``WHERE invoice_id IN (...)`` for collections,
+``WHERE id IN (...)`` for references). A page therefore always takes
+``1 + len(includes)`` queries, whatever its size.
+
+Single records go through the ORM with an explicit ``selectinload`` (for
+collections) or ``joinedload`` (for references) per include, restricted to
+the requested columns with ``load_only``.
+
+Pagination is keyset based: the cursor holds the sort value and id of the
+last row, so fetching page 1000 costs the same as fetching page 1.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from app import db
+from app.models.product import Product
+from app.models.client import Client
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.transaction import Transaction
+
+
+class Include:
+    """
+    Related resource that can be embedded with ``?include=name``.
+
+    Attributes:
+        resource (str): Name of the related resource
+        relationship (str): Relationship attribute on the parent model
+        many (bool): Whether the relationship is a collection
+    """
+
+    def __init__(self, resource, relationship, many):
+        self.resource = resource
+        self.relationship = relationship
+        self.many = many
+
+
+class Resource:
+    """
+    Serializable view of a model.
+
+    Attributes:
+        name (str): Resource name, used in ``fields[name]``
+        model: SQLAlchemy model
+        fields (tuple): Column attributes exposed by the API
+        default_fields (tuple): Fields returned without a sparse fieldset
+        includes (dict): Embeddable relations by name
+        sorts (tuple): Columns listings may be sorted by (never NULL)
+        default_sort (str): Sort used when none is requested
+    """
+
+    def __init__(self, name, model, fields, includes=None, sorts=('id',), default_sort='id',
+                 default_fields=None):
+        self.name = name
+        self.model = model
+        self.fields = tuple(fields)
+        self.default_fields = tuple(default_fields or fields)
+        self.includes = includes or {}
+        self.sorts = tuple(sorts)
+        self.default_sort = default_sort
+
+    def column(self, name):
+        return getattr(self.model, name)
+
+    def parse_fields(self, requested):
+        """
+        Validate a sparse fieldset.
+
+        Args:
+            requested (str): Comma-separated field names, or None for all
+
+        Returns:
+            tuple: Field names, always starting with ``id``
+
+        Raises:
+            ValueError: If a field is not exposed by the resource
+        """
+        if not requested:
+            return self.default_fields
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s) for {self.name}: {', '.join(unknown)}")
+        return ('id',) + tuple(name for name in names if name != 'id')
+
+    def parse_includes(self, requested):
+        """Validate a comma-separated list of includes."""
+        if not requested:
+            return ()
+        names = tuple(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.includes]
+        if unknown:
+            raise ValueError(f"Unknown include(s) for {self.name}: {', '.join(unknown)}")
+        return names
+
+    def parse_sort(self, requested):
+        """
+        Validate a sort parameter such as ``date`` or ``-date``.
+
+        Returns:
+            tuple: (field name, descending)
+        """
+        requested = requested or self.default_sort
+        descending = requested.startswith('-')
+        name = requested.lstrip('-')
+        if name not in self.sorts:
+            raise ValueError(f"Cannot sort {self.name} by '{name}'. Must be one of: {', '.join(self.sorts)}")
+        return name, descending
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values):
+    """Encode the sort values of the last row of a page."""
+    payload = json.dumps([_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Decode a cursor into typed sort values.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor')
+
+    decoded = []
+    for value, column in zip(values, columns):
+        if value is not None and column.type.python_type is datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError('Invalid cursor') from e
+        decoded.append(value)
+    return decoded
+
+
+def _keyset(columns, values, descending):
+    """Condition selecting the rows strictly after ``values`` in sort order."""
+    (sort_column, id_column), (sort_value, last_id) = columns, values
+    if descending:
+        return or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id))
+
+
+def _relationship_columns(resource, include):
+    """Get the (parent, child) columns joining an include to its parent."""
+    prop = resource.column(include.relationship).property
+    (local, remote), = prop.local_remote_pairs
+    return local, remote
+
+
+def _load_includes(resource, rows, includes, fields):
+    """Fetch every include of a page with one query each and embed it in the rows."""
+    for name in includes:
+        include = resource.includes[name]
+        child = RESOURCES[include.resource]
+        local, remote = _relationship_columns(resource, include)
+        keys = {row[local.key] for row in rows if row[local.key] is not None}
+
+        child_fields = fields.get(child.name, child.default_fields)
+        related = {}
+        if keys:
+            statement = select(*(child.column(field) for field in child_fields),
+                               remote.label('_key')) \
+                .where(remote.in_(keys)).order_by(child.column('id'))
+            for child_row in db.session.execute(statement).mappings():
+                item = {field: _value(child_row[field]) for field in child_fields}
+                related.setdefault(child_row['_key'], []).append(item)
+
+        for row in rows:
+            matches = related.get(row[local.key], [])
+            row['_embedded'][name] = matches if include.many else (matches[0] if matches else None)
+
+
+def list_page(resource, user_id, fields=None, includes=(), sort=None, cursor=None, limit=50):
+    """
+    Fetch one page of a resource for a user.
+
+    Args:
+        resource (Resource): Resource to list
+        user_id (int): Owner whose rows are listed
+        fields (dict): Sparse fieldsets by resource name
+        includes (tuple): Include names
+        sort (str): Sort parameter, e.g. '-date'
+        cursor (str): Cursor returned with the previous page
+        limit (int): Page size
+
+    Returns:
+        tuple: (list of dicts, cursor of the next page or None)
+
+    Raises:
+        ValueError: If the sort or cursor is invalid
+    """
+    fields = fields or {}
+    own_fields = fields.get(resource.name, resource.default_fields)
+    sort_name, descending = resource.parse_sort(sort)
+    sort_columns = (resource.column(sort_name), resource.column('id'))
+
+    # Foreign keys of includes and sort values are fetched even when not requested
+    extra = {sort_name}
+    for name in includes:
+        extra.add(_relationship_columns(resource, resource.includes[name])[0].key)
+    selected = tuple(dict.fromkeys(own_fields + tuple(sorted(extra))))
+
+    statement = select(*(resource.column(name) for name in selected)) \
+        .where(resource.column('user_id') == user_id)
+    if cursor:
+        statement = statement.where(_keyset(sort_columns, decode_cursor(cursor, sort_columns), descending))
+    order = [column.desc() if descending else column.asc() for column in sort_columns]
+    statement = statement.order_by(*order).limit(limit + 1)
+
+    rows = [dict(row, _embedded={}) for row in db.session.execute(statement).mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][sort_name], rows[-1]['id']])
+
+    _load_includes(resource, rows, includes, fields)
+    data = []
+    for row in rows:
+        item = {name: _value(row[name]) for name in own_fields}
+        item.update(row['_embedded'])
+        data.append(item)
+    return data, next_cursor
+
+
+def get_one(resource, id, user_id, fields=None, includes=()):
+    """
+    Fetch a single record through the ORM with explicit eager loading.
+
+    Returns:
+        dict: Serialized record, or None if it does not exist or belongs to
+        another user
+    """
+    fields = fields or {}
+    own_fields = fields.get(resource.name, resource.default_fields)
+    own_columns = [resource.column(name) for name in own_fields]
+    loaders = []
+    for name in includes:
+        include = resource.includes[name]
+        child = RESOURCES[include.resource]
+        local, remote = _relationship_columns(resource, include)
+        columns = [child.column(field) for field in fields.get(child.name, child.default_fields)]
+        # The loaders need the foreign key on whichever side holds it
+        if include.many:
+            columns.append(child.column(remote.key))
+            loader = selectinload
+        else:
+            own_columns.append(resource.column(local.key))
+            loader = joinedload
+        loaders.append(loader(resource.column(include.relationship)).load_only(*columns))
+    options = [load_only(*own_columns)] + loaders
+
+    statement = select(resource.model).options(*options) \
+        .where(resource.column('id') == id, resource.column('user_id') == user_id)
+    obj = db.session.execute(statement).unique().scalar_one_or_none()
+    if obj is None:
+        return None
+
+    data = serialize(obj, own_fields)
+    for name in includes:
+        include = resource.includes[name]
+        child_fields = fields.get(include.resource, RESOURCES[include.resource].default_fields)
+        related = getattr(obj, include.relationship)
+        if include.many:
+            data[name] = [serialize(item, child_fields) for item in sorted(related, key=lambda item: item.id)]
+        else:
+            data[name] = serialize(related, child_fields) if related is not None else None
+    return data
+
+
+def serialize(obj, fields):
+    """Serialize the given fields of an ORM object."""
+    return {name: _value(getattr(obj, name)) for name in fields}
+
+
+RESOURCES = {resource.name: resource for resource in (
+    Resource('products', Product,
+             ('id', 'reference', 'name', 'description', 'category', 'brand', 'purchase_price',
+              'selling_price', 'stock', 'min_stock', 'is_active', 'created_at', 'updated_at'),
+             sorts=('id', 'reference', 'name', 'selling_price')),
+    Resource('clients', Client,
+             ('id', 'name', 'contact_person', 'address', 'phone', 'email', 'nif', 'nis', 'rc',
+              'art', 'payment_terms', 'credit_limit', 'is_active', 'created_at', 'updated_at'),
+             sorts=('id', 'name')),
+    Resource('invoices', Invoice,
+             ('id', 'invoice_number', 'date', 'due_date', 'status', 'client_id', 'total_ht',
+              'tva', 'tap', 'total_ttc', 'notes', 'created_at', 'updated_at', 'snapshot'),
+             default_fields=('id', 'invoice_number', 'date', 'due_date', 'status', 'client_id',
+                             'total_ht', 'tva', 'tap', 'total_ttc', 'notes', 'created_at',
+                             'updated_at'),
+             includes={
+                 'items': Include('items', 'items', many=True),
+                 'client': Include('clients', 'client', many=False),
+                 'transactions': Include('transactions', 'transactions', many=True),
+             },
+             sorts=('id', 'date', 'invoice_number', 'total_ttc'), default_sort='-date'),
+    Resource('items', InvoiceItem,
+             ('id', 'product_id', 'description', 'quantity', 'unit_price')),
+    Resource('transactions', Transaction,
+             ('id', 'invoice_id', 'date', 'amount', 'payment_method', 'reference', 'bank_name',
+              'check_date', 'status', 'notes', 'created_at', 'updated_at'),
+             includes={'invoice': Include('invoices', 'invoice', many=False)},
+             sorts=('id', 'date', 'amount'), default_sort='-date'),
+)}
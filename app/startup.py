@@ -0,0 +1,108 @@
+"""
+Application start-up and worker lifecycle.
+
+``DB_STARTUP_CHECK`` selects what ``create_app`` does with the database
+schema on every process start:
+
+    create_all  Create missing tables (inspects every table; development)
+    revision    Compare the Alembic revision stamped in the database with
+                the migration heads (one query; production, once migrations exist)
+    none        Trust the deployment and do nothing
+
+Under gunicorn with ``preload_app``, ``warm_up`` runs once in the master so
+mapper configuration, Babel formatters, template compilation and other
+long-lived objects are built before forking and shared copy-on-write by
+every worker, while ``after_fork`` gives each worker its own database
+connections.
+"""
+import gc
+
+from sqlalchemy.orm import configure_mappers
+
+from app import db, migrate
+from app.formatting import preload as preload_formatters
+
+STARTUP_CHECKS = ('create_all', 'revision', 'none')
+
+# Templates compiled in the master before workers fork
+PRELOADED_TEMPLATES = ('base.html',)
+
+
+def check_schema(app):
+    """
+    Run the configured start-up schema check.
+
+    Raises:
+        ValueError: If ``DB_STARTUP_CHECK`` is not a known mode
+        RuntimeError: In ``revision`` mode, if the database is not at the
+            latest migration
+    """
+    mode = app.config['DB_STARTUP_CHECK']
+    if mode not in STARTUP_CHECKS:
+        raise ValueError(f"Invalid DB_STARTUP_CHECK '{mode}'. Must be one of: {', '.join(STARTUP_CHECKS)}")
+
+    if mode == 'create_all':
+        with app.app_context():
+            db.create_all()
+    elif mode == 'revision':
+        check_revision(app)
+
+
+def check_revision(app):
+    """
+    Verify that the database is stamped with the latest migration heads.
+
+    Raises:
+        RuntimeError: If migrations are missing or the database is behind
+    """
+    # Alembic is only needed for this check
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    from alembic.util import CommandError
+
+    with app.app_context():
+        try:
+            directory = app.extensions['migrate'].directory
+            script = ScriptDirectory.from_config(migrate.get_config(directory))
+            heads = set(script.get_heads())
+        except CommandError as e:
+            raise RuntimeError(f'Cannot read migrations: {e}') from e
+
+        with db.engine.connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+
+    if current != heads:
+        raise RuntimeError(
+            f"Database revision {', '.join(sorted(current)) or 'none'} does not match "
+            f"migration head {', '.join(sorted(heads)) or 'none'}; run 'flask db upgrade'"
+        )
+
+
+def warm_up(app):
+    """
+    Build shared read-only state before worker processes are forked.
+
+    Args:
+        app (Flask): Application loaded in the gunicorn master
+    """
+    configure_mappers()
+    preload_formatters(app.config['BABEL_DEFAULT_TIMEZONE'])
+    for template in PRELOADED_TEMPLATES:
+        app.jinja_env.get_template(template)
+
+    # Move everything allocated so far out of the garbage collector's reach
+    # so collections in workers do not touch (and copy) shared pages.
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    """
+    Reset per-process state in a freshly forked worker.
+
+    Connections inherited from the master are dropped without being closed,
+    which would otherwise close them for the master too.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,325 @@
+"""
+Client account statements (relevés de compte).
+
+A statement interleaves a client's invoices (debits) and completed payments
+(credits) in date order with the running balance after each entry. The
+ledger is one SQL query: the two kinds of entries are combined with
+``UNION ALL`` and the balance is a window sum partitioned by client, so
+SQLite (3.25 or later) and PostgreSQL compute it while reading the rows::
+
+    statement = account_statement(user.id, client.id, *month_range('2024-03'))
+    render_pdf(statement, 'releve.pdf')
+
+Entries are ordered by (date, kind, id), invoices before payments on the
+same day; ``statement_page`` pages through them by keyset on that order.
+
+Month-end runs generate every client of a supplier with one ledger query
+partitioned by client and one grouped query for the opening balances::
+
+    flask statements generate 2024-03 --user supplier@example.com
+
+Archived invoices and payments (see ``app.archive``) are included when the
+archive holds any of the supplier's invoices before the end of the period.
+"""
+import io
+import itertools
+import zipfile
+
+from flask import render_template
+from sqlalchemy import func, literal, select, tuple_, union_all
+
+from app import db
+from app.archive import archive_overlaps
+from app.declarations import DECLARED_STATUSES
+from app.models.archive import ArchivedInvoice, ArchivedTransaction
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.recurring import parse_period
+from app.serializers import decode_cursor, encode_cursor
+
+# Entry kinds, in their order within a day
+INVOICE, PAYMENT = 0, 1
+
+FORMATS = ('html', 'pdf')
+
+
+def month_range(period):
+    """
+    Get the (start, end) datetimes of a month.
+
+    Args:
+        period (str): Month in YYYY-MM format
+
+    Raises:
+        ValueError: If the period is malformed
+    """
+    start = parse_period(period)
+    return start, start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def _entries(invoice, transaction, user_id, client_id, end):
+    """Debits and credits of one pair of invoice and transaction tables."""
+    debits = select(
+        invoice.client_id, invoice.date, literal(INVOICE).label('kind'), invoice.id.label('entry_id'),
+        invoice.invoice_number.label('reference'), invoice.invoice_number,
+        invoice.total_ttc.label('debit'), literal(0.0).label('credit'),
+    ).where(invoice.user_id == user_id, invoice.status.in_(DECLARED_STATUSES))
+    credits = select(
+        invoice.client_id, transaction.date, literal(PAYMENT), transaction.id,
+        transaction.reference, invoice.invoice_number, literal(0.0), transaction.amount,
+    ).join(invoice, transaction.invoice_id == invoice.id) \
+        .where(transaction.user_id == user_id, transaction.status == 'completed')
+    if client_id is not None:
+        debits = debits.where(invoice.client_id == client_id)
+        credits = credits.where(invoice.client_id == client_id)
+    if end is not None:
+        debits = debits.where(invoice.date < end)
+        credits = credits.where(transaction.date < end)
+    return [debits, credits]
+
+
+def _union(user_id, client_id, end):
+    parts = _entries(Invoice, Transaction, user_id, client_id, end)
+    if archive_overlaps(user_id, None, end):
+        parts += _entries(ArchivedInvoice, ArchivedTransaction, user_id, client_id, end)
+    return union_all(*parts).subquery('entries')
+
+
+def ledger(user_id, client_id=None, end=None):
+    """
+    Build the ledger of a supplier's clients up to a date.
+
+    Args:
+        user_id (int): Supplier
+        client_id (int): Only one client
+        end (datetime): Exclusive upper bound of the entry date
+
+    Returns:
+        Subquery: client_id, date, kind, entry_id, reference,
+        invoice_number, debit, credit and the running ``balance``
+    """
+    entries = _union(user_id, client_id, end)
+    balance = func.sum(entries.c.debit - entries.c.credit).over(
+        partition_by=entries.c.client_id,
+        order_by=(entries.c.date, entries.c.kind, entries.c.entry_id),
+        rows=(None, 0),
+    )
+    return select(*entries.c, balance.label('balance')).subquery('ledger')
+
+
+def _order(ledger):
+    return (ledger.c.client_id, ledger.c.date, ledger.c.kind, ledger.c.entry_id)
+
+
+def _entry(row):
+    return {
+        'date': row.date,
+        'kind': 'invoice' if row.kind == INVOICE else 'payment',
+        'reference': row.reference,
+        'invoice_number': row.invoice_number,
+        'debit': round(row.debit or 0.0, 2),
+        'credit': round(row.credit or 0.0, 2),
+        'balance': round(row.balance or 0.0, 2),
+    }
+
+
+def statement_page(user_id, client_id, start=None, end=None, cursor=None, limit=50):
+    """
+    Get one page of a client's ledger.
+
+    Args:
+        user_id (int): Supplier
+        client_id (int): Client
+        start (datetime): Inclusive lower bound of the entry date
+        end (datetime): Exclusive upper bound of the entry date
+        cursor (str): Cursor returned with the previous page
+        limit (int): Entries per page
+
+    Returns:
+        tuple: (list of entry dicts, cursor of the next page or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    table = ledger(user_id, client_id, end)
+    keys = (table.c.date, table.c.kind, table.c.entry_id)
+    statement = select(table).order_by(*keys).limit(limit + 1)
+    if start is not None:
+        statement = statement.where(table.c.date >= start)
+    if cursor:
+        statement = statement.where(tuple_(*keys) > tuple_(*decode_cursor(cursor, keys)))
+    rows = db.session.execute(statement).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor((last.date, last.kind, last.entry_id))
+    return [_entry(row) for row in rows], next_cursor
+
+
+def opening_balances(user_id, start, client_id=None):
+    """
+    Get the balance of each client before a date.
+
+    Returns:
+        dict: Client id -> balance
+    """
+    if start is None:
+        return {}
+    entries = _union(user_id, client_id, start)
+    rows = db.session.execute(
+        select(entries.c.client_id, func.sum(entries.c.debit - entries.c.credit))
+        .group_by(entries.c.client_id)
+    )
+    return {client_id: round(balance or 0.0, 2) for client_id, balance in rows}
+
+
+def _statement(client, supplier, start, end, opening, entries):
+    debit = round(sum(entry['debit'] for entry in entries), 2)
+    credit = round(sum(entry['credit'] for entry in entries), 2)
+    return {
+        'supplier': supplier,
+        'client': client,
+        'start': start,
+        'end': end,
+        'opening_balance': opening,
+        'entries': entries,
+        'total_debit': debit,
+        'total_credit': credit,
+        'closing_balance': round(opening + debit - credit, 2),
+    }
+
+
+def account_statement(user_id, client_id, start=None, end=None):
+    """
+    Build the full statement of one client over a period.
+
+    Returns:
+        dict: supplier, client, period, opening balance, entries with their
+        running balance, period totals and closing balance
+    """
+    client = db.session.get(Client, client_id)
+    if client is None or client.user_id != user_id:
+        raise LookupError(f'No client {client_id}')
+    table = ledger(user_id, client_id, end)
+    statement = select(table).order_by(*_order(table))
+    if start is not None:
+        statement = statement.where(table.c.date >= start)
+    entries = [_entry(row) for row in db.session.execute(statement)]
+    opening = opening_balances(user_id, start, client_id).get(client_id, 0.0)
+    return _statement(client, db.session.get(User, user_id), start, end, opening, entries)
+
+
+def iter_statements(user_id, start, end, include_inactive=False):
+    """
+    Build the statements of every client of a supplier over a period.
+
+    Clients are skipped when they have neither entries in the period nor
+    an outstanding opening balance, unless ``include_inactive``.
+
+    Yields:
+        dict: One statement per client, ordered by client id
+    """
+    supplier = db.session.get(User, user_id)
+    openings = opening_balances(user_id, start)
+    table = ledger(user_id, None, end)
+    statement = select(table).where(table.c.date >= start).order_by(*_order(table))
+    rows = db.session.execute(statement.execution_options(yield_per=1_000))
+    by_client = {client_id: [_entry(row) for row in group]
+                 for client_id, group in itertools.groupby(rows, key=lambda row: row.client_id)}
+
+    for client in Client.query.filter_by(user_id=user_id).order_by(Client.id):
+        entries = by_client.get(client.id, [])
+        opening = openings.get(client.id, 0.0)
+        if entries or abs(opening) >= 0.01 or include_inactive:
+            yield _statement(client, supplier, start, end, opening, entries)
+
+
+def render_html(statement):
+    """Render a statement as a standalone printable HTML page."""
+    return render_template('statements/statement.html', statement=statement)
+
+
+def render_pdf(statement, fileobj):
+    """
+    Render a statement as PDF with reportlab.
+
+    Args:
+        statement (dict): Statement from ``account_statement``
+        fileobj: Binary file object or path
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    def amount(value):
+        return f'{value:,.2f}' if value else ''
+
+    def day(value):
+        return value.strftime('%d/%m/%Y') if value else ''
+
+    styles = getSampleStyleSheet()
+    supplier, client = statement['supplier'], statement['client']
+    story = [
+        Paragraph(f'Relevé de compte — {client.name}', styles['Title']),
+        Paragraph(f"{supplier.company_name}, {supplier.address}", styles['Normal']),
+        Paragraph(f"Période du {day(statement['start'])} au {day(statement['end'])} (exclu)",
+                  styles['Normal']),
+        Spacer(1, 12),
+    ]
+    rows = [['Date', 'Pièce', 'Facture', 'Débit', 'Crédit', 'Solde'],
+            ['', 'Solde initial', '', '', '', amount(statement['opening_balance']) or '0.00']]
+    for entry in statement['entries']:
+        rows.append([day(entry['date']), entry['reference'] or '', entry['invoice_number'] or '',
+                     amount(entry['debit']), amount(entry['credit']), amount(entry['balance'])])
+    rows.append(['', 'Totaux', '', amount(statement['total_debit']), amount(statement['total_credit']),
+                 amount(statement['closing_balance']) or '0.00'])
+
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.black),
+        ('LINEABOVE', (0, -1), (-1, -1), 0.5, colors.black),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ]))
+    story.append(table)
+    SimpleDocTemplate(fileobj, pagesize=A4, title=f'Relevé {client.name}').build(story)
+
+
+def write_statements(user_id, period, path, format='pdf', progress=None):
+    """
+    Generate the month-end statements of a supplier into a zip archive.
+
+    Args:
+        user_id (int): Supplier
+        period (str): Month in YYYY-MM format
+        path (str): Zip file to write
+        format (str): One of ``FORMATS``
+        progress (callable): Called with the statements written so far after each one
+
+    Returns:
+        int: Number of statements written
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format '{format}'. Must be one of: {', '.join(FORMATS)}")
+    start, end = month_range(period)
+    count = 0
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for statement in iter_statements(user_id, start, end):
+            name = f"releve-{period}-client-{statement['client'].id}.{format}"
+            if format == 'pdf':
+                buffer = io.BytesIO()
+                render_pdf(statement, buffer)
+                archive.writestr(name, buffer.getvalue())
+            else:
+                archive.writestr(name, render_html(statement))
+            count += 1
+            if progress is not None:
+                progress(count)
+    return count
@@ -0,0 +1,253 @@
+"""
+Delta sync for offline clients.
+
+Devices keep a local copy of a supplier's products, clients, invoices (with
+their items) and transactions, and call ``GET /api/v1/sync`` with the token
+returned by their previous call::
+
+    page = sync_page(user_id, token=None)       # full sync, first page
+    page = sync_page(user_id, page['token'])    # next page, then deltas
+
+Every flush appends the changed rows to ``sync_changes`` (see
+``app.models.sync``); its autoincrement id is the change sequence.
+A token records the last sequence a device has seen, so an incremental sync
+is a single indexed range scan of the changes after it, collapsed to the
+latest change of each row, followed by one ``WHERE id IN (...)`` query per
+resource for the current values. Rows that are gone are returned as
+tombstones in ``deleted``.
+
+Without a token, the first calls page through every resource by id (the full
+sync) and remember the sequence at which they started; anything changed
+meanwhile is sent again by the following incremental calls.
+
+Ids are assigned when changes are inserted, not when they commit, so a
+writer of a supplier's changes first waits for the previous one to commit
+(``lock_sequence`` in ``app.models.sync``). A device that has seen a
+sequence therefore never gets a change below it later.
+
+Bulk Core inserts that bypass the ORM (seeding, archiving) are not in the
+change log and only reach devices through a full sync; recurring invoice
+generation logs its invoices itself.
+"""
+import base64
+import binascii
+import gzip
+import json
+
+from sqlalchemy import delete, func, select
+
+from app import db
+from app.models.sync import SyncChange
+from app.serializers import RESOURCES, _load_includes, _value
+
+# Resources in the order a full sync pages through them
+ENTITIES = ('products', 'clients', 'invoices', 'transactions')
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = ('br', 'gzip')
+
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+def encode_token(values):
+    """Encode the position of a device in the change sequence."""
+    payload = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    """
+    Decode a sync token.
+
+    Returns:
+        dict: ``s`` (last sequence seen) and, during a full sync, ``e``
+        (index of the resource being paged) and ``a`` (last id sent)
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid sync token') from e
+    if not isinstance(values, dict) or not isinstance(values.get('s'), int):
+        raise ValueError('Invalid sync token')
+    if 'e' in values:
+        if not isinstance(values['e'], int) or not 0 <= values['e'] < len(ENTITIES) \
+                or not isinstance(values.get('a'), int):
+            raise ValueError('Invalid sync token')
+    return values
+
+
+def current_sequence(user_id):
+    """Get the last change sequence of a user, 0 if nothing changed yet."""
+    return db.session.scalar(
+        select(func.coalesce(func.max(SyncChange.id), 0)).where(SyncChange.user_id == user_id)
+    )
+
+
+def _fetch(name, user_id, condition, limit=None):
+    """Fetch rows of a resource as dicts, invoices with their items."""
+    resource = RESOURCES[name]
+    fields = resource.default_fields
+    statement = select(*(resource.column(field) for field in fields)) \
+        .where(resource.column('user_id') == user_id, condition) \
+        .order_by(resource.column('id'))
+    if limit is not None:
+        statement = statement.limit(limit)
+
+    rows = [dict(row, _embedded={}) for row in db.session.execute(statement).mappings()]
+    includes = ('items',) if name == 'invoices' else ()
+    _load_includes(resource, rows, includes, {})
+    data = []
+    for row in rows:
+        item = {field: _value(row[field]) for field in fields}
+        item.update(row['_embedded'])
+        data.append(item)
+    return data
+
+
+def _full_page(user_id, state, limit):
+    """Page through one resource by id."""
+    name = ENTITIES[state['e']]
+    rows = _fetch(name, user_id, RESOURCES[name].column('id') > state['a'], limit=limit + 1)
+    page = {'data': {}, 'deleted': {}}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        token = {'s': state['s'], 'e': state['e'], 'a': rows[-1]['id']}
+    elif state['e'] + 1 < len(ENTITIES):
+        token = {'s': state['s'], 'e': state['e'] + 1, 'a': 0}
+    else:
+        token = {'s': state['s']}
+    if rows:
+        page['data'][name] = rows
+    page['token'] = encode_token(token)
+    page['more'] = 'e' in token
+    return page
+
+
+def _incremental_page(user_id, state, limit):
+    """Send the latest state of every row changed after the token."""
+    latest = select(
+        SyncChange.entity, SyncChange.entity_id, func.max(SyncChange.id).label('seq'),
+    ).where(SyncChange.user_id == user_id, SyncChange.id > state['s']) \
+        .group_by(SyncChange.entity, SyncChange.entity_id).subquery()
+    statement = select(latest.c.entity, latest.c.entity_id, latest.c.seq, SyncChange.deleted) \
+        .join(SyncChange, SyncChange.id == latest.c.seq) \
+        .order_by(latest.c.seq).limit(limit + 1)
+    changes = db.session.execute(statement).all()
+
+    more = len(changes) > limit
+    changes = changes[:limit]
+    sequence = changes[-1].seq if changes else state['s']
+
+    changed, deleted = {}, {}
+    for change in changes:
+        target = deleted if change.deleted else changed
+        target.setdefault(change.entity, []).append(change.entity_id)
+
+    data = {}
+    for name, ids in changed.items():
+        rows = _fetch(name, user_id, RESOURCES[name].column('id').in_(ids))
+        if rows:
+            data[name] = rows
+        # Deleted, archived or reassigned since the change was logged
+        missing = set(ids) - {row['id'] for row in rows}
+        if missing:
+            deleted.setdefault(name, []).extend(sorted(missing))
+
+    return {'data': data, 'deleted': deleted, 'token': encode_token({'s': sequence}), 'more': more}
+
+
+def sync_page(user_id, token=None, limit=500):
+    """
+    Get the next page of changes for a device.
+
+    Args:
+        user_id (int): Supplier whose data is synced
+        token (str): Token of the previous page, None to start a full sync
+        limit (int): Maximum rows per page
+
+    Returns:
+        dict: ``data`` (rows by resource), ``deleted`` (ids by resource),
+        ``token`` for the next call and ``more`` (whether to call again
+        right away)
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    if token:
+        state = decode_token(token)
+    else:
+        state = {'s': current_sequence(user_id), 'e': 0, 'a': 0}
+    if 'e' in state:
+        return _full_page(user_id, state, limit)
+    return _incremental_page(user_id, state, limit)
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the response encoding from an ``Accept-Encoding`` header.
+
+    Returns:
+        str: 'br', 'gzip' or None
+    """
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) <= 0:
+            continue
+        if encoding == 'br':
+            try:
+                import brotli  # noqa: F401
+            except ImportError:
+                continue
+        return encoding
+    return None
+
+
+def compress(data, encoding):
+    """Compress a response body with a negotiated encoding."""
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def compact(before=None):
+    """
+    Delete change entries superseded by a newer entry for the same row.
+
+    Only the latest entry of each row matters to devices, so older ones can
+    go; tombstones are kept, as devices that have not synced since still
+    need them.
+
+    Args:
+        before (int): Only compact entries with a lower sequence
+
+    Returns:
+        int: Number of entries deleted
+    """
+    newer = db.aliased(SyncChange)
+    superseded = select(newer.id).where(
+        newer.entity == SyncChange.entity,
+        newer.entity_id == SyncChange.entity_id,
+        newer.id > SyncChange.id,
+    ).exists()
+    statement = delete(SyncChange).where(superseded)
+    if before is not None:
+        statement = statement.where(SyncChange.id < before)
+    deleted = db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return deleted
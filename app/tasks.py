@@ -0,0 +1,65 @@
+"""
+Built-in background tasks (see ``app.jobs``).
+
+``supplier_id`` restricts a task to one user's data; it is distinct from the
+``user_id`` a job is enqueued for, which only records who may see it.
+"""
+import os
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import db
+from app.jobs import task
+
+
+@task('export')
+def export(job, dataset, format='csv', year=None, supplier_id=None):
+    """Write an accounting export to the job output folder."""
+    from app.export import build_query, stream_csv, write_xlsx, year_range
+
+    start, end = year_range(year) if year else (None, None)
+    statement = build_query(dataset, supplier_id, start, end)
+    folder = current_app.config['JOB_OUTPUT_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    filename = f'job-{job.id}-{dataset}-{year}.{format}' if year else f'job-{job.id}-{dataset}.{format}'
+    path = os.path.join(folder, filename)
+
+    total = db.session.scalar(select(func.count()).select_from(statement.subquery())) or 1
+    if format == 'xlsx':
+        job.progress(0.0, 'Writing workbook')
+        rows = write_xlsx(statement, path, title=dataset,
+                          progress=lambda count: job.progress(count / total, f'{count:,} rows'))
+    else:
+        stats = {}
+        with open(path, 'wb') as fh:
+            for chunk in stream_csv(statement, stats=stats):
+                fh.write(chunk)
+                job.progress(stats.get('rows', 0) / total, f"{stats.get('rows', 0):,} rows")
+        rows = stats.get('rows', 0)
+    return {'file': filename, 'rows': rows}
+
+
+@task('declarations.rebuild')
+def rebuild_declarations(job, supplier_id=None):
+    """Recompute the monthly tax rollups."""
+    from app.declarations import rebuild
+
+    return {'rows': rebuild(supplier_id)}
+
+
+@task('statements')
+def generate_statements(job, period, format='pdf', supplier_id=None):
+    """Write the month-end statements of a supplier's clients to a zip archive."""
+    from app.models.client import Client
+    from app.statements import write_statements
+
+    folder = current_app.config['JOB_OUTPUT_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    filename = f'job-{job.id}-statements-{period}.zip'
+    # Clients without activity are skipped, so this is an upper bound
+    total = db.session.scalar(select(func.count(Client.id)).where(Client.user_id == supplier_id)) or 1
+    job.progress(0.0, 'Writing statements')
+    count = write_statements(supplier_id, period, os.path.join(folder, filename), format=format,
+                             progress=lambda count: job.progress(count / total, f'{count:,} statements'))
+    return {'file': filename, 'statements': count}
@@ -0,0 +1,69 @@
+"""
+Benchmark fixtures.
+
+Benchmarks run against seeded SQLite databases at one or more dataset
+scales and are not collected by the default test run::
+
+    pytest benchmarks/ --bench-scale=small,medium --benchmark-autosave
+
+Saved runs are written as JSON under ``.benchmarks/``. To fail when a hot
+path regresses against a saved run::
+
+    pytest benchmarks/ --benchmark-compare=0001 --benchmark-compare-fail=mean:15%
+"""
+import os
+import tempfile
+
+import pytest
+
+from app import create_app, db
+from app.seed import seed_database
+
+# Seed arguments per benchmark scale
+BENCH_SCALES = {
+    'small': dict(scale='small'),
+    'medium': dict(scale='medium'),
+    'large': dict(scale='large'),
+}
+
+
+def pytest_addoption(parser):
+    parser.addoption('--bench-scale', default='small',
+                     help=f"Comma-separated dataset scales to benchmark ({', '.join(BENCH_SCALES)})")
+
+
+def pytest_generate_tests(metafunc):
+    if 'dataset' in metafunc.fixturenames:
+        scales = metafunc.config.getoption('--bench-scale').split(',')
+        unknown = set(scales) - set(BENCH_SCALES)
+        if unknown:
+            raise pytest.UsageError(f"Unknown benchmark scale(s): {', '.join(sorted(unknown))}")
+        metafunc.parametrize('dataset', scales, indirect=True, scope='session')
+
+
+@pytest.fixture(scope='session')
+def dataset(request):
+    """Create and seed a database for one scale, shared by the whole run."""
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'benchmark',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'QUERY_INSTRUMENTATION': False,
+    })
+    with app.app_context():
+        db.create_all()
+        seed_database(**BENCH_SCALES[request.param])
+
+    yield app
+
+    os.close(db_fd)
+    os.unlink(db_path)
+
+
+@pytest.fixture
+def bench_app(dataset):
+    """Push a fresh application context so every benchmark gets a clean session."""
+    with dataset.app_context():
+        yield dataset
+        db.session.rollback()
@@ -0,0 +1,64 @@
+"""Vectorized sales analytics against the equivalent per-object Python loops."""
+from collections import defaultdict
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from sqlalchemy import func, select
+
+from app import db
+from app.analytics import abc_classification, fetch, margin_analysis, revenue_matrix
+from app.declarations import DECLARED_STATUSES
+from app.models.invoice import Invoice
+from app.models.user import User
+
+
+def busiest_user():
+    user_id = db.session.execute(
+        select(Invoice.user_id).group_by(Invoice.user_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    return db.session.get(User, user_id)
+
+
+def python_reports(user):
+    """Revenue matrix, ABC classes and margins by walking invoices, items and products."""
+    matrix, revenue, cost, by_client = defaultdict(float), defaultdict(float), defaultdict(float), \
+        defaultdict(float)
+    for invoice in user.invoices:
+        if invoice.status not in DECLARED_STATUSES:
+            continue
+        for item in invoice.items:
+            amount = item.quantity * item.unit_price
+            matrix[item.product_id, invoice.date.year, invoice.date.month] += amount
+            revenue[item.product_id] += amount
+            cost[item.product_id] += item.quantity * item.product.purchase_price
+            by_client[invoice.client_id] += amount
+
+    def abc(totals):
+        grand_total, running, classes = sum(totals.values()), 0.0, {}
+        for key, total in sorted(totals.items(), key=lambda pair: -pair[1]):
+            classes[key] = 'A' if running < 0.8 * grand_total else 'B' if running < 0.95 * grand_total else 'C'
+            running += total
+        return classes
+
+    margins = {key: revenue[key] - cost[key] for key in revenue}
+    return matrix, abc(revenue), abc(by_client), margins
+
+
+def numpy_reports(user):
+    frame = fetch(user.id)
+    return (revenue_matrix(frame), abc_classification(frame.product_id, frame.revenue),
+            abc_classification(frame.client_id, frame.revenue), margin_analysis(frame))
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_analytics_python_loops(benchmark, bench_app):
+    user = busiest_user()
+    benchmark.pedantic(python_reports, args=(user,), setup=db.session.expire_all, rounds=3)
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_analytics_numpy(benchmark, bench_app):
+    user = busiest_user()
+    benchmark.pedantic(numpy_reports, args=(user,), setup=db.session.expire_all, rounds=3)
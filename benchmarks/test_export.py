@@ -0,0 +1,37 @@
+"""Export throughput; rows/second is reported in ``extra_info``."""
+import io
+
+import pytest
+
+from app.export import build_query, stream_csv, write_xlsx
+
+
+def _rows_per_second(benchmark, count):
+    benchmark.extra_info['rows'] = count
+    # No timings are collected under --benchmark-disable
+    if benchmark.stats is None:
+        return
+    benchmark.extra_info['rows_per_second'] = round(count / benchmark.stats.stats.mean)
+
+
+@pytest.mark.benchmark(group='export')
+@pytest.mark.parametrize('dataset_name', ['invoices', 'invoice_items', 'transactions'])
+def test_export_csv(benchmark, bench_app, dataset_name):
+    statement = build_query(dataset_name)
+
+    def export():
+        stats = {}
+        for _ in stream_csv(statement, stats=stats):
+            pass
+        return stats['rows']
+
+    count = benchmark.pedantic(export, rounds=3)
+    _rows_per_second(benchmark, count)
+
+
+@pytest.mark.benchmark(group='export')
+def test_export_xlsx(benchmark, bench_app):
+    pytest.importorskip('openpyxl')
+    statement = build_query('invoices')
+    count = benchmark.pedantic(lambda: write_xlsx(statement, io.BytesIO()), rounds=1)
+    _rows_per_second(benchmark, count)
@@ -0,0 +1,33 @@
+"""Formatting cost per amount on a 5,000-row invoice listing."""
+import random
+
+import pytest
+from babel.numbers import format_currency as babel_format_currency
+
+from app.formatting import format_currency
+
+ROWS = 5_000
+
+
+@pytest.fixture(scope='module')
+def amounts():
+    rng = random.Random(42)
+    return [round(rng.lognormvariate(11, 1.5), 2) for _ in range(ROWS)]
+
+
+@pytest.mark.benchmark(group='format-currency')
+def test_babel_format_currency(benchmark, amounts):
+    benchmark(lambda: [babel_format_currency(amount, 'DZD', locale='ar_DZ') for amount in amounts])
+
+
+@pytest.mark.benchmark(group='format-currency')
+def test_cached_format_currency(benchmark, amounts):
+    benchmark(lambda: [format_currency(amount, locale='ar_DZ') for amount in amounts])
+
+
+@pytest.mark.benchmark(group='format-listing')
+def test_render_listing(benchmark, bench_app, amounts):
+    template = bench_app.jinja_env.from_string(
+        '{% for amount in amounts %}<tr><td>{{ amount|format_currency }}</td></tr>{% endfor %}'
+    )
+    benchmark(template.render, amounts=amounts)
@@ -0,0 +1,129 @@
+"""Microbenchmarks for model hot paths."""
+import pytest
+from sqlalchemy import func, select
+
+from app import db
+from app.models.user import User
+from app.models.client import Client
+from app.models.product import Product, generate_reference as generate_product_reference
+from app.models.invoice import Invoice, InvoiceItem, set_invoice_number, set_due_date
+from app.models.transaction import Transaction, generate_reference as generate_payment_reference
+
+
+def busiest(column):
+    """Get the id owning the most invoices for the given foreign key column."""
+    return db.session.execute(
+        select(column).group_by(column).order_by(func.count().desc()).limit(1)
+    ).scalar()
+
+
+def largest_invoice():
+    """Get the invoice with the most items."""
+    invoice_id = busiest(InvoiceItem.invoice_id)
+    return db.session.get(Invoice, invoice_id)
+
+
+def expired(obj, *attributes):
+    """Build a pedantic setup expiring attributes so each round reloads them."""
+    def setup():
+        db.session.expire(obj, list(attributes) or None)
+    return setup
+
+
+@pytest.mark.benchmark(group='invoice')
+def test_calculate_totals(benchmark, bench_app):
+    invoice = largest_invoice()
+    invoice.items  # loaded once; measure the arithmetic only
+    benchmark(invoice.calculate_totals)
+
+
+@pytest.mark.benchmark(group='invoice')
+def test_add_item(benchmark, bench_app):
+    products = Product.query.limit(20).all()
+
+    def add_items():
+        invoice = Invoice(client_id=1, user_id=1)
+        for product in products:
+            invoice.add_item(product, 3)
+        return invoice
+
+    invoice = benchmark(add_items)
+    db.session.expunge_all()
+    assert len(invoice.items) == len(products)
+
+
+@pytest.mark.benchmark(group='invoice')
+def test_amount_paid(benchmark, bench_app):
+    invoice = db.session.get(Invoice, busiest(Transaction.invoice_id))
+    benchmark.pedantic(lambda: invoice.amount_paid, setup=expired(invoice, 'transactions'),
+                       rounds=200)
+
+
+@pytest.mark.benchmark(group='invoice')
+def test_payment_status(benchmark, bench_app):
+    invoice = db.session.get(Invoice, busiest(Transaction.invoice_id))
+    benchmark.pedantic(lambda: invoice.payment_status, setup=expired(invoice, 'transactions'),
+                       rounds=200)
+
+
+@pytest.mark.benchmark(group='aggregates')
+def test_client_credit_status(benchmark, bench_app):
+    client = db.session.get(Client, busiest(Invoice.client_id))
+    benchmark.pedantic(lambda: client.credit_status, setup=expired(client, 'invoices'),
+                       rounds=50)
+
+
+@pytest.mark.benchmark(group='aggregates')
+def test_user_total_sales(benchmark, bench_app):
+    user = db.session.get(User, busiest(Invoice.user_id))
+    benchmark.pedantic(lambda: user.total_sales, setup=expired(user, 'invoices'),
+                       rounds=10)
+
+
+@pytest.mark.benchmark(group='listeners')
+def test_invoice_number_listener(benchmark, bench_app):
+    client = Client.query.first()
+
+    def number_invoice():
+        with db.session.no_autoflush:
+            invoice = Invoice(client=client, user_id=client.user_id, date=client.created_at)
+            set_invoice_number(None, None, invoice)
+            set_due_date(None, None, invoice)
+        return invoice
+
+    invoice = benchmark(number_invoice)
+    assert invoice.invoice_number.startswith('FAC-')
+
+
+@pytest.mark.benchmark(group='listeners')
+def test_product_reference_listener(benchmark, bench_app):
+    def reference_product():
+        product = Product(name='Benchmark', purchase_price=1, selling_price=2)
+        generate_product_reference(None, None, product)
+        return product
+
+    assert benchmark(reference_product).reference.startswith('PRD-')
+
+
+@pytest.mark.benchmark(group='listeners')
+def test_payment_reference_listener(benchmark, bench_app):
+    def reference_payment():
+        transaction = Transaction(amount=1, payment_method='check')
+        generate_payment_reference(None, None, transaction)
+        return transaction
+
+    assert benchmark(reference_payment).reference.startswith('PMT-')
+
+
+@pytest.mark.benchmark(group='password')
+def test_set_password(benchmark, bench_app):
+    user = User()
+    benchmark.pedantic(user.set_password, args=('correct horse battery staple',), rounds=5)
+
+
+@pytest.mark.benchmark(group='password')
+def test_check_password(benchmark, bench_app):
+    user = User()
+    user.set_password('correct horse battery staple')
+    assert benchmark.pedantic(user.check_password, args=('correct horse battery staple',),
+                              rounds=5)
@@ -0,0 +1,33 @@
+"""Start-up time benchmarks."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import create_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def database_url(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('startup') / 'startup.db'}"
+    create_app({'SQLALCHEMY_DATABASE_URI': url, 'DB_STARTUP_CHECK': 'create_all'})
+    return url
+
+
+@pytest.mark.benchmark(group='startup')
+@pytest.mark.parametrize('mode', ['create_all', 'none'])
+def test_create_app(benchmark, database_url, mode):
+    config = {'SQLALCHEMY_DATABASE_URI': database_url, 'DB_STARTUP_CHECK': mode}
+    benchmark.pedantic(create_app, args=(config,), rounds=20, warmup_rounds=1)
+
+
+@pytest.mark.benchmark(group='startup-process')
+@pytest.mark.parametrize('mode', ['create_all', 'none'])
+def test_cold_process_start(benchmark, database_url, mode):
+    env = dict(os.environ, DATABASE_URL=database_url, DB_STARTUP_CHECK=mode)
+    command = [sys.executable, '-c', 'from app import create_app; create_app()']
+    benchmark.pedantic(subprocess.run, args=(command,), kwargs=dict(cwd=ROOT, env=env, check=True),
+                       rounds=5, warmup_rounds=1)
@@ -10,6 +10,9 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'suppliers.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Schema check on start-up: create_all, revision or none
+    DB_STARTUP_CHECK = os.environ.get('DB_STARTUP_CHECK') or 'create_all'
+    
     # Algerian locale settings
     BABEL_DEFAULT_LOCALE = 'ar_DZ'
     BABEL_DEFAULT_TIMEZONE = 'Africa/Algiers'
@@ -22,4 +25,34 @@ class Config:
     
     # Tax rates
     TVA_RATE = 0.19  # 19% TVA
-    TAP_RATE = 0.02  # 2% TAP
\ No newline at end of file
+    TAP_RATE = 0.02  # 2% TAP
+    
+    # Invoice archiving: fiscal years kept in the hot tables
+    ARCHIVE_KEEP_YEARS = 2
+    ARCHIVE_BATCH_SIZE = 1000
+    
+    # Idempotency keys: replay window, and age after which a running request counts as abandoned (seconds)
+    IDEMPOTENCY_TTL = 24 * 3600
+    IDEMPOTENCY_LOCK_TIMEOUT = 60
+    
+    # JSON API pagination
+    API_PAGE_SIZE = 50
+    API_MAX_PAGE_SIZE = 200
+    
+    # Offline delta sync: rows per page
+    SYNC_PAGE_SIZE = 500
+    SYNC_MAX_PAGE_SIZE = 2000
+    
+    # Template fragment cache: lru (per process) or redis (shared)
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND') or 'lru'
+    FRAGMENT_CACHE_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
+    FRAGMENT_CACHE_TIMEOUT = 300  # seconds
+    
+    # Prometheus metrics; scrapes need METRICS_TOKEN as a bearer token, and
+    # without one /metrics answers 403 outside debug and testing
+    METRICS_ENABLED = True
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Performance instrumentation
+    SLOW_REQUEST_THRESHOLD = float(os.environ.get('SLOW_REQUEST_THRESHOLD') or 0.5)  # seconds
+    N_PLUS_ONE_THRESHOLD = 5  # Repeated statements per request before warning
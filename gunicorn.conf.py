@@ -0,0 +1,60 @@
+# gunicorn -c gunicorn.conf.py run:app
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# Load the application once in the master and fork workers from it, so
+# recycled workers start without re-importing or re-configuring anything.
+preload_app = True
+
+# The schema check follows DB_STARTUP_CHECK (create_all unless set). The
+# repository ships no migrations yet; once the database is managed with
+# Flask-Migrate ('flask db init', 'flask db migrate', 'flask db upgrade'),
+# start gunicorn with DB_STARTUP_CHECK=revision so that the preloaded app
+# only compares the stamped revision with the migration heads.
+
+# Workers share their metrics through files in this directory. It must
+# exist before the preloaded application records anything. This file runs
+# again on every reload (SIGHUP), so it only creates the directory; see
+# on_starting for the files left by a previous run.
+OWN_MULTIPROC_DIR = 'PROMETHEUS_MULTIPROC_DIR' not in os.environ
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'prometheus-gunicorn'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    # Values left by a previous run would be added to the new ones. Only the
+    # directory created above is cleared: one set by the operator may be
+    # shared or hold anything. The application is preloaded by now, so the
+    # master's own files are kept.
+    if not OWN_MULTIPROC_DIR:
+        return
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    own = f'_{os.getpid()}.db'
+    for name in os.listdir(directory):
+        if not name.endswith(own):
+            os.remove(os.path.join(directory, name))
+
+
+def when_ready(server):
+    from app.startup import warm_up
+    warm_up(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    from app.startup import after_fork
+    after_fork(server.app.wsgi())
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of the exited worker
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
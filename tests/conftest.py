@@ -3,6 +3,8 @@ import tempfile
 import pytest
 from app import create_app, db
 from app.models.user import User
+from app.instrumentation import assert_max_queries
+from app.seed import seed_database
 
 @pytest.fixture
 def app():
@@ -12,8 +14,10 @@ def app():
     
     app = create_app({
         'TESTING': True,
+        'SECRET_KEY': 'test',
         'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
-        'WTF_CSRF_ENABLED': False  # Disable CSRF tokens in tests
+        'WTF_CSRF_ENABLED': False,  # Disable CSRF tokens in tests
+        'LOADER_RAISE_ON_LAZY_LOAD': True  # Fail on lazy loads missing from loader profiles
     })
 
     # Create the database and load test data
@@ -35,6 +39,16 @@ def runner(app):
     """A test runner for the app's Click commands."""
     return app.test_cli_runner()
 
+@pytest.fixture
+def seeded_db(app):
+    """Populate the database with the deterministic 'tiny' dataset."""
+    return seed_database(scale='tiny', seed=42)
+
+@pytest.fixture
+def max_queries():
+    """Context manager asserting a maximum number of SQL queries."""
+    return assert_max_queries
+
 @pytest.fixture
 def auth(client):
     """Authentication helper class for tests."""
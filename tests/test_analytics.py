@@ -0,0 +1,93 @@
+from collections import defaultdict
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from app import db
+from app.analytics import abc_classification, fetch, margin_analysis, revenue_matrix, sales_analytics
+from app.archive import archive_invoices
+from app.declarations import DECLARED_STATUSES
+from app.export import year_range
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def user(seeded_db):
+    return User.query.filter_by(email=EMAIL).one()
+
+
+def loop_totals(user, year):
+    """Revenue and cost per product and month, the per-object way."""
+    revenue, cost, months = defaultdict(float), defaultdict(float), defaultdict(float)
+    for invoice in user.invoices:
+        if invoice.status not in DECLARED_STATUSES or invoice.date.year != year:
+            continue
+        for item in invoice.items:
+            revenue[item.product_id] += item.quantity * item.unit_price
+            cost[item.product_id] += item.quantity * item.product.purchase_price
+            months[item.product_id, invoice.date.month] += item.quantity * item.unit_price
+    return revenue, cost, months
+
+
+def test_matches_python_loops(user):
+    """Test that the vectorized reports agree with per-object loops."""
+    frame = fetch(user.id, *year_range(2023))
+    revenue, cost, months = loop_totals(user, 2023)
+    assert len(frame) > 0
+
+    matrix = revenue_matrix(frame)
+    assert matrix['products'] == sorted(revenue)
+    for row, product_id in zip(matrix['values'], matrix['products']):
+        for value, month in zip(row, matrix['months']):
+            assert value == pytest.approx(months.get((product_id, int(month[5:])), 0.0), abs=0.01)
+
+    margins = {row['id']: row for row in margin_analysis(frame)}
+    for product_id, amount in revenue.items():
+        assert margins[product_id]['revenue'] == pytest.approx(amount, abs=0.01)
+        assert margins[product_id]['margin'] == pytest.approx(amount - cost[product_id], abs=0.01)
+
+
+def test_abc_classification():
+    """Test the Pareto classes on a known distribution."""
+    keys = np.array([1, 2, 3, 4, 1, 5])
+    values = np.array([20.0, 30.0, 12.0, 9.0, 25.0, 4.0])
+    rows = abc_classification(keys, values)
+    # Share before each: 1=0%, 2=45%, 3=75%, 4=87%, 5=96%
+    assert [row['id'] for row in rows] == [1, 2, 3, 4, 5]
+    assert [row['class'] for row in rows] == ['A', 'A', 'A', 'B', 'C']
+    assert rows[0]['revenue'] == 45.0 and rows[-1]['cumulative_share'] == 1.0
+    assert abc_classification(np.array([]), np.array([])) == []
+
+
+def test_report_is_cached(user):
+    """Test that the report is cached per user and period until invoices change."""
+    start, end = year_range(2023)
+    report = sales_analytics(user.id, start, end)
+    assert sales_analytics(user.id, start, end) is report
+    assert sales_analytics(user.id, *year_range(2022)) is not report
+
+    invoice = user.invoices.filter_by(status='draft').first()
+    invoice.notes = 'Touched'
+    db.session.commit()
+    assert sales_analytics(user.id, start, end) is not report
+
+
+def test_empty_period(user):
+    """Test that a period without sales gives empty reports."""
+    report = sales_analytics(user.id, *year_range(1999))
+    assert report['items'] == 0
+    assert report['revenue_matrix'] == {'products': [], 'months': [], 'values': []}
+    assert report['products_abc'] == report['margins'] == []
+
+
+def test_archived_year(user):
+    """Test that a year moved to the archive reports the same as before."""
+    start, end = year_range(2022)
+    before = fetch(user.id, start, end)
+    assert archive_invoices(before=end, user_id=user.id)['invoices'] > 0
+    after = fetch(user.id, start, end)
+    assert revenue_matrix(after) == revenue_matrix(before)
+    assert margin_analysis(after) == margin_analysis(before)
@@ -0,0 +1,106 @@
+import pytest
+from app import db
+from app.instrumentation import count_queries
+from app.models.invoice import Invoice
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def api(client, seeded_db):
+    """Client logged in as the first seeded supplier."""
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+    return client
+
+
+def own_invoices():
+    user = User.query.filter_by(email=EMAIL).one()
+    return Invoice.query.filter_by(user_id=user.id)
+
+
+def test_requires_login(client):
+    """Test that anonymous requests get a JSON 401."""
+    response = client.get('/api/v1/products')
+    assert response.status_code == 401
+    assert 'error' in response.get_json()
+
+
+def test_list_sparse_fields(api):
+    """Test that only the requested fields are returned."""
+    response = api.get('/api/v1/products?fields[products]=reference,selling_price&limit=3')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['meta']['count'] == 3
+    assert set(body['data'][0]) == {'id', 'reference', 'selling_price'}
+
+
+def test_list_invalid_parameters(api):
+    """Test that unknown fields, includes, sorts and cursors are rejected."""
+    for query in ('fields[invoices]=user_id', 'include=owner', 'sort=notes', 'cursor=!!'):
+        response = api.get(f'/api/v1/invoices?{query}')
+        assert response.status_code == 400, query
+        assert response.get_json()['error']
+
+
+def test_keyset_pagination(api):
+    """Test that following the cursors walks every invoice exactly once."""
+    expected = own_invoices().count()
+    seen, url = [], '/api/v1/invoices?fields[invoices]=date&limit=7'
+    while url:
+        body = api.get(url).get_json()
+        seen.extend(body['data'])
+        url = body['links']['next']
+
+    assert len(seen) == expected
+    assert len({invoice['id'] for invoice in seen}) == expected
+    dates = [invoice['date'] for invoice in seen]
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_includes(api):
+    """Test that items, client and transactions are embedded."""
+    body = api.get('/api/v1/invoices?include=items,client,transactions'
+                   '&fields[items]=quantity,unit_price&fields[clients]=name&limit=5').get_json()
+    for data in body['data']:
+        invoice = db.session.get(Invoice, data['id'])
+        assert data['client'] == {'id': invoice.client_id, 'name': invoice.client.name}
+        assert [item['id'] for item in data['items']] == sorted(item.id for item in invoice.items)
+        assert set(data['items'][0]) == {'id', 'quantity', 'unit_price'}
+        assert len(data['transactions']) == len(invoice.transactions)
+
+
+def test_list_query_count_is_fixed(api):
+    """Test that the number of queries does not depend on the page size."""
+    url = '/api/v1/invoices?include=items,client,transactions&limit={}'
+    # The first request also loads the user into the shared test session
+    api.get(url.format(1))
+    counts = []
+    for limit in (2, 20):
+        with count_queries() as stats:
+            response = api.get(url.format(limit))
+        assert response.get_json()['meta']['count'] == limit
+        counts.append(stats.count)
+    # validators, page and one query per include
+    assert counts == [5, 5]
+
+
+def test_detail(api, max_queries):
+    """Test a single invoice with eager-loaded includes."""
+    invoice = own_invoices().first()
+    # user loader, invoice joined with client, items
+    with max_queries(3):
+        response = api.get(f'/api/v1/invoices/{invoice.id}?include=items,client')
+    data = response.get_json()['data']
+    assert data['invoice_number'] == invoice.invoice_number
+    assert data['client']['id'] == invoice.client_id
+    assert len(data['items']) == len(invoice.items)
+
+
+def test_detail_of_other_user(api):
+    """Test that records of other users are not found."""
+    user = User.query.filter_by(email=EMAIL).one()
+    invoice = Invoice.query.filter(Invoice.user_id != user.id).first()
+    assert api.get(f'/api/v1/invoices/{invoice.id}').status_code == 404
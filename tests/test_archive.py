@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+from app.archive import CLOSED_STATUSES, archive_cutoff, archive_invoices, archive_overlaps, find_invoice
+from app.declarations import monthly_declarations, rebuild
+from app.export import build_query, stream_csv, year_range
+from app.models.archive import ArchivedInvoice, ArchivedInvoiceItem, ArchivedTransaction
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.transaction import Transaction
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+CUTOFF = datetime(2023, 1, 1)
+
+
+@pytest.fixture
+def user(seeded_db):
+    return User.query.filter_by(email=EMAIL).one()
+
+
+def closed_before_cutoff():
+    return Invoice.query.filter(Invoice.status.in_(CLOSED_STATUSES), Invoice.date < CUTOFF)
+
+
+def test_archive_moves_closed_invoices(user):
+    """Test that closed invoices move in batches with their items and transactions."""
+    invoice_ids = [invoice.id for invoice in closed_before_cutoff()]
+    items = InvoiceItem.query.filter(InvoiceItem.invoice_id.in_(invoice_ids)).count()
+    transactions = Transaction.query.filter(Transaction.invoice_id.in_(invoice_ids)).count()
+    open_invoices = Invoice.query.filter(Invoice.status.notin_(CLOSED_STATUSES)).count()
+    assert invoice_ids
+
+    counts = archive_invoices(before=CUTOFF, batch_size=7)
+    assert counts == {'invoices': len(invoice_ids), 'invoice_items': items,
+                      'transactions': transactions}
+    assert closed_before_cutoff().count() == 0
+    assert Invoice.query.filter(Invoice.status.notin_(CLOSED_STATUSES)).count() == open_invoices
+    assert sorted(row.id for row in ArchivedInvoice.query) == sorted(invoice_ids)
+    assert ArchivedInvoiceItem.query.count() == items
+    assert ArchivedTransaction.query.count() == transactions
+    assert ArchivedInvoice.query.filter(ArchivedInvoice.snapshot.is_(None)).count() == 0
+
+    assert archive_invoices(before=CUTOFF) == {'invoices': 0, 'invoice_items': 0, 'transactions': 0}
+
+
+def test_find_invoice_reads_through(user, client):
+    """Test that archived invoices are still found by number."""
+    invoice = closed_before_cutoff().filter(Invoice.user_id == user.id).first()
+    number, total = invoice.invoice_number, invoice.total_ttc
+    archive_invoices(before=CUTOFF)
+
+    archived = find_invoice(user.id, number)
+    assert isinstance(archived, ArchivedInvoice)
+    assert archived.document['totals']['total_ttc'] == total
+    assert len(archived.items) == len(archived.document['items'])
+    assert find_invoice(user.id + 1, number) is None
+
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    response = client.get(f'/api/v1/invoices/number/{number}')
+    assert response.status_code == 200
+    assert response.json['data']['archived'] is True
+    assert client.get('/api/v1/invoices/number/FAC-1999-00001').status_code == 404
+
+
+def test_reports_union_archive_when_needed(user):
+    """Test that exports and rollup rebuilds still see archived invoices."""
+    start, end = year_range(2022)
+    before = list(stream_csv(build_query('invoices', user.id, start, end)))
+    declared = monthly_declarations(user.id, 2022)
+    archive_invoices(before=CUTOFF)
+
+    assert archive_overlaps(user.id, start, end)
+    assert not archive_overlaps(user.id, *year_range(2023))
+    assert 'archived_invoices' not in str(build_query('invoices', user.id, *year_range(2023)))
+
+    after = list(stream_csv(build_query('invoices', user.id, start, end)))
+    assert sorted(b''.join(after).splitlines()) == sorted(b''.join(before).splitlines())
+
+    rebuild(user.id)
+    assert monthly_declarations(user.id, 2022) == declared
+
+
+def test_current_year_is_never_archived(app):
+    """Test that a cutoff after January 1st of this year is rejected."""
+    year = datetime.utcnow().year
+    assert archive_cutoff(year) == datetime(year, 1, 1)
+    with pytest.raises(ValueError):
+        archive_cutoff(year + 1)
+    with pytest.raises(ValueError):
+        archive_invoices(before=datetime(year, 6, 1))
+
+    result = app.test_cli_runner().invoke(args=['archive', 'run', '--before', str(year + 1)])
+    assert result.exit_code != 0 and 'current year' in result.output
@@ -0,0 +1,71 @@
+import gzip
+import pytest
+from flask import url_for
+from app.assets import build_assets, load_manifest
+
+CSS = b'body { color: #333; }\n' * 50
+
+
+@pytest.fixture
+def static_app(app, tmp_path):
+    """Point the app at a temporary static folder with built assets."""
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'style.css').write_bytes(CSS)
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG fake')
+    app.static_folder = str(tmp_path)
+    build_assets(app.static_folder)
+    load_manifest(app)
+    return app
+
+
+def test_build_assets(static_app):
+    """Test that files are hashed and compressible ones precompressed."""
+    manifest = static_app.extensions['asset_manifest']
+    hashed = manifest['files']['css/style.css']
+    assert hashed.startswith('dist/css/style.') and hashed.endswith('.css')
+    assert 'gzip' in manifest['encodings'][hashed]
+    assert manifest['encodings'][manifest['files']['logo.png']] == []
+
+
+def test_url_for_uses_hashed_name(static_app):
+    """Test that url_for('static') resolves to the fingerprinted file."""
+    with static_app.test_request_context():
+        url = url_for('static', filename='css/style.css')
+        assert url == '/static/' + static_app.extensions['asset_manifest']['files']['css/style.css']
+        assert url_for('static', filename='js/unknown.js') == '/static/js/unknown.js'
+
+
+def test_serves_precompressed_variant(static_app, client):
+    """Test encoding negotiation and immutable caching of hashed assets."""
+    with static_app.test_request_context():
+        url = url_for('static', filename='css/style.css')
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Type'].startswith('text/css')
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.data) == CSS
+
+    response = client.get(url)
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == CSS
+
+
+def test_brotli_variant(static_app, client):
+    """Test that brotli is preferred when available and accepted."""
+    brotli = pytest.importorskip('brotli')
+    with static_app.test_request_context():
+        url = url_for('static', filename='css/style.css')
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == CSS
+
+
+def test_assets_build_command(static_app, runner):
+    """Test the flask assets build command."""
+    result = runner.invoke(args=['assets', 'build'])
+    assert result.exit_code == 0, result.output
+    assert 'Built 2 assets' in result.output
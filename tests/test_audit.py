@@ -0,0 +1,168 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from app import db
+from app.audit import exposures_from_events, history, replay
+from app.models.audit import AuditEvent
+from app.models.client import Client, CreditLimitExceeded
+from app.models.invoice import Invoice
+from app.models.product import Product
+from app.models.recurring import RecurringInvoice
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.recurring import generate
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def customer(seeded_db):
+    user = User.query.filter_by(email=EMAIL).one()
+    customer = Client(name='Audit SARL', address='Alger', nif='1' * 15, nis='2' * 15, rc='3' * 10,
+                      art='4' * 11, user_id=user.id)
+    db.session.add(customer)
+    db.session.commit()
+    return customer
+
+
+def issue(customer, total_ttc):
+    invoice = Invoice(user_id=customer.user_id, client_id=customer.id, date=datetime(2031, 1, 10),
+                      total_ht=total_ttc, total_ttc=total_ttc)
+    db.session.add(invoice)
+    db.session.commit()
+    invoice.status = 'validated'
+    db.session.commit()
+    return invoice
+
+
+def test_history_records_before_and_after(customer):
+    """Test that creation, validation, payment and rejection are all logged."""
+    invoice = issue(customer, 500.0)
+    payment = Transaction(invoice_id=invoice.id, user_id=customer.user_id, amount=200.0,
+                          payment_method='cash', notes='Guichet')
+    db.session.add(payment)
+    db.session.commit()
+    payment.reject('Faux billet')
+
+    events = history('invoice', invoice.id)
+    assert [event.action for event in events] == ['created', 'updated']
+    assert events[0].changes['total_ttc'] == [None, 500.0]
+    assert events[1].changes == {'status': ['draft', 'validated']}
+
+    events = history('transaction', payment.id)
+    assert events[-1].changes['status'] == ['pending', 'rejected']
+    assert events[-1].changes['notes'] == ['Guichet', 'Guichet\nRejected: Faux billet']
+    assert payment.notes.startswith('Guichet')
+
+
+def test_log_is_append_only(customer):
+    """Test that events can be neither edited nor deleted through the ORM."""
+    invoice = issue(customer, 100.0)
+    event = history('invoice', invoice.id)[0]
+    event.action = 'deleted'
+    with pytest.raises(ValueError):
+        db.session.commit()
+    db.session.rollback()
+    db.session.delete(event)
+    with pytest.raises(ValueError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_rolled_back_changes_are_not_logged(customer):
+    """Test that a failed change leaves no event behind."""
+    customer.credit_limit = 150.0
+    db.session.commit()
+    invoice = issue(customer, 100.0)
+    count = AuditEvent.query.count()
+
+    invoice.total_ttc = 400.0
+    with pytest.raises(CreditLimitExceeded):
+        db.session.commit()
+    db.session.rollback()
+    invoice.notes = 'Unaudited attribute'
+    db.session.commit()
+    assert AuditEvent.query.count() == count
+
+
+def test_writes_are_batched(customer):
+    """Test that the events of one flush are written with a single statement."""
+    invoices = [Invoice(user_id=customer.user_id, client_id=customer.id, invoice_number=f'AUD-{n}',
+                        total_ttc=10.0) for n in range(20)]
+    db.session.add_all(invoices)
+    db.session.flush()
+    before = AuditEvent.query.count()
+    for invoice in invoices:
+        invoice.total_ttc = 20.0
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO audit_events'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        db.session.commit()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert len(statements) == 1
+    assert AuditEvent.query.count() == before + 20
+
+
+def test_replay_rebuilds_exposure(customer):
+    """Test that the log alone rebuilds the credit exposure and intermediate states."""
+    first, second, third = issue(customer, 300.0), issue(customer, 200.0), issue(customer, 50.0)
+    payment = Transaction(invoice_id=first.id, user_id=customer.user_id, amount=120.0,
+                          payment_method='cash', status='completed')
+    db.session.add(payment)
+    second.status = 'cancelled'
+    db.session.commit()
+    checkpoint = db.session.query(db.func.max(AuditEvent.id)).scalar()
+    db.session.delete(third)
+    db.session.commit()
+
+    db.session.refresh(customer)
+    assert exposures_from_events(user_id=customer.user_id)[customer.id] == round(customer.exposure, 2) == 180.0
+    assert exposures_from_events(until=checkpoint)[customer.id] == 230.0
+    assert third.id in replay('invoice', until=checkpoint)
+    assert third.id not in replay('invoice')
+
+
+def test_history_endpoint(client, customer):
+    """Test that only the owner can read an entity's history."""
+    invoice = issue(customer, 80.0)
+    assert client.get(f'/api/v1/invoices/{invoice.id}/history').status_code == 401
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    response = client.get(f'/api/v1/invoices/{invoice.id}/history')
+    assert [event['action'] for event in response.json['data']] == ['created', 'updated']
+    assert client.get('/api/v1/transactions/999999/history').status_code == 404
+
+
+def test_replay_recurring_invoice(customer):
+    """Test that a generated invoice validated through the ORM replays from its created event."""
+    product = Product.query.filter_by(user_id=customer.user_id).first()
+    template = RecurringInvoice(name='Audit', user_id=customer.user_id, client_id=customer.id,
+                                start_date=datetime(2031, 1, 1))
+    template.add_line(product, 1, unit_price=100.0)
+    db.session.add(template)
+    db.session.commit()
+    generate('2031-01')
+    invoice = Invoice.query.filter_by(recurring_id=template.id).one()
+    assert [event.action for event in history('invoice', invoice.id)] == ['created']
+
+    invoice.validate()
+    db.session.commit()
+    assert replay('invoice')[invoice.id]['client_id'] == customer.id
+    assert exposures_from_events()[customer.id] == pytest.approx(invoice.total_ttc)
+
+
+def test_replay_skips_rows_without_created_event(customer, caplog):
+    """Test that seeded invoices, inserted without events, are left out of a replay."""
+    seeded = Invoice.query.filter(Invoice.user_id == customer.user_id, Invoice.status == 'draft').first()
+    seeded.validate()
+    db.session.commit()
+    assert seeded.id not in replay('invoice')
+    assert 'without a created event' in caplog.text
+    exposures_from_events()
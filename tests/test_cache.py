@@ -0,0 +1,88 @@
+import pytest
+from flask import render_template_string
+from app import db
+from app.cache import LRUCache
+from app.models.product import Product
+from app.models.user import User
+
+TEMPLATE = '{% cache "count", "products" %}{{ counter() }}{% endcache %}'
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='supplier', email='supplier@example.com', company_name='Supplier',
+                address='Alger', nif='123456789012345', nis='123456789012345',
+                rc='123456789012345', art='12345')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_product(user_id, reference):
+    return Product(name='Laptop', reference=reference, purchase_price=100,
+                   selling_price=150, user_id=user_id)
+
+
+def render(app, calls):
+    def counter():
+        calls.append(1)
+        return len(calls)
+
+    with app.test_request_context():
+        return render_template_string(TEMPLATE, counter=counter)
+
+
+def test_lru_eviction_and_expiry(monkeypatch):
+    """Test that the LRU evicts the oldest entry and honours timeouts."""
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    cache.set('d', 4, timeout=10)
+    monkeypatch.setattr('app.cache.time.monotonic', lambda: float('inf'))
+    assert cache.get('d') is None
+
+
+def test_lru_counters_survive_eviction():
+    """Test that generation counters are never evicted."""
+    cache = LRUCache(maxsize=1)
+    cache.incr('products')
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.counters(['products', 'clients']) == [1, 0]
+
+
+def test_fragment_is_cached(app):
+    """Test that a fragment renders once until invalidated."""
+    calls = []
+    assert render(app, calls) == '1'
+    assert render(app, calls) == '1'
+    assert app.extensions['fragment_cache'].hits == 1
+
+
+def test_fragment_invalidated_on_commit(app, user):
+    """Test that committing a product bumps the products generation."""
+    calls = []
+    render(app, calls)
+
+    db.session.add(make_product(user.id, 'PRD-TEST-1'))
+    db.session.flush()
+    assert render(app, calls) == '1'  # not visible until committed
+
+    db.session.commit()
+    assert render(app, calls) == '2'
+
+
+def test_fragment_kept_on_rollback(app, user):
+    """Test that rolled back changes do not invalidate fragments."""
+    calls = []
+    render(app, calls)
+
+    db.session.add(make_product(user.id, 'PRD-TEST-1'))
+    db.session.flush()
+    db.session.rollback()
+    assert render(app, calls) == '1'
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+from app import db
+from app.credit import rebuild_exposure
+from app.models.client import Client, CreditLimitExceeded
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def client(seeded_db):
+    user = User.query.filter_by(email=EMAIL).one()
+    client = Client.query.filter_by(user_id=user.id).first()
+    client.credit_limit = client.exposure + 1000.0
+    db.session.commit()
+    return client
+
+
+def new_invoice(client, total_ttc):
+    invoice = Invoice(user_id=client.user_id, client_id=client.id, date=datetime(2030, 1, 1),
+                      total_ht=total_ttc, total_ttc=total_ttc)
+    db.session.add(invoice)
+    db.session.commit()
+    return invoice
+
+
+def exposure(client):
+    db.session.refresh(client)
+    return round(client.exposure, 2)
+
+
+def test_validation_raises_exposure(client):
+    """Test that drafts are free and validation counts against the limit."""
+    before = exposure(client)
+    invoice = new_invoice(client, 600.0)
+    assert exposure(client) == before
+
+    invoice.status = 'validated'
+    db.session.commit()
+    assert exposure(client) == round(before + 600.0, 2)
+    assert not client.can_create_invoice(600.0)
+
+
+def test_limit_is_enforced_in_the_transaction(client):
+    """Test that an invoice over the limit is rejected and nothing is written."""
+    before = exposure(client)
+    first, second = new_invoice(client, 600.0), new_invoice(client, 600.0)
+    first.status = 'validated'
+    db.session.commit()
+
+    second.status = 'validated'
+    with pytest.raises(CreditLimitExceeded):
+        db.session.commit()
+    db.session.rollback()
+    assert second.status == 'draft'
+    assert exposure(client) == round(before + 600.0, 2)
+
+
+def test_payments_and_cancellation_release_exposure(client):
+    """Test that completed payments, payment in full and cancellation lower the balance."""
+    before = exposure(client)
+    invoice = new_invoice(client, 900.0)
+    invoice.status = 'pending'
+    db.session.commit()
+
+    payment = Transaction(invoice_id=invoice.id, user_id=client.user_id, amount=400.0,
+                          payment_method='cash')
+    db.session.add(payment)
+    db.session.commit()
+    assert exposure(client) == round(before + 900.0, 2)
+
+    payment.complete()
+    assert invoice.status == 'partial'
+    assert exposure(client) == round(before + 500.0, 2)
+
+    invoice.status = 'cancelled'
+    db.session.commit()
+    assert exposure(client) == before
+
+
+def test_delete_releases_exposure(client):
+    """Test that deleting an issued invoice removes its unpaid amount."""
+    before = exposure(client)
+    invoice = new_invoice(client, 300.0)
+    invoice.status = 'validated'
+    db.session.commit()
+
+    db.session.delete(invoice)
+    db.session.commit()
+    assert exposure(client) == before
+
+
+def test_rebuild_matches_incremental(client):
+    """Test that the bulk rebuild agrees with the incrementally maintained balances."""
+    invoice = new_invoice(client, 700.0)
+    invoice.status = 'validated'
+    db.session.commit()
+    payment = Transaction(invoice_id=invoice.id, user_id=client.user_id, amount=200.0,
+                          payment_method='cash', status='completed')
+    db.session.add(payment)
+    db.session.commit()
+
+    incremental = {c.id: round(c.exposure, 2) for c in Client.query}
+    assert rebuild_exposure() == len(incremental)
+    db.session.expire_all()
+    assert {c.id: round(c.exposure, 2) for c in Client.query} == incremental
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import extract, func
+from app import db
+from app.declarations import DECLARED_STATUSES, monthly_declarations, rebuild
+from app.models.client import Client
+from app.models.declaration import TaxRollup
+from app.models.invoice import Invoice
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def user(seeded_db):
+    return User.query.filter_by(email=EMAIL).one()
+
+
+def scan(user_id, year):
+    """Monthly TVA computed the slow way, from the invoice table."""
+    rows = db.session.query(extract('month', Invoice.date), func.count(), func.sum(Invoice.tva)) \
+        .filter(Invoice.user_id == user_id, extract('year', Invoice.date) == year,
+                Invoice.status.in_(DECLARED_STATUSES)) \
+        .group_by(extract('month', Invoice.date)).all()
+    return {month: (count, round(tva, 2)) for month, count, tva in rows}
+
+
+def declared(user_id, year):
+    return {row['month']: (row['invoice_count'], row['tva'])
+            for row in monthly_declarations(user_id, year) if row['invoice_count']}
+
+
+def test_rollups_match_invoices(user):
+    """Test that the rollups rebuilt after seeding match a full scan."""
+    for year in (2022, 2023):
+        assert declared(user.id, year) == scan(user.id, year)
+
+
+def test_incremental_updates(user):
+    """Test that validating, editing, cancelling and deleting move the totals."""
+    client = Client.query.filter_by(user_id=user.id, credit_limit=0).first()
+    invoice = Invoice(user_id=user.id, client_id=client.id, date=datetime(2030, 3, 15),
+                      total_ht=1000.0, tva=190.0, tap=20.0, total_ttc=1210.0)
+    db.session.add(invoice)
+    db.session.commit()
+    assert declared(user.id, 2030) == {}
+
+    invoice.status = 'validated'
+    db.session.commit()
+    assert declared(user.id, 2030) == {3: (1, 190.0)}
+
+    invoice.total_ht, invoice.tva, invoice.tap, invoice.total_ttc = 2000.0, 380.0, 40.0, 2420.0
+    invoice.date = datetime(2030, 4, 1)
+    db.session.commit()
+    assert declared(user.id, 2030) == {4: (1, 380.0)}
+
+    invoice.status = 'cancelled'
+    db.session.commit()
+    assert declared(user.id, 2030) == {}
+
+    db.session.delete(invoice)
+    db.session.commit()
+    assert TaxRollup.query.filter_by(user_id=user.id, year=2030) \
+        .with_entities(func.sum(TaxRollup.invoice_count)).scalar() == 0
+
+
+def test_rollback_discards_changes(user):
+    """Test that rollup changes share the invoice transaction."""
+    invoice = Invoice.query.filter_by(user_id=user.id, status='draft').first()
+    before = declared(user.id, invoice.date.year)
+    invoice.status = 'paid'
+    db.session.flush()
+    db.session.rollback()
+    assert declared(user.id, invoice.date.year) == before
+
+
+def test_declarations_endpoint(client, user, max_queries):
+    """Test that a year of declarations is read from the rollups."""
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    client.get('/api/v1/declarations/2022')
+    # validators and the rollup read
+    with max_queries(2):
+        response = client.get('/api/v1/declarations/2023')
+    body = response.get_json()
+    assert [month['month'] for month in body['data']] == list(range(1, 13))
+    assert body['meta']['totals']['invoice_count'] == sum(count for count, _ in scan(user.id, 2023).values())
+
+
+def test_rebuild_command(runner, user):
+    """Test that the rebuild command restores corrupted rollups."""
+    TaxRollup.query.filter_by(user_id=user.id).delete()
+    db.session.commit()
+    result = runner.invoke(args=['declarations', 'rebuild', '--user', EMAIL])
+    assert result.exit_code == 0, result.output
+    assert declared(user.id, 2022) == scan(user.id, 2022)
+    assert rebuild() > 0
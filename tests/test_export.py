@@ -0,0 +1,78 @@
+import csv
+import io
+
+import pytest
+from app.export import build_query, stream_csv, write_xlsx, year_range
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.transaction import Transaction
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+
+
+def read_csv(chunks):
+    text = b''.join(chunks).decode('utf-8-sig')
+    return list(csv.reader(io.StringIO(text)))
+
+
+def test_build_query_unknown_dataset(app):
+    """Test that unknown datasets are rejected."""
+    with pytest.raises(ValueError):
+        build_query('users')
+
+
+def test_stream_csv(seeded_db):
+    """Test that every row is exported in small batches."""
+    start, end = year_range(2022)
+    statement = build_query('invoices', start=start, end=end)
+    stats = {}
+    chunks = list(stream_csv(statement, batch_size=10, stats=stats))
+    rows = read_csv(chunks)
+
+    expected = Invoice.query.filter(Invoice.date >= start, Invoice.date < end).count()
+    assert rows[0][:2] == ['invoice_number', 'date']
+    assert len(rows) - 1 == expected == stats['rows']
+    # Header chunk, then one chunk per batch
+    assert len(chunks) == 1 + -(-expected // 10)
+    assert all(row[1].startswith('2022-') for row in rows[1:])
+    assert rows[1][-1].count('.') == 1 and len(rows[1][-1].split('.')[1]) == 2
+
+
+def test_write_xlsx(seeded_db, tmp_path):
+    """Test the write-only XLSX export."""
+    openpyxl = pytest.importorskip('openpyxl')
+    path = tmp_path / 'transactions.xlsx'
+    count = write_xlsx(build_query('transactions'), str(path), title='transactions', batch_size=50)
+
+    assert count == Transaction.query.count()
+    sheet = openpyxl.load_workbook(path, read_only=True)['transactions']
+    rows = list(sheet.values)
+    assert rows[0][:2] == ('reference', 'date')
+    assert len(rows) == count + 1
+
+
+def test_export_endpoint(client, seeded_db):
+    """Test that the CSV download only contains the current user's rows."""
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    response = client.get('/invoices/export/invoice_items.csv')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert 'invoice_items.csv' in response.headers['Content-Disposition']
+
+    user = User.query.filter_by(email=EMAIL).one()
+    expected = InvoiceItem.query.join(Invoice).filter(Invoice.user_id == user.id).count()
+    assert len(read_csv([response.data])) - 1 == expected
+
+    assert client.get('/invoices/export/users.csv').status_code == 404
+
+
+def test_export_command(runner, seeded_db, tmp_path):
+    """Test the flask export command."""
+    path = tmp_path / 'invoices.csv'
+    result = runner.invoke(args=['export', 'invoices', '--user', EMAIL, '-o', str(path)])
+    assert result.exit_code == 0, result.output
+    assert 'rows/s' in result.output
+
+    user = User.query.filter_by(email=EMAIL).one()
+    rows = read_csv([path.read_bytes()])
+    assert len(rows) - 1 == Invoice.query.filter_by(user_id=user.id).count()
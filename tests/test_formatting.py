@@ -0,0 +1,36 @@
+import pytest
+from datetime import date, datetime
+from babel.numbers import format_currency as babel_currency, format_decimal as babel_decimal
+from babel.dates import format_datetime as babel_datetime
+from flask import render_template_string
+from app.formatting import format_currency, format_number, format_date, format_datetime
+
+AMOUNTS = [0, 0.005, 1, 12.5, 999.995, 1234.5, -1234.567, 1234567.891, 2.675, -0.4]
+
+
+@pytest.mark.parametrize('locale', ['ar_DZ', 'fr_DZ'])
+def test_matches_babel(locale):
+    """Test that the compiled formatters produce Babel's output."""
+    for amount in AMOUNTS:
+        assert format_currency(amount, locale=locale) == babel_currency(amount, 'DZD', locale=locale)
+        assert format_number(amount, locale=locale) == babel_decimal(amount, locale=locale)
+
+    moment = datetime(2024, 3, 5, 23, 30)
+    assert format_datetime(moment, locale=locale) == \
+        babel_datetime(moment, 'short', tzinfo='Africa/Algiers', locale=locale)
+
+
+def test_dates_use_local_timezone():
+    """Test that naive UTC datetimes are shown in Algiers time."""
+    assert format_date(datetime(2024, 3, 5, 23, 30), 'dd/MM/y') == '06/03/2024'
+    assert format_date(date(2024, 3, 5), 'dd/MM/y') == '05/03/2024'
+
+
+def test_template_filters(app):
+    """Test that the filters are registered with the configured locale."""
+    with app.test_request_context():
+        rendered = render_template_string(
+            '{{ amount|format_currency }}|{{ missing|format_currency }}|{{ day|format_date("y") }}',
+            amount=1234.5, missing=None, day=date(2024, 1, 1)
+        )
+    assert rendered == '\u200f1.234,50\xa0د.ج.\u200f||2024'
@@ -0,0 +1,90 @@
+import pytest
+from app import db
+from app.http_cache import conditional, cached_response
+from app.models.product import Product
+from app.models.user import User
+
+
+@pytest.fixture
+def calls(app):
+    """Register test views counting how often they render."""
+    calls = []
+
+    @app.route('/_products')
+    @conditional(Product)
+    def products():
+        calls.append('products')
+        return 'products'
+
+    @app.route('/_home')
+    @cached_response(timeout=60)
+    def home():
+        calls.append('home')
+        return 'home'
+
+    return calls
+
+
+def add_product(reference):
+    user = User.query.filter_by(email='test@example.com').first()
+    db.session.add(Product(name='Laptop', reference=reference, purchase_price=100,
+                           selling_price=150, user_id=user.id))
+    db.session.commit()
+
+
+def login(client, auth):
+    """Log in and drop the welcome flash message, which disables caching."""
+    auth.login()
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+
+
+def test_conditional_get(client, auth, test_user, calls):
+    """Test that an unchanged listing answers 304 without rendering."""
+    login(client, auth)
+    response = client.get('/_products')
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = client.get('/_products', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert calls == ['products']
+
+    add_product('PRD-TEST-1')
+    response = client.get('/_products', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_conditional_get_with_flashes(client, auth, test_user, calls):
+    """Test that pending flash messages force a full render."""
+    auth.login()
+    response = client.get('/_products')
+    assert 'ETag' not in response.headers
+
+
+def test_conditional_get_anonymous(client, calls):
+    """Test that anonymous requests are rendered without validators."""
+    response = client.get('/_products')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+
+def test_cached_response(client, calls):
+    """Test that anonymous pages are rendered once and revalidated."""
+    response = client.get('/_home')
+    assert response.data == b'home'
+    etag = response.headers['ETag']
+
+    assert client.get('/_home').data == b'home'
+    assert client.get('/_home', headers={'If-None-Match': etag}).status_code == 304
+    assert calls == ['home']
+
+
+def test_cached_response_skips_authenticated(client, auth, test_user, calls):
+    """Test that logged in users always get a fresh page."""
+    login(client, auth)
+    client.get('/_home')
+    client.get('/_home')
+    assert calls == ['home', 'home']
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.idempotency import purge_expired
+from app.models.client import Client
+from app.models.idempotency import IdempotencyKey
+from app.models.invoice import Invoice
+from app.models.job import Job
+from app.models.product import Product
+from app.models.transaction import Transaction
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def user(client, seeded_db):
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    return User.query.filter_by(email=EMAIL).one()
+
+
+@pytest.fixture
+def payload(user):
+    customer = Client.query.filter_by(user_id=user.id, credit_limit=0).first()
+    product = Product.query.filter_by(user_id=user.id).first()
+    return {'client_id': customer.id, 'items': [{'product_id': product.id, 'quantity': 2}],
+            'validate': True}
+
+
+def post(client, url, json, key):
+    return client.post(url, json=json, headers={'Idempotency-Key': key})
+
+
+def test_retry_replays_invoice_creation(client, payload):
+    """Test that a retried creation returns the first response without a second invoice."""
+    count = Invoice.query.count()
+    first = post(client, '/api/v1/invoices', payload, 'create-1')
+    assert first.status_code == 201
+    assert first.json['data']['status'] == 'validated'
+
+    retry = post(client, '/api/v1/invoices', payload, 'create-1')
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.json == first.json
+    assert retry.headers['Location'] == first.headers['Location']
+    assert Invoice.query.count() == count + 1
+
+    assert post(client, '/api/v1/invoices', payload, 'create-2').status_code == 201
+    assert Invoice.query.count() == count + 2
+    # Without a key, every request runs
+    assert client.post('/api/v1/invoices', json=payload).status_code == 201
+    assert Invoice.query.count() == count + 3
+
+
+def test_retry_replays_payment(client, user):
+    """Test that a retried payment is recorded and completed once."""
+    invoice = Invoice.query.filter_by(user_id=user.id, status='pending').first()
+    payment = {'invoice_id': invoice.id, 'amount': 10.0, 'payment_method': 'cash', 'complete': True}
+    count = Transaction.query.filter_by(invoice_id=invoice.id).count()
+    for _ in range(3):
+        response = post(client, '/api/v1/transactions', payment, 'pay-1')
+        assert response.status_code == 201
+        assert response.json['data']['status'] == 'completed'
+    assert Transaction.query.filter_by(invoice_id=invoice.id).count() == count + 1
+
+
+def test_key_reused_for_another_request(client, payload):
+    """Test that a key cannot be replayed for a different body."""
+    assert post(client, '/api/v1/invoices', payload, 'reused').status_code == 201
+    payload['items'][0]['quantity'] = 3
+    response = post(client, '/api/v1/invoices', payload, 'reused')
+    assert response.status_code == 422
+
+
+def test_in_flight_duplicate(client, user, payload):
+    """Test that a duplicate of a running request is told to retry, and never runs again."""
+    assert post(client, '/api/v1/invoices', payload, 'busy').status_code == 201
+    row = IdempotencyKey.query.filter_by(user_id=user.id, key='busy').one()
+    row.status, row.response_body = 'in_progress', None
+    db.session.commit()
+
+    response = post(client, '/api/v1/invoices', payload, 'busy')
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+
+    # After the lock timeout, the first request may have taken effect
+    count = Invoice.query.count()
+    row.created_at = datetime.utcnow() - timedelta(minutes=5)
+    db.session.commit()
+    response = post(client, '/api/v1/invoices', payload, 'busy')
+    assert response.status_code == 409
+    assert 'Retry-After' not in response.headers
+    assert Invoice.query.count() == count
+
+
+def test_errors_release_the_key(client, payload):
+    """Test that a rejected request does not burn its key."""
+    assert post(client, '/api/v1/invoices', {'client_id': payload['client_id']}, 'fix-me').status_code == 400
+    assert IdempotencyKey.query.filter_by(key='fix-me').count() == 0
+    assert post(client, '/api/v1/invoices', payload, 'fix-me').status_code == 201
+
+
+def test_bulk_endpoints(client, user):
+    """Test that a retried export is queued once."""
+    for _ in range(2):
+        response = post(client, '/api/v1/exports', {'dataset': 'invoices'}, 'export-1')
+        assert response.status_code == 202
+    assert Job.query.filter_by(user_id=user.id, task='export').count() == 1
+
+
+def test_expired_keys(client, user, payload):
+    """Test that expired keys are reusable and purged."""
+    assert post(client, '/api/v1/invoices', payload, 'old').status_code == 201
+    IdempotencyKey.query.filter_by(key='old').update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    payload['notes'] = 'Another request'
+    response = post(client, '/api/v1/invoices', payload, 'old')
+    assert response.status_code == 201 and 'Idempotent-Replayed' not in response.headers
+
+    count = IdempotencyKey.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    assert purge_expired() == count
+    assert IdempotencyKey.query.count() == 0
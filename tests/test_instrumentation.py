@@ -0,0 +1,75 @@
+import logging
+import pytest
+from app import db
+from app.instrumentation import fingerprint, count_queries
+from app.models.user import User
+
+
+def make_user(index):
+    user = User(
+        username=f'user{index}',
+        email=f'user{index}@example.com',
+        company_name='Test Company',
+        address='123 Test Street',
+        nif=f'{index:015d}',
+        nis=f'{index:015d}',
+        rc=f'{index:015d}',
+        art='12345'
+    )
+    user.set_password('password')
+    return user
+
+
+def test_fingerprint_normalizes_literals_and_in_lists():
+    """Test that statements differing only in values share a fingerprint."""
+    assert fingerprint("SELECT * FROM users WHERE id = 1") == \
+        fingerprint("SELECT *\n  FROM users WHERE id = 42")
+    assert fingerprint("SELECT * FROM users WHERE name = 'a'") == \
+        fingerprint("SELECT * FROM users WHERE name = 'b'")
+    assert fingerprint("SELECT * FROM users WHERE id IN (?, ?)") == \
+        fingerprint("SELECT * FROM users WHERE id IN (?, ?, ?, ?)")
+
+
+def test_count_queries(app):
+    """Test that statements executed inside the block are recorded."""
+    db.session.add(make_user(1))
+    db.session.commit()
+
+    with count_queries() as stats:
+        for _ in range(3):
+            User.query.filter_by(username='user1').first()
+
+    assert stats.count == 3
+    assert stats.duration > 0
+    assert stats.repeated(3)[0][1] == 3
+
+
+def test_max_queries_fixture(app, max_queries):
+    """Test that exceeding the query budget fails with the statements listed."""
+    with max_queries(1):
+        User.query.all()
+
+    with pytest.raises(AssertionError, match='Expected at most 1 queries, got 2'):
+        with max_queries(1):
+            User.query.all()
+            User.query.all()
+
+
+def test_request_n_plus_one_is_logged(app, client, caplog):
+    """Test that repeated statements within a request are flagged."""
+    for index in range(1, 7):
+        db.session.add(make_user(index))
+    db.session.commit()
+
+    @app.route('/_users')
+    def list_users():
+        ids = [user_id for (user_id,) in db.session.query(User.id)]
+        return ','.join(db.session.get(User, user_id, populate_existing=True).username
+                        for user_id in ids)
+
+    with caplog.at_level(logging.WARNING, logger='app.instrumentation'):
+        response = client.get('/_users')
+
+    assert response.status_code == 200
+    assert any('Possible N+1 in list_users: 6 executions' in record.getMessage()
+               for record in caplog.records)
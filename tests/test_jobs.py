@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.jobs import JobContext, claim, enqueue, perform, requeue_stale, task, work
+from app.models.job import Job
+
+EMAIL = 'supplier00001@example.com'
+
+calls = []
+
+
+@task('tests.record')
+def record(job, value):
+    calls.append(value)
+    job.progress(0.5, 'half way')
+    return {'value': value}
+
+
+@task('tests.flaky', max_attempts=2)
+def flaky(job):
+    calls.append('flaky')
+    if len(calls) == 1:
+        raise RuntimeError('first attempt fails')
+    return 'ok'
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def test_enqueue_unknown_task(app):
+    """Test that only registered tasks can be enqueued."""
+    with pytest.raises(ValueError):
+        enqueue('tests.missing')
+
+
+def test_priority_and_delay(app):
+    """Test that higher priorities run first and delayed jobs wait."""
+    low = enqueue('tests.record', value='low').id
+    high = enqueue('tests.record', priority=10, value='high').id
+    delayed = enqueue('tests.record', priority=20, delay=3600, value='later').id
+
+    assert claim('worker-1').id == high
+    assert claim('worker-2').id == low
+    assert claim('worker-3') is None
+    assert db.session.get(Job, delayed).status == 'queued'
+
+
+def test_success(app):
+    """Test that a job records its result and progress."""
+    job_id = enqueue('tests.record', value=42).id
+    assert work(app, burst=True) == 1
+
+    job = db.session.get(Job, job_id)
+    assert calls == [42]
+    assert (job.status, job.progress, job.result, job.attempts) == ('succeeded', 1.0, {'value': 42}, 1)
+    assert job.message == 'half way'
+    assert job.finished_at is not None
+
+
+def test_retry_with_backoff(app):
+    """Test that failures are retried after a growing delay, then succeed."""
+    app.config['JOB_RETRY_BACKOFF'] = 30
+    job_id = enqueue('tests.flaky').id
+    assert perform(claim('worker')) is False
+
+    job = db.session.get(Job, job_id)
+    assert job.status == 'queued'
+    assert 'first attempt fails' in job.error
+    assert job.run_at > datetime.utcnow() + timedelta(seconds=25)
+    assert claim('worker') is None
+
+    job.run_at = datetime.utcnow()
+    db.session.commit()
+    assert perform(claim('worker')) is True
+    assert db.session.get(Job, job_id).status == 'succeeded'
+
+
+def test_final_failure(app):
+    """Test that a job fails for good after max_attempts."""
+    job_id = enqueue('tests.flaky', max_attempts=1).id
+    work(app, burst=True)
+
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.attempts) == ('failed', 1)
+    assert job.finished_at is not None
+
+
+def test_requeue_stale(app):
+    """Test that jobs of a dead worker are requeued."""
+    job_id = enqueue('tests.record', value=1).id
+    claim('dead-worker')
+    db.session.get(Job, job_id).locked_at = datetime.utcnow() - timedelta(hours=2)
+    db.session.commit()
+
+    assert requeue_stale() == 1
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.locked_by) == ('queued', None)
+
+
+def test_progress_is_a_heartbeat(app):
+    """Test that a long job still reporting progress is not requeued."""
+    job_id = enqueue('tests.record', value=1).id
+    claim('busy-worker')
+    db.session.get(Job, job_id).locked_at = datetime.utcnow() - timedelta(hours=2)
+    db.session.commit()
+
+    JobContext(job_id).progress(0.5)
+    assert requeue_stale() == 0
+    db.session.expire_all()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.locked_by) == ('running', 'busy-worker')
+
+
+def test_export_job_endpoints(app, client, seeded_db, tmp_path):
+    """Test queueing an export, polling its status and downloading it."""
+    app.config['JOB_OUTPUT_FOLDER'] = str(tmp_path)
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+
+    response = client.post('/api/v1/exports', json={'dataset': 'invoices', 'year': 2022})
+    assert response.status_code == 202
+    status_url = response.headers['Location']
+    assert client.get(status_url).get_json()['data']['status'] == 'queued'
+
+    work(app, burst=True)
+    data = client.get(status_url).get_json()['data']
+    assert data['status'] == 'succeeded'
+    assert data['result']['rows'] > 0
+
+    download = client.get(data['download'])
+    assert download.status_code == 200
+    assert download.data.decode('utf-8-sig').startswith('invoice_number,')
+
+    assert client.post('/api/v1/exports', json={'dataset': 'users'}).status_code == 400
+
+
+def test_jobs_of_other_users(app, client, seeded_db):
+    """Test that users only see their own jobs."""
+    job_id = enqueue('tests.record', value=1).id
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    assert client.get(f'/api/v1/jobs/{job_id}').status_code == 404
+
+
+def test_worker_command(app, runner):
+    """Test running the queue to completion from the CLI."""
+    enqueue('tests.record', value='cli')
+    result = runner.invoke(args=['worker', '--burst'])
+    assert result.exit_code == 0, result.output
+    assert 'Ran 1 jobs' in result.output
+    assert calls == ['cli']
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from app import db
+from app.loaders import loader_options, profiled
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def user(seeded_db):
+    return User.query.filter_by(email=EMAIL).one()
+
+
+def test_invoice_list_profile(user, max_queries):
+    """Test that a listing touches clients and payments without N+1."""
+    # invoices with clients, transactions
+    with max_queries(2):
+        invoices = db.session.scalars(profiled('invoice_list').where(Invoice.user_id == user.id)).unique().all()
+        rows = [(invoice.client.name, invoice.payment_status) for invoice in invoices]
+    assert len(rows) == user.invoices.count()
+
+
+def test_invoice_detail_profile(user, max_queries):
+    """Test that an invoice page loads everything it shows up front."""
+    invoice_id = user.invoices.first().id
+    db.session.expunge_all()
+    with max_queries(3):
+        invoice = db.session.scalars(profiled('invoice_detail').where(Invoice.id == invoice_id)).unique().one()
+        [item.product.name for item in invoice.items]
+        invoice.amount_paid, invoice.client.nif, invoice.user.nif
+
+
+def test_client_list_profile(user, max_queries):
+    """Test that credit status comes from the stored exposure, without loading invoices."""
+    with max_queries(1):
+        clients = db.session.scalars(profiled('client_list').where(Client.user_id == user.id)).all()
+        [client.credit_status for client in clients]
+
+
+@pytest.mark.parametrize('url', ['/clients/', '/invoices/', '/invoices/?page=2'])
+def test_listing_pages(client, user, url, max_queries):
+    """Test that the listings render from their profile, without lazy loads."""
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    # user, count, page, and the invoices' payments
+    with max_queries(5):
+        response = client.get(url)
+    assert response.status_code == 200
+    assert 'Page' in response.get_data(as_text=True)
+
+
+def test_lazy_load_raises(user):
+    """Test that relationships missing from a profile raise in tests."""
+    db.session.expunge_all()
+    invoice = db.session.scalars(profiled('invoice_list').where(Invoice.user_id == user.id)).first()
+    with pytest.raises(InvalidRequestError):
+        invoice.items
+
+
+def test_unknown_profile(app):
+    """Test that unknown profiles are rejected."""
+    with pytest.raises(ValueError):
+        loader_options('everything')
+
+
+def test_large_collections_are_queries(user):
+    """Test that user collections are aggregated in SQL."""
+    invoices = user.invoices.all()
+    assert user.invoices.count() == len(invoices)
+    assert user.total_sales == pytest.approx(
+        sum(invoice.total_ttc for invoice in invoices if invoice.status == 'paid'))
+    assert user.pending_payments == pytest.approx(
+        sum(invoice.total_ttc for invoice in invoices if invoice.status == 'pending'))
@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+prometheus_client = pytest.importorskip('prometheus_client')
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.jobs import enqueue
+
+EMAIL = 'supplier00001@example.com'
+
+
+def scrape(client, **kwargs):
+    response = client.get('/metrics', **kwargs)
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    return response.get_data(as_text=True)
+
+
+def sample(text, name, **labels):
+    """Value of one sample, 0 when it has not been recorded yet."""
+    for family in text_string_to_metric_families(text):
+        for metric in family.samples:
+            if metric.name == name and all(metric.labels.get(k) == v for k, v in labels.items()):
+                return metric.value
+    return 0.0
+
+
+def test_request_and_query_metrics(client, seeded_db):
+    """Test that requests are timed per endpoint with their query counts."""
+    before = scrape(client)
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    assert client.get('/api/v1/products').status_code == 200
+    client.get('/no-such-page')
+    after = scrape(client)
+
+    labels = {'endpoint': 'api.products', 'method': 'GET'}
+    assert sample(after, 'http_request_duration_seconds_count', **labels) == \
+        sample(before, 'http_request_duration_seconds_count', **labels) + 1
+    assert sample(after, 'http_requests_total', status='200', **labels) == \
+        sample(before, 'http_requests_total', status='200', **labels) + 1
+    assert sample(after, 'http_requests_total', endpoint='unmatched', status='404') > \
+        sample(before, 'http_requests_total', endpoint='unmatched', status='404')
+    assert sample(after, 'db_queries_total', endpoint='api.products') > \
+        sample(before, 'db_queries_total', endpoint='api.products')
+    assert sample(after, 'db_pool_checkouts_total') > sample(before, 'db_pool_checkouts_total')
+    assert sample(after, 'password_hash_seconds_count', operation='check') == \
+        sample(before, 'password_hash_seconds_count', operation='check') + 1
+
+
+def test_cache_metrics(client, seeded_db):
+    """Test that conditional GET hits and misses are counted."""
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    # Pending flash messages disable conditional responses
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+    before = scrape(client)
+    etag = client.get('/api/v1/products').headers['ETag']
+    assert client.get('/api/v1/products', headers={'If-None-Match': etag}).status_code == 304
+    after = scrape(client)
+    for result in ('hit', 'miss'):
+        assert sample(after, 'cache_requests_total', cache='conditional', result=result) == \
+            sample(before, 'cache_requests_total', cache='conditional', result=result) + 1
+
+
+def test_job_queue_depth(client, app):
+    """Test that queued jobs are reported when scraped."""
+    enqueue('export', dataset='invoices')
+    enqueue('export', dataset='invoices', delay=60)
+    text = scrape(client)
+    assert sample(text, 'jobs', status='queued') == 2
+    assert sample(text, 'jobs', status='running') == 0
+
+
+def test_metrics_token(client, app):
+    """Test that a configured token is required."""
+    app.config['METRICS_TOKEN'] = 'secret'
+    assert client.get('/metrics').status_code == 401
+    scrape(client, headers={'Authorization': 'Bearer secret'})
+
+
+def test_metrics_closed_without_token(client, app):
+    """Test that outside debug and testing the endpoint needs a configured token."""
+    app.testing = False
+    assert client.get('/metrics').status_code == 403
+    app.config['METRICS_TOKEN'] = 'secret'
+    scrape(client, headers={'Authorization': 'Bearer secret'})
+
+
+SCRIPT = '''
+import sys
+from app import create_app, db
+app = create_app({'TESTING': True, 'SECRET_KEY': 'test',
+                  'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + sys.argv[1]})
+with app.app_context():
+    db.create_all()
+client = app.test_client()
+client.get('/auth/login')
+if sys.argv[2] == 'scrape':
+    sys.stdout.write(client.get('/metrics').get_data(as_text=True))
+'''
+
+
+def test_multiprocess_mode(tmp_path):
+    """Test that a scrape aggregates the metrics of every worker process."""
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path / 'metrics'))
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+    database = str(tmp_path / 'app.db')
+
+    def run(mode):
+        return subprocess.run([sys.executable, '-c', SCRIPT, database, mode], env=env,
+                              cwd=os.path.dirname(os.path.dirname(__file__)),
+                              capture_output=True, text=True, check=True).stdout
+
+    run('request')
+    run('request')
+    text = run('scrape')
+    assert sample(text, 'http_requests_total', endpoint='auth.login', status='200') == 3
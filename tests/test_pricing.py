@@ -0,0 +1,120 @@
+from datetime import date, datetime
+
+import pytest
+from app import db
+from app.analytics import fetch, margin_analysis
+from app.export import year_range
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.price import ProductPrice
+from app.models.product import Product
+from app.models.user import User
+from app.pricing import price_at, prices_at
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def user(seeded_db):
+    return User.query.filter_by(email=EMAIL).one()
+
+
+@pytest.fixture
+def product(user):
+    """A product with a known price history."""
+    product = Product(name='Drill', reference='PRD-HIST-1', purchase_price=100,
+                      selling_price=150, user_id=user.id)
+    db.session.add(product)
+    db.session.commit()
+    ProductPrice.query.filter_by(product_id=product.id).delete()
+    db.session.add_all([
+        ProductPrice(product_id=product.id, purchase_price=80, selling_price=120,
+                     valid_from=datetime(2022, 1, 1)),
+        ProductPrice(product_id=product.id, purchase_price=90, selling_price=135,
+                     valid_from=datetime(2023, 6, 1)),
+        ProductPrice(product_id=product.id, purchase_price=100, selling_price=150,
+                     valid_from=datetime(2024, 1, 1)),
+    ])
+    db.session.commit()
+    return product
+
+
+def history(product):
+    return [(row.purchase_price, row.selling_price) for row in
+            ProductPrice.query.filter_by(product_id=product.id).order_by(ProductPrice.id)]
+
+
+def test_price_changes_are_recorded(user):
+    """Test that inserts and price changes add history rows, other updates do not."""
+    product = Product(name='Saw', reference='PRD-HIST-2', purchase_price=10,
+                      selling_price=15, user_id=user.id)
+    db.session.add(product)
+    db.session.commit()
+    assert history(product) == [(10, 15)]
+
+    product.stock = 40
+    db.session.commit()
+    product.selling_price = 18
+    db.session.commit()
+    product.purchase_price = 10
+    db.session.commit()
+    assert history(product) == [(10, 15), (10, 18)]
+
+
+def test_seeded_products_have_history(user):
+    """Test that products inserted by the seeder start their history."""
+    assert ProductPrice.query.count() >= Product.query.count()
+
+
+def test_batch_lookup(product, user, max_queries):
+    """Test that many (product, time) pairs are resolved with one query."""
+    other = Product.query.filter(Product.user_id == user.id, Product.id != product.id).first()
+    pairs = [
+        (product.id, datetime(2022, 3, 1)),
+        (product.id, datetime(2023, 6, 1)),
+        (product.id, date(2023, 12, 31)),
+        (product.id, datetime(2030, 1, 1)),
+        (product.id, datetime(2020, 1, 1)),
+        (other.id, datetime(2023, 1, 1)),
+        (999999, datetime(2023, 1, 1)),
+    ]
+    with max_queries(1):
+        prices = prices_at(pairs)
+    assert prices[pairs[0]] == (80, 120)
+    assert prices[pairs[1]] == (90, 135)
+    assert prices[pairs[2]] == (90, 135)
+    assert prices[pairs[3]] == (100, 150)
+    # Before the first row: the earliest known prices
+    assert prices[pairs[4]] == (80, 120)
+    assert prices[pairs[5]].selling_price > 0
+    assert pairs[6] not in prices
+
+    with pytest.raises(ValueError):
+        prices_at([(product.id, '2023-01-01')])
+
+
+def test_product_without_history_uses_current_prices(product):
+    """Test the fallback to the product's own prices."""
+    ProductPrice.query.filter_by(product_id=product.id).delete()
+    db.session.commit()
+    assert price_at(product.id, datetime(2022, 1, 1)) == (100, 150)
+
+
+def test_backdated_invoice_uses_price_at_its_date(product, user):
+    """Test that add_item bills a back-dated invoice at the price of its date."""
+    customer = Client.query.filter_by(user_id=user.id, credit_limit=0).first()
+    invoice = Invoice(user_id=user.id, client_id=customer.id, date=datetime(2023, 7, 15))
+    assert invoice.add_item(product, 2).unit_price == 135
+
+    today = Invoice(user_id=user.id, client_id=customer.id, date=datetime.utcnow())
+    assert today.add_item(product, 2).unit_price == 150
+
+
+def test_margins_use_cost_at_sale_time(user):
+    """Test that changing a purchase price does not rewrite past margins."""
+    before = {row['id']: row['margin'] for row in margin_analysis(fetch(user.id, *year_range(2023)))}
+    product = db.session.get(Product, next(iter(before)))
+    product.purchase_price *= 3
+    db.session.commit()
+    after = {row['id']: row['margin'] for row in margin_analysis(fetch(user.id, *year_range(2023)))}
+    assert after == pytest.approx(before)
@@ -0,0 +1,107 @@
+from datetime import datetime
+
+import pytest
+from app import db
+from app.declarations import monthly_declarations
+from app.models.client import Client
+from app.models.declaration import TaxRollup
+from app.models.invoice import Invoice
+from app.models.product import Product
+from app.models.recurring import RecurringInvoice
+from app.models.user import User
+from app.recurring import generate, parse_period
+from app.sync import current_sequence, encode_token, sync_page
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def templates(seeded_db):
+    user = User.query.filter_by(email=EMAIL).one()
+    clients = Client.query.filter_by(user_id=user.id).limit(5).all()
+    product, other = Product.query.filter_by(user_id=user.id).limit(2).all()
+    templates = []
+    for index, client in enumerate(clients):
+        template = RecurringInvoice(name=f'Maintenance {index}', user_id=user.id, client_id=client.id,
+                                    start_date=datetime(2030, 1, 1))
+        template.add_line(product, 2)
+        template.add_line(other, 1, unit_price=1000.0, description='Forfait')
+        templates.append(template)
+    templates[-1].end_date = datetime(2030, 2, 28)
+    db.session.add_all(templates)
+    # A template without lines is never generated
+    db.session.add(RecurringInvoice(name='Empty', user_id=user.id, client_id=clients[0].id,
+                                    start_date=datetime(2030, 1, 1)))
+    db.session.commit()
+    return templates
+
+
+def test_generate_period(templates):
+    """Test that each due template gets one draft with numbers, totals and due date."""
+    counts = generate('2030-03', batch_size=2)
+    assert counts == {'invoices': 4, 'invoice_items': 8}
+
+    invoices = Invoice.query.filter_by(billing_period='2030-03').order_by(Invoice.recurring_id).all()
+    assert [invoice.recurring_id for invoice in invoices] == [t.id for t in templates[:4]]
+    assert [invoice.invoice_number for invoice in invoices] == \
+        [f'FAC-2030-{number:05d}' for number in range(1, 5)]
+
+    template, invoice = templates[0], invoices[0]
+    product_price = template.lines[0].product.selling_price
+    assert invoice.status == 'draft'
+    assert invoice.total_ht == pytest.approx(2 * product_price + 1000.0)
+    assert invoice.total_ttc == pytest.approx(invoice.total_ht * 1.21)
+    assert invoice.date == datetime(2030, 3, 1)
+    assert (invoice.due_date - invoice.date).days == template.client.payment_terms
+    assert sorted(item.unit_price for item in invoice.items) == sorted([product_price, 1000.0])
+
+
+def test_generate_uses_configured_tax_rates(app, templates):
+    """Test that generated drafts are taxed at the configured rates, like ORM invoices."""
+    app.config.update(TVA_RATE=0.09, TAP_RATE=0.01)
+    generate('2030-03')
+    invoice = Invoice.query.filter_by(billing_period='2030-03').first()
+    assert invoice.tva == pytest.approx(invoice.total_ht * 0.09)
+    assert invoice.total_ttc == pytest.approx(invoice.total_ht * 1.10)
+    invoice.calculate_totals()
+    assert invoice.total_ttc == pytest.approx(invoice.total_ht * 1.10)
+
+
+def test_generate_is_idempotent(templates):
+    """Test that re-running a period creates nothing and the next period continues numbering."""
+    generate('2030-02')
+    assert generate('2030-02') == {'invoices': 0, 'invoice_items': 0}
+    assert Invoice.query.filter_by(billing_period='2030-02').count() == 5
+
+    generate('2030-03')
+    numbers = sorted(invoice.invoice_number for invoice in Invoice.query.filter(
+        Invoice.billing_period.isnot(None)))
+    assert numbers == [f'FAC-2030-{number:05d}' for number in range(1, 10)]
+
+
+def test_generate_updates_rollups(templates):
+    """Test that the generated drafts are counted in the draft tax rollup."""
+    generate('2030-03')
+    rollup = TaxRollup.query.filter_by(user_id=templates[0].user_id, year=2030, month=3,
+                                       status='draft').one()
+    assert rollup.invoice_count == 4
+    # Drafts are not declared until validated
+    assert monthly_declarations(templates[0].user_id, 2030)[2]['invoice_count'] == 0
+
+
+def test_generate_reaches_sync(templates):
+    """Test that the generated drafts are sent to devices by the next incremental sync."""
+    user_id = templates[0].user_id
+    token = encode_token({'s': current_sequence(user_id)})
+    generate('2030-03')
+    page = sync_page(user_id, token)
+    invoices = Invoice.query.filter_by(billing_period='2030-03').all()
+    assert sorted(row['id'] for row in page['data']['invoices']) == sorted(invoice.id for invoice in invoices)
+    assert all(len(row['items']) == 2 for row in page['data']['invoices'])
+
+
+def test_parse_period():
+    """Test that malformed periods are rejected."""
+    assert parse_period('2030-03') == datetime(2030, 3, 1)
+    with pytest.raises(ValueError):
+        parse_period('03/2030')
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import func, select
+from app import db
+from app.models.user import User
+from app.models.client import Client
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.transaction import Transaction
+from app.seed import seed_database
+
+
+def snapshot():
+    """Summarize generated data so two runs can be compared."""
+    return db.session.execute(select(
+        func.count(Invoice.id), func.sum(Invoice.total_ttc), func.max(Invoice.invoice_number)
+    )).one()
+
+
+def test_seed_counts(app, seeded_db):
+    """Test that the requested volumes are inserted."""
+    assert seeded_db['users'] == User.query.count() == 2
+    assert seeded_db['clients'] == Client.query.count() == 20
+    assert seeded_db['invoices'] == Invoice.query.count() == 200
+    assert seeded_db['invoice_items'] == InvoiceItem.query.count()
+    assert seeded_db['transactions'] == Transaction.query.count()
+
+
+def test_seed_totals_match_items(app, seeded_db):
+    """Test that precomputed invoice totals agree with their items."""
+    invoice = db.session.get(Invoice, 1)
+    total_ht = sum(item.subtotal for item in invoice.items)
+    assert invoice.total_ht == pytest.approx(total_ht)
+    assert invoice.total_ttc == pytest.approx(total_ht * 1.21, rel=1e-6)
+    assert invoice.invoice_number == 'FAC-2022-00001'
+
+
+def test_seed_uses_configured_tax_rates(app):
+    """Test that seeded invoices are taxed at the configured rates."""
+    app.config.update(TVA_RATE=0.09, TAP_RATE=0.01)
+    seed_database(scale='tiny', seed=7)
+    invoice = db.session.get(Invoice, 1)
+    assert invoice.total_ttc == pytest.approx(invoice.total_ht * 1.10, rel=1e-6)
+
+
+def test_seed_is_deterministic(app):
+    """Test that the same seed generates the same data."""
+    seed_database(scale='tiny', seed=7)
+    first = snapshot()
+    db.drop_all()
+    db.create_all()
+    seed_database(scale='tiny', seed=7)
+    assert snapshot() == first
+
+
+def test_seed_appends_after_existing_rows(app, seeded_db):
+    """Test that seeding twice continues ids and invoice numbers."""
+    result = seed_database(scale='tiny', seed=1, users=1, invoices=10)
+    assert result['invoices'] == 10
+    assert Invoice.query.count() == 210
+    assert User.query.count() == 3
+
+
+def test_seed_command(runner):
+    """Test the flask seed command."""
+    result = runner.invoke(args=['seed', '--scale', 'tiny', '--invoices', '50'])
+    assert result.exit_code == 0, result.output
+    assert 'invoices:         50' in result.output
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import select
+from app import db
+from app.instrumentation import count_queries
+from app.models.invoice import Invoice
+from app.models.user import User
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def draft(seeded_db):
+    user = User.query.filter_by(email=EMAIL).one()
+    return Invoice.query.filter_by(user_id=user.id, status='draft') \
+        .filter(Invoice.items.any()).first()
+
+
+def test_validate_freezes_snapshot(draft):
+    """Test that later product and client edits do not change a validated invoice."""
+    item = draft.items[0]
+    product_name, client_nif = item.product.name, draft.client.nif
+    draft.validate()
+    db.session.commit()
+
+    item.product.name = 'Renamed'
+    draft.client.nif = '000000000000000'
+    db.session.commit()
+
+    document = draft.document
+    assert draft.status == 'validated'
+    assert document['client']['nif'] == client_nif
+    assert document['supplier']['nif'] == draft.user.nif
+    assert document['items'][0]['name'] == product_name
+    assert len(document['items']) == len(draft.items)
+
+    with pytest.raises(ValueError):
+        draft.validate()
+
+
+def test_render_from_single_row(draft, max_queries):
+    """Test that a validated invoice renders without touching related tables."""
+    draft.validate()
+    db.session.commit()
+    invoice_id = draft.id
+    db.session.expunge_all()
+
+    with max_queries(1):
+        invoice = db.session.get(Invoice, invoice_id)
+        assert invoice.document['items']
+
+
+def test_detail_page(client, draft):
+    """Test that the invoice page renders drafts live and validated invoices from the snapshot."""
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    response = client.get(f'/invoices/{draft.id}')
+    assert response.status_code == 200
+    assert draft.client.name in response.get_data(as_text=True)
+
+    draft.validate()
+    db.session.commit()
+    name = draft.items[0].product.name
+    db.session.expunge_all()
+    with count_queries() as stats:
+        response = client.get(f'/invoices/{draft.id}')
+    assert response.status_code == 200
+    assert name in response.get_data(as_text=True)
+    assert not [statement for statement in stats.statements
+                if 'invoice_items' in statement or 'products' in statement]
+
+
+def test_snapshot_on_status_change(draft):
+    """Test that setting the status directly also takes the snapshot."""
+    draft.status = 'pending'
+    db.session.commit()
+    assert draft.snapshot['invoice_number'] == draft.invoice_number
+
+
+def test_drafts_have_no_snapshot(draft):
+    """Test that drafts render from live records."""
+    assert draft.snapshot is None
+    assert draft.document['client']['name'] == draft.client.name
+
+
+def test_snapshot_command(runner, seeded_db):
+    """Test backfilling snapshots of invoices issued before snapshots existed."""
+    result = runner.invoke(args=['invoices', 'snapshot', '--batch-size', '25'])
+    assert result.exit_code == 0, result.output
+    missing = db.session.scalars(select(Invoice.id).where(
+        Invoice.snapshot.is_(None), Invoice.status.notin_(['draft', 'cancelled']))).all()
+    assert missing == []
@@ -0,0 +1,56 @@
+import pytest
+import flask_migrate
+from sqlalchemy import inspect
+from app import create_app, db
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'startup.db'}"
+
+
+def make_app(database_url, mode, **config):
+    return create_app(dict({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'DB_STARTUP_CHECK': mode,
+    }, **config))
+
+
+def test_create_all_mode_creates_tables(database_url):
+    """Test that the default mode still creates missing tables."""
+    app = make_app(database_url, 'create_all')
+    with app.app_context():
+        assert 'invoices' in inspect(db.engine).get_table_names()
+
+
+def test_none_mode_skips_schema(database_url):
+    """Test that no tables are created when the check is disabled."""
+    app = make_app(database_url, 'none')
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+
+
+def test_invalid_mode(database_url):
+    """Test that an unknown startup check is rejected."""
+    with pytest.raises(ValueError, match='Invalid DB_STARTUP_CHECK'):
+        make_app(database_url, 'bogus')
+
+
+def test_revision_mode(database_url, tmp_path):
+    """Test that startup fails until the database is migrated to head."""
+    directory = str(tmp_path / 'migrations')
+    with pytest.raises(RuntimeError, match='Cannot read migrations'):
+        make_app(database_url, 'revision', MIGRATIONS_DIRECTORY=directory)
+
+    app = make_app(database_url, 'none', MIGRATIONS_DIRECTORY=directory)
+    with app.app_context():
+        flask_migrate.init(directory)
+        flask_migrate.migrate(directory)
+
+    with pytest.raises(RuntimeError, match="run 'flask db upgrade'"):
+        make_app(database_url, 'revision', MIGRATIONS_DIRECTORY=directory)
+
+    with app.app_context():
+        flask_migrate.upgrade(directory)
+    make_app(database_url, 'revision', MIGRATIONS_DIRECTORY=directory)
@@ -0,0 +1,148 @@
+import io
+import zipfile
+from datetime import datetime
+
+import pytest
+from app import db
+from app.declarations import DECLARED_STATUSES
+from app.jobs import JobContext, enqueue, work
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.job import Job
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.statements import (account_statement, iter_statements, month_range, statement_page,
+                            write_statements)
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def user(seeded_db):
+    return User.query.filter_by(email=EMAIL).one()
+
+
+@pytest.fixture
+def busy_client(user):
+    clients = Client.query.filter_by(user_id=user.id).all()
+    return max(clients, key=lambda client: len(client.invoices))
+
+
+def expected_balance(client, end=None):
+    """Balance computed from the ORM objects."""
+    balance = 0.0
+    for invoice in client.invoices:
+        if invoice.status in DECLARED_STATUSES and (end is None or invoice.date < end):
+            balance += invoice.total_ttc
+        for transaction in invoice.transactions:
+            if transaction.status == 'completed' and (end is None or transaction.date < end):
+                balance -= transaction.amount
+    return round(balance, 2)
+
+
+def test_running_balance(user, busy_client):
+    """Test that entries are chronological and the running balance adds up."""
+    statement = account_statement(user.id, busy_client.id)
+    entries = statement['entries']
+    assert entries and statement['opening_balance'] == 0.0
+
+    balance = 0.0
+    for entry in entries:
+        balance += entry['debit'] - entry['credit']
+        assert entry['balance'] == pytest.approx(balance, abs=0.01)
+    assert [entry['date'] for entry in entries] == sorted(entry['date'] for entry in entries)
+    assert statement['closing_balance'] == pytest.approx(expected_balance(busy_client), abs=0.01)
+
+
+def test_period_opening_balance(user, busy_client):
+    """Test that a month's statement starts from the balance before it."""
+    start, end = month_range('2023-06')
+    statement = account_statement(user.id, busy_client.id, start, end)
+    assert statement['opening_balance'] == pytest.approx(expected_balance(busy_client, start), abs=0.01)
+    assert statement['closing_balance'] == pytest.approx(expected_balance(busy_client, end), abs=0.01)
+    assert all(start <= entry['date'] < end for entry in statement['entries'])
+
+
+def test_keyset_pages(user, busy_client):
+    """Test that pages chain without gaps or duplicates."""
+    full = account_statement(user.id, busy_client.id)['entries']
+    pages, cursor = [], None
+    while True:
+        entries, cursor = statement_page(user.id, busy_client.id, cursor=cursor, limit=3)
+        pages.extend(entries)
+        if cursor is None:
+            break
+    assert pages == full
+    with pytest.raises(ValueError):
+        statement_page(user.id, busy_client.id, cursor='garbage')
+
+
+def test_same_day_invoice_before_payment(user):
+    """Test that an invoice comes before a payment made the same day."""
+    client = Client.query.filter_by(user_id=user.id, credit_limit=0).first()
+    day = datetime(2031, 5, 4)
+    invoice = Invoice(user_id=user.id, client_id=client.id, date=day, status='validated',
+                      total_ht=100.0, total_ttc=121.0)
+    db.session.add(invoice)
+    db.session.flush()
+    db.session.add(Transaction(invoice_id=invoice.id, user_id=user.id, amount=121.0, date=day,
+                               payment_method='cash', status='completed'))
+    db.session.commit()
+
+    entries = account_statement(user.id, client.id, *month_range('2031-05'))['entries']
+    assert [entry['kind'] for entry in entries] == ['invoice', 'payment']
+    assert entries[-1]['balance'] == pytest.approx(entries[0]['balance'] - 121.0)
+
+
+def test_bulk_month_end(user, app, tmp_path):
+    """Test that every client with activity or a balance gets one statement."""
+    start, end = month_range('2023-06')
+    statements = list(iter_statements(user.id, start, end))
+    for statement in statements:
+        expected = account_statement(user.id, statement['client'].id, start, end)
+        assert statement['entries'] == expected['entries']
+        assert statement['opening_balance'] == expected['opening_balance']
+
+    path = tmp_path / 'statements.zip'
+    assert write_statements(user.id, '2023-06', str(path), format='html') == len(statements)
+    with zipfile.ZipFile(path) as archive:
+        assert len(archive.namelist()) == len(statements)
+        assert 'Solde initial' in archive.read(archive.namelist()[0]).decode('utf-8')
+
+
+def test_statements_job_progress(app, user, tmp_path, monkeypatch):
+    """Test that the month-end job reports a growing fraction per statement."""
+    app.config['JOB_OUTPUT_FOLDER'] = str(tmp_path)
+    reported = []
+    monkeypatch.setattr(JobContext, 'progress', lambda job, fraction, message=None: reported.append(fraction))
+    enqueue('statements', period='2023-06', format='html', supplier_id=user.id)
+    work(app, burst=True)
+    assert reported[0] == 0.0
+    assert reported[1:] == sorted(reported[1:]) and 0.0 < reported[-1] <= 1.0
+
+
+def test_statement_views(client, user, busy_client, app, tmp_path):
+    """Test the HTML and PDF pages, the JSON ledger and the month-end job."""
+    app.config['JOB_OUTPUT_FOLDER'] = str(tmp_path)
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    response = client.get(f'/clients/{busy_client.id}/statement?period=2023-06')
+    assert response.status_code == 200
+    assert 'Relevé de compte' in response.get_data(as_text=True)
+
+    response = client.get(f'/clients/{busy_client.id}/statement?format=pdf')
+    assert response.mimetype == 'application/pdf'
+    assert response.data.startswith(b'%PDF')
+
+    response = client.get(f'/api/v1/clients/{busy_client.id}/statement?limit=2')
+    assert response.status_code == 200
+    assert len(response.json['data']) == 2 and response.json['links']['next']
+    assert response.json['meta']['opening_balance'] == 0.0
+    assert client.get('/api/v1/clients/999999/statement').status_code == 404
+
+    response = client.post('/api/v1/statements', json={'period': '2023-06', 'format': 'pdf'})
+    assert response.status_code == 202
+    work(app, burst=True)
+    job = db.session.get(Job, response.json['data']['id'])
+    assert job.status == 'succeeded', job.error
+    download = client.get(f'/api/v1/jobs/{job.id}/download')
+    assert zipfile.ZipFile(io.BytesIO(download.data)).namelist()[0].endswith('.pdf')
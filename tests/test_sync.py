@@ -0,0 +1,203 @@
+import gzip
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from app import db
+from app.models.client import Client
+from app.models.invoice import Invoice
+from app.models.product import Product
+from app.models.sync import SEQUENCE_LOCK, SyncChange, lock_sequence
+from app.models.user import User
+from app.sync import compact, decode_token
+from sqlalchemy.dialects import postgresql
+
+EMAIL = 'supplier00001@example.com'
+
+
+@pytest.fixture
+def user(client, seeded_db):
+    client.post('/auth/login', data={'email': EMAIL, 'password': 'password'})
+    return User.query.filter_by(email=EMAIL).one()
+
+
+def full_sync(client, limit=200):
+    """Page through a full sync, returning the rows by resource and the final token."""
+    rows, token, pages = {}, None, 0
+    while True:
+        url = f'/api/v1/sync?limit={limit}' + (f'&token={token}' if token else '')
+        page = client.get(url).json
+        pages += 1
+        for name, data in page['data'].items():
+            rows.setdefault(name, []).extend(data)
+        token = page['token']
+        if not page['more']:
+            return rows, token, pages
+
+
+def test_full_sync_pages_every_resource(client, user):
+    """Test that a full sync returns every row of the user once, invoices with their items."""
+    rows, token, pages = full_sync(client, limit=10)
+    for name, model in (('products', Product), ('clients', Client), ('invoices', Invoice)):
+        ids = [row['id'] for row in rows[name]]
+        assert len(ids) == len(set(ids))
+        assert sorted(ids) == sorted(id for id, in db.session.query(model.id).filter_by(user_id=user.id))
+    assert pages > 4
+    assert all('items' in invoice for invoice in rows['invoices'])
+    assert 'e' not in decode_token(token)
+
+    # Nothing changed since
+    page = client.get(f'/api/v1/sync?token={token}').json
+    assert page == {'data': {}, 'deleted': {}, 'token': token, 'more': False}
+
+
+def test_incremental_sync_returns_changed_rows_only(client, user):
+    """Test that only rows changed after the token are sent, once each, with tombstones for deletes."""
+    _, token, _ = full_sync(client)
+
+    product = Product.query.filter_by(user_id=user.id).first()
+    product.stock += 1
+    product.name = 'Renamed'
+    db.session.commit()
+    product.stock += 1
+    db.session.commit()
+    removed = Client(name='Temporary', address='Alger', nif='1', nis='1', rc='1', art='1',
+                     user_id=user.id)
+    db.session.add(removed)
+    db.session.commit()
+    removed_id = removed.id
+    db.session.delete(removed)
+    db.session.commit()
+    other = Product.query.filter(Product.user_id != user.id).first()
+    other.stock += 1
+    db.session.commit()
+
+    page = client.get(f'/api/v1/sync?token={token}').json
+    assert [row['id'] for row in page['data']['products']] == [product.id]
+    assert page['data']['products'][0]['name'] == 'Renamed'
+    assert page['deleted'] == {'clients': [removed_id]}
+    assert 'clients' not in page['data']
+    assert not page['more']
+
+    again = client.get(f"/api/v1/sync?token={page['token']}").json
+    assert again['data'] == {} and again['deleted'] == {}
+
+
+def test_incremental_sync_pages(client, user):
+    """Test that changes are paged in sequence order."""
+    _, token, _ = full_sync(client)
+    products = Product.query.filter_by(user_id=user.id).order_by(Product.id).limit(5).all()
+    for product in products:
+        product.stock += 1
+        db.session.commit()
+
+    seen = []
+    while True:
+        page = client.get(f'/api/v1/sync?token={token}&limit=2').json
+        seen.extend(row['id'] for row in page['data'].get('products', []))
+        token = page['token']
+        if not page['more']:
+            break
+    assert seen == [product.id for product in products]
+
+
+def test_item_change_syncs_invoice(client, user):
+    """Test that changing an invoice item sends its invoice again."""
+    _, token, _ = full_sync(client)
+    invoice = Invoice.query.filter_by(user_id=user.id, status='draft').first() \
+        or Invoice.query.filter_by(user_id=user.id).first()
+    item = invoice.items[0]
+    item.description = 'Changed line'
+    db.session.commit()
+
+    page = client.get(f'/api/v1/sync?token={token}').json
+    synced, = page['data']['invoices']
+    assert synced['id'] == invoice.id
+    assert 'Changed line' in [line['description'] for line in synced['items']]
+
+
+def test_sync_response_is_compressed(client, user):
+    """Test that the response is compressed when the client accepts it."""
+    response = client.get('/api/v1/sync?limit=100', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data))['data']
+
+    plain = client.get('/api/v1/sync?limit=100', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert len(response.data) < len(plain.data)
+
+
+def test_invalid_token(client, user):
+    """Test that a malformed token is rejected."""
+    assert client.get('/api/v1/sync?token=garbage').status_code == 400
+
+
+def test_compact_keeps_latest_change(client, user):
+    """Test that compaction keeps only the latest entry of each row."""
+    product = Product.query.filter_by(user_id=user.id).first()
+    for _ in range(3):
+        product.stock += 1
+        db.session.commit()
+    entries = SyncChange.query.filter_by(entity='products', entity_id=product.id)
+    latest = max(entry.id for entry in entries)
+
+    assert compact() >= 2
+    assert [entry.id for entry in entries] == [latest]
+
+
+def test_client_updated_at(app, user):
+    """Test that updating a client bumps its updated_at."""
+    customer = Client.query.filter_by(user_id=user.id).first()
+    customer.updated_at = None
+    db.session.commit()
+    customer.notes = 'Visited'
+    db.session.commit()
+    assert customer.updated_at is not None
+    before = customer.updated_at
+    time.sleep(0.01)
+    customer.phone = '0555000000'
+    db.session.commit()
+    assert customer.updated_at > before
+
+
+class RecordingConnection:
+    """Connection of the given dialect that records what it executes"""
+
+    def __init__(self, dialect):
+        self.dialect = SimpleNamespace(name=dialect)
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(str(statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})))
+
+
+def test_lock_sequence_serialises_writers_per_user():
+    """Test that a transaction-scoped lock is taken per user, in user order, on PostgreSQL."""
+    connection = RecordingConnection('postgresql')
+    lock_sequence(connection, [7, 3, 7])
+    assert connection.statements == [
+        f'SELECT pg_advisory_xact_lock({SEQUENCE_LOCK}, {user_id}) AS pg_advisory_xact_lock_1'
+        for user_id in (3, 7)
+    ]
+
+    sqlite = RecordingConnection('sqlite')
+    lock_sequence(sqlite, [3])
+    assert sqlite.statements == []
+
+
+def test_flush_locks_sequence_before_logging(app, user, monkeypatch):
+    """Test that a flush locks the sequence of the users whose changes it logs."""
+    locked = []
+    monkeypatch.setattr('app.models.sync.lock_sequence',
+                        lambda connection, user_ids: locked.append((list(user_ids), SyncChange.query.count())))
+    before = SyncChange.query.count()
+    product = Product.query.filter_by(user_id=user.id).first()
+    product.stock += 1
+    db.session.commit()
+
+    assert locked == [([user.id], before)]
+    assert SyncChange.query.count() == before + 1
+